@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -32,10 +33,17 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Первым: закрепление основной БД после записи (catalog.routers)
+    'catalog.routers.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    # До CsrfViewMiddleware: лимиты проверяются до разбора тела запроса
+    'catalog.ratelimit.RateLimitMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'catalog.roles.RoleMiddleware',
+    # Шард завода пользователя (catalog.sharding)
+    'catalog.sharding.ShardMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -53,6 +61,9 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'catalog.context_processors.role',
+                'catalog.context_processors.favorites',
+                'catalog.context_processors.service_worker',
             ],
         },
     },
@@ -71,6 +82,78 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения (catalog.routers): AUROOM_DB_REPLICAS - имена БД через запятую
+# с настройками default (для SQLite - пути к файлам, копия: manage.py sync_sqlite_replicas).
+# Реплики на других хостах добавьте в DATABASES и перечислите в CATALOG_DB_REPLICAS.
+for _number, _name in enumerate(filter(None, os.environ.get('AUROOM_DB_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{_number}'] = {
+        **DATABASES['default'],
+        'NAME': _name.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+CATALOG_DB_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica')]
+# Чтения каких приложений идут на реплики
+CATALOG_DB_REPLICA_APPS = ['catalog']
+# Сколько секунд после записи пользователь читает с основной БД (задержка репликации)
+CATALOG_DB_PIN_SECONDS = 5
+
+# Шарды каталога по заводам (catalog.sharding): AUROOM_DB_SHARDS - имена БД через запятую
+# с настройками default. Схема: manage.py migrate --database shardN, затем
+# manage.py sync_catalog_shards; заводы переносятся командой move_factory_shard.
+# Новые шарды добавляются только в конец списка: от номера зависит диапазон id.
+# Нужен общий кэш (AUROOM_CACHE_BACKEND) - иначе check выдаст catalog.E001.
+for _number, _name in enumerate(filter(None, os.environ.get('AUROOM_DB_SHARDS', '').split(',')), 1):
+    DATABASES[f'shard{_number}'] = {
+        **DATABASES['default'],
+        'NAME': _name.strip(),
+    }
+
+CATALOG_SHARDS = [alias for alias in DATABASES if alias.startswith('shard')]
+
+DATABASE_ROUTERS = ['catalog.sharding.ShardRouter', 'catalog.routers.PrimaryReplicaRouter']
+
+
+# Cache
+# По умолчанию - локальная память процесса. Для нескольких воркеров укажите общий кэш, например:
+# AUROOM_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache AUROOM_CACHE_LOCATION=redis://127.0.0.1:6379/1
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('AUROOM_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('AUROOM_CACHE_LOCATION', ''),
+    }
+}
+
+
+# Sessions
+# AUROOM_SESSION_MODE:
+#   db             - только БД (стандарт Django)
+#   cached_db      - кэш с записью в БД (по умолчанию)
+#   cache          - только кэш (нужен общий кэш для всех воркеров)
+#   signed_cookies - подписанная cookie, без обращений к хранилищу
+# Для db и cached_db просроченные сессии удаляет `manage.py clearsessions` (запускать по cron).
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('AUROOM_SESSION_MODE', 'cached_db')]
+
+
+# Authentication
+# С общим кэшем пользователь вместе с профилем завода берётся из кэша (catalog.backends).
+# В локальной памяти процесса кэшировать нельзя: смена пароля или блокировка
+# сбросит кэш только в одном воркере (проверка catalog.E002).
+# ModelBackend оставлен, чтобы не разлогинить сессии, созданные до включения кэша.
+
+AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
+if CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache':
+    AUTHENTICATION_BACKENDS.insert(0, 'catalog.backends.CachedModelBackend')
+CATALOG_USER_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -115,6 +198,69 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Sitemap и товарные фиды (manage.py build_feeds); в продакшене отдаются веб-сервером
+CATALOG_SITE_URL = os.environ.get('AUROOM_SITE_URL', 'http://localhost:8000')
+CATALOG_FEEDS_ROOT = MEDIA_ROOT / 'feeds'
+CATALOG_FEEDS_URL = MEDIA_URL + 'feeds/'
+CATALOG_FEED_CURRENCY = 'USD'
+
+# Базовая валюта цен (Product.price); курсы остальных - CurrencyRate (manage.py load_currency_rates)
+CATALOG_BASE_CURRENCY = 'USD'
+CATALOG_BASE_CURRENCY_SYMBOL = '$'
+
+# История изменений товаров: свёртка до дня (manage.py rollup_product_history), срок хранения
+CATALOG_HISTORY_ROLLUP_DAYS = 90
+CATALOG_HISTORY_RETENTION_DAYS = None
+
+# Избранное снятых с продажи товаров удаляется через N дней (manage.py prune_favorites)
+CATALOG_FAVORITES_STALE_DAYS = 30
+
+# Товары, неактивные и не менявшиеся N дней, уходят в архив (manage.py archive_products, catalog.archive)
+CATALOG_ARCHIVE_AFTER_DAYS = 180
+
+# Лимиты частоты запросов (catalog.ratelimit): «N/s|m|h|d» на пользователя, завод или IP
+CATALOG_RATE_LIMITS = {
+    'favorite': '30/m',
+    'search': '60/m',
+    'product_write': '20/m',
+    'upload_chunk': '120/m',
+    'inventory_feed': '6/m',
+}
+# Загрузки: тело запроса, один файл, разрешение изображения (проверяется по заголовку)
+CATALOG_MAX_UPLOAD_REQUEST_BYTES = 25 * 1024 * 1024
+CATALOG_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+CATALOG_MAX_IMAGE_PIXELS = 40_000_000
+# Загрузка фото частями (catalog.chunked_uploads): размер части, каталог частей
+# (при нескольких серверах - общий), брошенные загрузки удаляет manage.py prune_uploads
+CATALOG_UPLOAD_CHUNK_BYTES = 1024 * 1024
+CATALOG_UPLOAD_TEMP_DIR = os.environ.get('AUROOM_UPLOAD_TEMP_DIR', str(BASE_DIR / 'uploads_tmp'))
+CATALOG_UPLOAD_TTL_HOURS = 24
+# Дубли и похожие фото (catalog.image_hashes): расстояние Хэмминга между 64-битными pHash;
+# хэши фото, загруженных раньше, - manage.py hash_product_images
+CATALOG_DUPLICATE_PHOTO_DISTANCE = 6
+CATALOG_SIMILAR_PHOTO_DISTANCE = 12
+
+# Офлайн-каталог (catalog.snapshots): service worker и JSON-снимок популярных товаров
+# (manage.py build_catalog_snapshot по расписанию); снимки отдаются веб-сервером
+CATALOG_SERVICE_WORKER = os.environ.get('AUROOM_SERVICE_WORKER', '0') == '1'
+CATALOG_SNAPSHOTS_ROOT = MEDIA_ROOT / 'snapshots'
+CATALOG_SNAPSHOTS_URL = MEDIA_URL + 'snapshots/'
+CATALOG_SNAPSHOT_PRODUCTS = 2000
+
+# Прогрев воркера при старте WSGI (catalog.warmup), замеры - в лог catalog.startup
+CATALOG_WARMUP = os.environ.get('AUROOM_WARMUP', '1') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'catalog.startup': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
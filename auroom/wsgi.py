@@ -8,9 +8,17 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 """
 
 import os
+import time
+
+_import_started = time.perf_counter()
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auroom.settings')
 
 application = get_wsgi_application()
+
+# Замер холодного старта и прогрев шаблонов, URL и кэшей до первого запроса
+from catalog.warmup import startup  # noqa: E402
+
+startup(_import_started)
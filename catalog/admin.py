@@ -1,5 +1,117 @@
+import hashlib
+
 from django.contrib import admin
-from .models import Factory, Category, Material, Product, ProductImage, Favorite
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import cached_property
+from .archive import restore_products
+from .models import (
+    Factory, FactoryApiToken, Category, Material, Product, ProductImage, Favorite, CurrencyRate, ProductChange,
+    ArchivedProduct,
+)
+from .sharding import ID_RANGE, SHARDS, activate, all_shards, shard_for_factory
+
+
+def estimated_row_count(model, using):
+    """
+    Оценка числа строк таблицы из статистики СУБД или None.
+    PostgreSQL - pg_class.reltuples, SQLite - sqlite_stat1 (после ANALYZE).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор админки для больших таблиц: без фильтров число строк берётся
+    из статистики СУБД вместо COUNT(*), с фильтрами - COUNT(*) кэшируется на минуту.
+    """
+    estimate_threshold = 10000
+    cache_timeout = 60
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        key = 'catalog:admin:count:' + hashlib.md5(str(queryset.query).encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, self.cache_timeout)
+        return count
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """Шард каталога: список показывает строки одного шарда (выбирается в ShardedAdmin)"""
+    title = 'шард'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in SHARDS]
+
+    def queryset(self, request, queryset):
+        return queryset
+
+    def choices(self, changelist):
+        choices = list(super().choices(changelist))
+        choices[0]['display'] = 'Основная БД'
+        return choices
+
+
+class ShardedAdmin(admin.ModelAdmin):
+    """
+    Админка модели из шарда завода (catalog.sharding). Список, поиск и
+    действия работают в шарде из фильтра «шард» (без него - основная БД),
+    страница объекта - в шарде, где лежит объект.
+    """
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        return [ShardFilter, *list_filter] if SHARDS else list_filter
+
+    def changelist_view(self, request, extra_context=None):
+        if SHARDS:
+            alias = request.GET.get(ShardFilter.parameter_name)
+            activate(alias if alias in SHARDS else DEFAULT_DB_ALIAS)
+        return super().changelist_view(request, extra_context)
+
+    def get_object(self, request, object_id, from_field=None):
+        """Сначала шард диапазона id (reserve_id_ranges), затем остальные"""
+        if not SHARDS:
+            return super().get_object(request, object_id, from_field)
+        shards = all_shards()
+        try:
+            index = int(object_id) // ID_RANGE
+        except (TypeError, ValueError):
+            index = None
+        if index is not None and 0 <= index < len(shards):
+            shards.insert(0, shards.pop(index))
+        for alias in shards:
+            activate(alias)
+            obj = super().get_object(request, object_id, from_field)
+            if obj is not None:
+                return obj
+        activate(DEFAULT_DB_ALIAS)
+        return None
 
 
 class ProductImageInline(admin.TabularInline):
@@ -8,37 +120,72 @@ class ProductImageInline(admin.TabularInline):
     extra = 3
     fields = ['image', 'is_main', 'is_reference', 'order']
 
+    def get_queryset(self, request):
+        # __str__ фото выводит артикул товара
+        return super().get_queryset(request).select_related('product')
+
 
 @admin.register(Factory)
 class FactoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'phone', 'email', 'is_verified', 'created_at']
-    list_filter = ['is_verified', 'created_at']
+    list_display = ['name', 'phone', 'email', 'is_verified', 'shard', 'created_at']
+    list_filter = ['is_verified', 'shard', 'created_at']
     search_fields = ['name', 'phone', 'email']
     list_editable = ['is_verified']
+    list_select_related = ['user']
+    # Шард меняется только командой move_factory_shard: она переносит товары
+    readonly_fields = ['shard']
+
+
+@admin.register(FactoryApiToken)
+class FactoryApiTokenAdmin(admin.ModelAdmin):
+    """Ключи выпускаются командой issue_api_token; в админке - просмотр и отзыв"""
+    list_display = ['factory', 'name', 'created_at', 'last_used_at']
+    list_select_related = ['factory']
+    readonly_fields = ['factory', 'key_hash', 'created_at', 'last_used_at']
+
+    def has_add_permission(self, request):
+        return False
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'slug']
+    search_fields = ['name', 'slug']
     prepopulated_fields = {'slug': ('name',)}
 
 
+@admin.register(CurrencyRate)
+class CurrencyRateAdmin(admin.ModelAdmin):
+    """При сохранении курса цены каталога в валюте пересчитываются одним UPDATE"""
+    list_display = ['code', 'name', 'symbol', 'rate', 'updated_at']
+    list_editable = ['rate']
+
+
 @admin.register(Material)
 class MaterialAdmin(admin.ModelAdmin):
     list_display = ['name', 'material_type', 'purity']
     list_filter = ['material_type']
+    search_fields = ['name', 'purity']
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(ShardedAdmin):
     list_display = ['article', 'name', 'factory', 'category', 'price', 'stock_quantity', 
                     'show_ruler', 'has_dimensions_display', 'is_active']
     list_filter = ['category', 'material', 'is_active', 'has_stones', 'created_at', 
                    'reference_photo_type', 'show_ruler']
-    search_fields = ['article', 'name', 'description']
+    # Артикул ищется точным совпадением по индексу, название - по подстроке;
+    # описание не ищем: ILIKE по TextField - полный проход по таблице
+    search_fields = ['article__exact', 'name']
     list_editable = ['is_active', 'price']
-    readonly_fields = ['views_count', 'created_at', 'updated_at', 'dimensions_text']
+    list_select_related = ['factory', 'category']
+    autocomplete_fields = ['factory', 'category', 'material']
+    readonly_fields = ['views_count', 'popularity_score', 'trending_score', 'created_at', 'updated_at', 'dimensions_text']
     inlines = [ProductImageInline]
+    # Счётчики фильтров считаются только по запросу (?_facets), полный COUNT не показываем
+    show_facets = admin.ShowFacets.ALLOW
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     
     fieldsets = (
         ('Основная информация', {
@@ -59,7 +206,7 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('price', 'stock_quantity')
         }),
         ('Статус', {
-            'fields': ('is_active', 'views_count', 'created_at', 'updated_at')
+            'fields': ('is_active', 'views_count', 'popularity_score', 'trending_score', 'created_at', 'updated_at')
         }),
     )
     
@@ -68,16 +215,93 @@ class ProductAdmin(admin.ModelAdmin):
         return "✅" if obj.has_dimensions else "❌"
     has_dimensions_display.short_description = 'Размеры указаны'
 
+    def get_readonly_fields(self, request, obj=None):
+        readonly_fields = super().get_readonly_fields(request, obj)
+        if obj is not None and SHARDS:
+            # Товар лежит в шарде завода: сменить завод - перенести товар
+            readonly_fields = [*readonly_fields, 'factory']
+        return readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            # Новый товар и его фото (inline) - в шард выбранного завода
+            activate(shard_for_factory(obj.factory))
+        super().save_model(request, obj, form, change)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            # Большие текстовые поля списку не нужны
+            queryset = queryset.for_listing()
+        return queryset
+
+    def get_search_results(self, request, queryset, search_term):
+        """Точный артикул - один поиск по уникальному индексу, без ILIKE по названию"""
+        term = search_term.strip()
+        if term and ' ' not in term and queryset.filter(article=term).exists():
+            return queryset.filter(article=term), False
+        return super().get_search_results(request, queryset, search_term)
+
 
 @admin.register(ProductImage)
-class ProductImageAdmin(admin.ModelAdmin):
-    list_display = ['product', 'is_main', 'is_reference', 'order', 'uploaded_at']
+class ProductImageAdmin(ShardedAdmin):
+    list_display = ['product_article', 'is_main', 'is_reference', 'order', 'uploaded_at']
     list_filter = ['is_main', 'is_reference', 'uploaded_at']
     list_editable = ['is_main', 'is_reference', 'order']
+    list_select_related = ['product']
+    raw_id_fields = ['product']
+    search_fields = ['product__article__exact']
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    @admin.display(description='Товар', ordering='product__article')
+    def product_article(self, obj):
+        return obj.product.article
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
-    list_display = ['user', 'product', 'added_at']
-    list_filter = ['added_at']
-    search_fields = ['user__username', 'product__name']
\ No newline at end of file
+class FavoriteAdmin(ShardedAdmin):
+    list_display = ['user', 'product', 'added_at', 'stale_since']
+    list_filter = ['added_at', 'stale_since']
+    search_fields = ['user__username', 'product__article__exact']
+    list_select_related = ['user', 'product']
+    raw_id_fields = ['user', 'product']
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+@admin.register(ProductChange)
+class ProductChangeAdmin(ShardedAdmin):
+    """Журнал только для чтения; поиск по точному артикулу идёт по индексу"""
+    list_display = ['changed_at', 'article', 'field', 'old_value', 'new_value', 'source']
+    search_fields = ['article__exact']
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedProduct)
+class ArchivedProductAdmin(ShardedAdmin):
+    """Архив только для чтения; вернуть товар - действием restore"""
+    list_display = ['article', 'name', 'factory', 'archived_at']
+    list_filter = ['archived_at']
+    list_select_related = ['factory']
+    search_fields = ['article__exact', 'name']
+    actions = ['restore']
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    @admin.action(description='Вернуть в каталог (неактивными)', permissions=['delete'])
+    def restore(self, request, queryset):
+        restored = restore_products(list(queryset.values_list('id', flat=True)))
+        self.message_user(request, f'Возвращено товаров: {len(restored)}')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,161 @@
+# catalog/archive.py
+"""
+Архив давно неактивных товаров.
+
+Товар, снятый с продажи и не менявшийся ARCHIVE_AFTER_DAYS дней, команда
+archive_products пакетами переносит в ArchivedProduct (редко нужные поля -
+в JSON), метаданные его фото - в ArchivedProductImage; файлы остаются
+в хранилище. Цены в валютах, активность и похожие удаляются вместе с
+товаром. Товар, который ещё лежит у кого-то в избранном, не архивируется,
+пока prune_favorites не снимет избранное: иначе оно удалилось бы каскадом
+и не вернулось бы при восстановлении. История изменений остаётся: id
+товара не меняется. Так таблица Product и её индексы растут с живым
+каталогом, а не со всем, что заводы когда-либо выставляли.
+
+restore_products возвращает товары с прежними id и артикулами: из админки,
+раздела «Архив» кабинета завода и фидом остатков (строка с is_active=1).
+Артикул уникален в обеих таблицах (Product.validate_unique и генерация
+артикула учитывают архив).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .history import batched_history
+from .image_hashes import mark_changed_on_commit
+from .images import deferred_main_image_refresh, refresh_main_images
+from .models import ArchivedProduct, ArchivedProductImage, Favorite, Product, ProductImage
+from .sharding import insert_rows
+from .signals import products_bulk_updated
+
+ARCHIVE_AFTER_DAYS = getattr(settings, 'CATALOG_ARCHIVE_AFTER_DAYS', 180)
+
+# Поля Product, которые в архиве - отдельные колонки
+COLUMN_FIELDS = {'id', 'factory', 'category', 'material', 'article', 'name'}
+# Главное фото пересчитывается при возврате
+SKIPPED_FIELDS = {'main_image', 'main_image_url'}
+
+IMAGE_FIELDS = ['is_main', 'is_reference', 'order', 'uploaded_at', 'phash']
+
+
+def _data_fields():
+    return [
+        field for field in Product._meta.concrete_fields
+        if field.name not in COLUMN_FIELDS and field.name not in SKIPPED_FIELDS
+    ]
+
+
+def _dump(field, product):
+    """Значение поля строкой без потерь (DjangoJSONEncoder режет микросекунды)"""
+    value = getattr(product, field.attname)
+    return None if value is None else field.value_to_string(product)
+
+
+def _archivable():
+    """Неактивные товары без избранного (Exists - без LEFT JOIN, совместимо с FOR UPDATE)"""
+    return Product.objects.filter(is_active=False).exclude(Exists(Favorite.objects.filter(product=OuterRef('pk'))))
+
+
+def _archive_batch(product_ids, threshold):
+    """Переносит пакет в архив одной транзакцией. Возвращает число товаров"""
+    fields = _data_fields()
+    now = timezone.now()
+    with transaction.atomic(using=router.db_for_write(Product)), batched_history() as history, \
+            deferred_main_image_refresh() as pending:
+        # Повторная проверка под блокировкой: завод мог вернуть товар в продажу
+        products = list(_archivable().select_for_update().filter(
+            id__in=product_ids, updated_at__lt=threshold
+        ))
+        if not products:
+            return 0
+        ids = [product.pk for product in products]
+        ArchivedProduct.objects.bulk_create([
+            ArchivedProduct(
+                id=product.pk, factory_id=product.factory_id, category_id=product.category_id,
+                material_id=product.material_id, article=product.article, name=product.name,
+                data={field.attname: _dump(field, product) for field in fields},
+                archived_at=now,
+            )
+            for product in products
+        ])
+        ArchivedProductImage.objects.bulk_create([
+            ArchivedProductImage(
+                id=image.pk, product_id=image.product_id, image=image.image.name,
+                **{name: getattr(image, name) for name in IMAGE_FIELDS},
+            )
+            for image in ProductImage.objects.filter(product_id__in=ids)
+        ])
+        Product.objects.filter(id__in=ids).delete()
+        # Удаление фото при архивации - не правка товара: без истории и пересчёта
+        history.clear()
+        pending.clear()
+        mark_changed_on_commit(ids)
+    return len(products)
+
+
+def archive_inactive(older_than_days=ARCHIVE_AFTER_DAYS, batch_size=500):
+    """Архивирует товары, неактивные дольше older_than_days дней. Возвращает их число"""
+    threshold = timezone.now() - timedelta(days=older_than_days)
+    candidates = _archivable().filter(updated_at__lt=threshold).order_by('id')
+    archived = 0
+    last_id = 0
+    while True:
+        ids = list(candidates.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return archived
+        archived += _archive_batch(ids, threshold)
+        last_id = ids[-1]
+
+
+def restore_products(product_ids, activate=False):
+    """
+    Возвращает товары из архива с прежними id и фото; activate - сразу
+    в продажу. Возвращает id возвращённых товаров.
+    """
+    fields = _data_fields()
+    now = timezone.now()
+    using = router.db_for_write(Product)
+    with transaction.atomic(using=using):
+        archived = list(ArchivedProduct.objects.select_for_update().filter(id__in=product_ids))
+        if not archived:
+            return []
+        products = []
+        for item in archived:
+            product = Product(
+                id=item.pk, factory_id=item.factory_id, category_id=item.category_id,
+                material_id=item.material_id, article=item.article, name=item.name,
+            )
+            for field in fields:
+                if field.attname in item.data:
+                    setattr(product, field.attname, field.to_python(item.data[field.attname]))
+            # Иначе следующий запуск archive_products сразу вернёт товар в архив
+            product.updated_at = now
+            if activate:
+                product.is_active = True
+            products.append(product)
+        ids = [product.pk for product in products]
+        insert_rows(Product, products, using)
+        insert_rows(ProductImage, [
+            ProductImage(
+                id=image.pk, product_id=image.product_id, image=image.image,
+                **{name: getattr(image, name) for name in IMAGE_FIELDS},
+            )
+            for image in ArchivedProductImage.objects.filter(product_id__in=ids)
+        ], using)
+        ArchivedProduct.objects.filter(id__in=ids).delete()
+        refresh_main_images(ids)
+        # Фото снова в индексе дублей и похожих
+        mark_changed_on_commit(ids)
+
+    # Цены в валютах и карточки каталога
+    products_bulk_updated.send(sender=Product, product_ids=ids)
+    return ids
+
+
+def restore_articles(factory, articles, activate=False):
+    """Возвращает из архива товары завода по артикулам"""
+    ids = ArchivedProduct.objects.filter(factory=factory, article__in=articles).values_list('id', flat=True)
+    return restore_products(list(ids), activate=activate)
@@ -0,0 +1,297 @@
+# catalog/autocomplete.py
+"""
+Подсказки поиска по мере ввода из индекса в памяти воркера.
+
+Индекс - отсортированный список уникальных нормализованных ключей
+(название товара целиком и по словам, артикул, названия заводов
+и категорий) и для каждого ключа список id по
+убыванию популярности. Префикс ищется bisect'ом, просматривается
+не больше SCAN_LIMIT ключей и по RESULT_LIMIT id с ключа, так что ответ
+не зависит от размера каталога и не обращается к БД.
+
+Изменения доходят до воркеров через версию в общем кэше: refresh_cards
+и сигналы записывают id изменённых товаров под новым номером версии,
+воркер не чаще раза в CHECK_INTERVAL секунд сверяет версию и
+перечитывает только изменённые товары. Пропущенная версия (вытеснена
+из кэша) или слишком большой пакет - полная пересборка.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+
+from .lookups import get_categories
+from .models import Factory, ProductCard
+from .sharding import all_shards, read_db
+
+MIN_QUERY_LENGTH = 2
+SCAN_LIMIT = 64
+RESULT_LIMIT = 10
+
+CHECK_INTERVAL = getattr(settings, 'CATALOG_AUTOCOMPLETE_CHECK_SECONDS', 1)
+# Популярность в индексе обновляется только при изменении товара,
+# поэтому раз в MAX_AGE секунд индекс строится заново
+MAX_AGE = getattr(settings, 'CATALOG_AUTOCOMPLETE_MAX_AGE', 3600)
+# Больше изменённых товаров за раз - дешевле пересобрать
+INCREMENTAL_LIMIT = 2000
+
+VERSION_KEY = 'catalog:autocomplete:version'
+CHANGES_TIMEOUT = 24 * 3600
+
+KIND_CATEGORY = 'category'
+KIND_FACTORY = 'factory'
+KIND_PRODUCT = 'product'
+# Порядок категорий и заводов в выдаче
+KIND_ORDER = {KIND_CATEGORY: 0, KIND_FACTORY: 1}
+
+
+def _changes_key(version):
+    return f'catalog:autocomplete:changes:{version}'
+
+
+def normalize(text):
+    return ' '.join(text.lower().replace('ё', 'е').split())
+
+
+def _name_keys(name):
+    """Название целиком и каждое слово: «кольцо с фианитом» находится и по «фиан»"""
+    name = normalize(name)
+    keys = set(name.split(' '))
+    keys.add(name)
+    keys.discard('')
+    return keys
+
+
+def _article_keys(article):
+    return {normalize(article)}
+
+
+class PrefixIndex:
+    """
+    Отсортированный список уникальных ключей и для каждого ключа - id записей,
+    упорядоченные по убыванию веса. entries: {id: (подпись, значение, вес)}.
+    Поиск и обновление идут под блокировкой: обновления редкие и короткие.
+    """
+
+    def __init__(self, entries, keys_for):
+        self.entries = entries
+        self.keys_for = keys_for
+        self.lock = threading.Lock()
+        postings = {}
+        for entry_id, entry in entries.items():
+            for key in keys_for(entry):
+                postings.setdefault(key, []).append(entry_id)
+        for ids in postings.values():
+            ids.sort(key=self._rank)
+        self.postings = postings
+        self.keys = sorted(postings)
+
+    def _rank(self, entry_id):
+        # id в ключе делает порядок однозначным: запись находится bisect'ом
+        return -self.entries[entry_id][2], entry_id
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, prefix, limit=RESULT_LIMIT):
+        """[(id, ключ совпал целиком)] - точные совпадения, затем по весу"""
+        found = {}
+        with self.lock:
+            keys = self.keys
+            position = bisect_left(keys, prefix)
+            end = min(position + SCAN_LIMIT, len(keys))
+            while position < end and keys[position].startswith(prefix):
+                exact = keys[position] == prefix
+                for entry_id in self.postings[keys[position]][:limit]:
+                    found[entry_id] = exact or found.get(entry_id, False)
+                position += 1
+            ranked = sorted(found.items(), key=lambda item: (not item[1], self._rank(item[0])))
+        return ranked[:limit]
+
+    def update(self, changes):
+        """Заменяет записи: changes - {id: запись или None для удалённой}"""
+        with self.lock:
+            for entry_id, entry in changes.items():
+                old = self.entries.get(entry_id)
+                if old is not None:
+                    rank = self._rank(entry_id)
+                    for key in self.keys_for(old):
+                        ids = self.postings[key]
+                        del ids[bisect_left(ids, rank, key=self._rank)]
+                        if not ids:
+                            del self.postings[key]
+                            del self.keys[bisect_left(self.keys, key)]
+                    del self.entries[entry_id]
+                if entry is None:
+                    continue
+                self.entries[entry_id] = entry
+                for key in self.keys_for(entry):
+                    ids = self.postings.get(key)
+                    if ids is None:
+                        self.postings[key] = [entry_id]
+                        insort(self.keys, key)
+                    else:
+                        insort(ids, entry_id, key=self._rank)
+
+
+def _product_keys(entry):
+    name, article, _ = entry
+    return _name_keys(name) | _article_keys(article)
+
+
+def _label_keys(entry):
+    return _name_keys(entry[0])
+
+
+class CatalogIndex:
+    """Товары и названия (категории, заводы) - два префиксных индекса"""
+
+    def __init__(self, products, factories, categories):
+        self.products = PrefixIndex(products, _product_keys)
+        # Категории и заводы - в одном индексе, категории выше по весу
+        names = [(KIND_CATEGORY, name, slug) for slug, name in categories]
+        names += [(KIND_FACTORY, name, factory_id) for factory_id, name in factories]
+        self.names = names
+        self.labels = PrefixIndex(
+            {position: (name, value, -KIND_ORDER[kind]) for position, (kind, name, value) in enumerate(names)},
+            _label_keys,
+        )
+
+    def __len__(self):
+        return len(self.products) + len(self.labels)
+
+    def search(self, query, limit=RESULT_LIMIT):
+        """[(вид, подпись, значение)] для префикса query: сначала категории и заводы"""
+        prefix = normalize(query)
+        if len(prefix) < MIN_QUERY_LENGTH:
+            return []
+        results = [self.names[position] for position, _ in self.labels.search(prefix, limit)]
+        for product_id, _ in self.products.search(prefix, limit - len(results)):
+            name, article, _ = self.products.entries[product_id]
+            results.append((KIND_PRODUCT, name, article))
+        return results
+
+
+def _product_entries(product_ids=None):
+    # Карточки всех шардов каталога: id товаров уникальны между шардами
+    entries = {}
+    for alias in all_shards():
+        cards = ProductCard.objects.using(read_db(ProductCard, alias))
+        if product_ids is not None:
+            cards = cards.filter(product_id__in=product_ids)
+        entries.update(
+            (product_id, (name, article, popularity))
+            for product_id, name, article, popularity in cards.values_list(
+                'product_id', 'name', 'article', 'popularity_score'
+            ).iterator(chunk_size=5000)
+        )
+    return entries
+
+
+def build_index():
+    """Полный индекс: активные товары (из карточек), заводы, категории"""
+    return CatalogIndex(
+        _product_entries(),
+        Factory.objects.values_list('id', 'name'),
+        [(category.slug, category.name) for category in get_categories()],
+    )
+
+
+def current_version():
+    return cache.get(VERSION_KEY, 0)
+
+
+def mark_changed(product_ids=None):
+    """
+    Сообщает воркерам об изменении: список id товаров или None, если
+    изменились заводы/категории и нужна полная пересборка.
+    """
+    if product_ids is not None:
+        product_ids = sorted(set(product_ids))
+        if not product_ids:
+            return
+        if len(product_ids) > INCREMENTAL_LIMIT:
+            product_ids = None
+    cache.add(VERSION_KEY, 0, None)
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        # Ключ вытеснен между add и incr
+        cache.set(VERSION_KEY, 1, None)
+        version = 1
+    cache.set(_changes_key(version), product_ids, CHANGES_TIMEOUT)
+
+
+def mark_changed_on_commit(product_ids=None, using=None):
+    """
+    mark_changed после фиксации транзакции: иначе воркер может перечитать
+    ещё незафиксированные строки, счесть себя актуальным и пропустить изменение
+    """
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+    transaction.on_commit(lambda: mark_changed(product_ids), using=using or router.db_for_write(ProductCard))
+
+
+class _State:
+    """Индекс воркера и версия, до которой он доведён"""
+
+    def __init__(self):
+        self.index = None
+        self.version = 0
+        self.built_at = 0.0
+        self.checked_at = 0.0
+
+
+_state = _State()
+_lock = threading.Lock()
+
+
+def _refresh():
+    version = current_version()
+    now = time.monotonic()
+    if (_state.index is not None and version == _state.version
+            and now - _state.built_at < MAX_AGE):
+        return
+
+    index = _state.index
+    # Тысячи версий подряд (массовое удаление) - пересборка дешевле чтения пакетов
+    if (index is not None and 0 < version - _state.version <= INCREMENTAL_LIMIT
+            and now - _state.built_at < MAX_AGE):
+        missing = object()
+        changes = cache.get_many([_changes_key(v) for v in range(_state.version + 1, version + 1)])
+        product_ids = set()
+        for v in range(_state.version + 1, version + 1):
+            batch = changes.get(_changes_key(v), missing)
+            if batch is missing or batch is None:
+                product_ids = None
+                break
+            product_ids.update(batch)
+        if product_ids is not None and len(product_ids) <= INCREMENTAL_LIMIT:
+            loaded = _product_entries(product_ids)
+            index.products.update({product_id: loaded.get(product_id) for product_id in product_ids})
+            _state.version = version
+            return
+
+    _state.index = build_index()
+    _state.version = version
+    _state.built_at = now
+
+
+def get_index():
+    """Индекс воркера; версия в кэше проверяется не чаще CHECK_INTERVAL"""
+    now = time.monotonic()
+    if _state.index is None or now - _state.checked_at >= CHECK_INTERVAL:
+        with _lock:
+            if _state.index is None or now - _state.checked_at >= CHECK_INTERVAL:
+                _refresh()
+                _state.checked_at = now
+    return _state.index
+
+
+def suggest(query, limit=RESULT_LIMIT):
+    return get_index().search(query, limit)
@@ -0,0 +1,38 @@
+# catalog/backends.py
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_CACHE_TIMEOUT = getattr(settings, 'CATALOG_USER_CACHE_TIMEOUT', 300)
+
+
+def user_cache_key(user_id):
+    return f'catalog:auth:user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend, который берёт пользователя (вместе с профилем завода) из кэша.
+    AuthenticationMiddleware вызывает get_user() на каждом запросе - с кэшем
+    это не SELECT к auth_user, а request.user.factory уже загружен.
+    Кэш сбрасывается сигналами при сохранении/удалении User и Factory, поэтому
+    нужен общий для всех воркеров кэш (проверка catalog.E002).
+    """
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            UserModel = get_user_model()
+            # Обратная связь OneToOne: при отсутствии завода select_related
+            # запоминает None, и user.factory не делает запрос
+            user = UserModel._default_manager.select_related('factory').filter(pk=user_id).first()
+            if user is None:
+                return None
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
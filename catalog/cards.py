@@ -0,0 +1,166 @@
+# catalog/cards.py
+"""
+Плоские карточки каталога (ProductCard) для листингов.
+
+Карточка пересобирается из Product одним SELECT с JOIN на пакет товаров
+и пишется upsert'ом; неактивные и удалённые товары из таблицы убираются.
+Переименование завода, категории или материала - один UPDATE по карточкам.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+
+from .autocomplete import mark_changed_on_commit
+from .currency import with_local_price
+from .models import Product, ProductCard
+
+# Поля Product, от которых зависит карточка: сохранение с update_fields
+# без них (например, views_count) карточку не трогает
+SOURCE_FIELDS = {
+    'name', 'article', 'price', 'weight', 'stock_quantity', 'is_active', 'main_image',
+    'main_image_url', 'factory', 'category', 'material', 'created_at',
+    'popularity_score', 'trending_score',
+    'reference_photo_type', 'width_mm', 'height_mm', 'diameter_mm', 'ring_size',
+}
+# GET-параметр -> поле карточки для фильтров «от/до» по размерам
+DIMENSION_FIELDS = {'width': 'width_mm', 'height': 'height_mm', 'diameter': 'diameter_mm'}
+DIMENSION_PARAMS = ['type', 'ring_size'] + [
+    f'{bound}_{name}' for name in DIMENSION_FIELDS for bound in ('min', 'max')
+]
+
+CARD_FIELDS = [
+    'article', 'name', 'price', 'weight', 'in_stock', 'main_image_url',
+    'factory', 'factory_name', 'category', 'category_slug', 'category_name',
+    'material', 'material_label', 'created_at', 'popularity_score', 'trending_score',
+    'reference_photo_type', 'width_mm', 'height_mm', 'diameter_mm', 'ring_size',
+]
+
+
+def _build_cards(product_ids):
+    rows = Product.objects.filter(id__in=product_ids, is_active=True).values_list(
+        'id', 'article', 'name', 'price', 'weight', 'stock_quantity', 'main_image_url',
+        'factory_id', 'factory__name', 'category_id', 'category__slug', 'category__name',
+        'material_id', 'material__name', 'created_at', 'popularity_score', 'trending_score',
+        'reference_photo_type', 'width_mm', 'height_mm', 'diameter_mm', 'ring_size',
+    )
+    return [
+        ProductCard(
+            product_id=product_id, article=article, name=name, price=price, weight=weight,
+            in_stock=stock_quantity > 0, main_image_url=main_image_url,
+            factory_id=factory_id, factory_name=factory_name,
+            category_id=category_id, category_slug=category_slug, category_name=category_name,
+            material_id=material_id, material_label=material_label,
+            created_at=created_at, popularity_score=popularity_score, trending_score=trending_score,
+            reference_photo_type=reference_photo_type, width_mm=width_mm, height_mm=height_mm,
+            diameter_mm=diameter_mm, ring_size=ring_size,
+        )
+        for (product_id, article, name, price, weight, stock_quantity, main_image_url,
+             factory_id, factory_name, category_id, category_slug, category_name,
+             material_id, material_label, created_at, popularity_score, trending_score,
+             reference_photo_type, width_mm, height_mm, diameter_mm, ring_size) in rows
+    ]
+
+
+def refresh_cards(product_ids, batch_size=1000):
+    """Пересобирает карточки товаров; неактивные и удалённые убирает"""
+    product_ids = list(set(product_ids))
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start:start + batch_size]
+        cards = _build_cards(batch)
+        if cards:
+            ProductCard.objects.bulk_create(
+                cards, update_conflicts=True, unique_fields=['product'], update_fields=CARD_FIELDS
+            )
+        active_ids = [card.product_id for card in cards]
+        ProductCard.objects.filter(product_id__in=batch).exclude(product_id__in=active_ids).delete()
+    mark_changed_on_commit(product_ids)
+
+
+def rebuild_cards(batch_size=1000):
+    """Полная пересборка таблицы карточек. Возвращает число карточек"""
+    product_ids = list(Product.objects.filter(is_active=True).values_list('id', flat=True))
+    ProductCard.objects.exclude(product__is_active=True).delete()
+    refresh_cards(product_ids, batch_size=batch_size)
+    return len(product_ids)
+
+
+def _decimal_param(params, name):
+    try:
+        value = Decimal(params.get(name, '').replace(',', '.'))
+    except InvalidOperation:
+        return None
+    return value if value.is_finite() else None
+
+
+def filter_cards(params, currency_code):
+    """
+    Карточки с фильтрами и сортировкой из GET-параметров (главная и API).
+    Возвращает (queryset, поле цены).
+    """
+    category_slug = params.get('category')
+    material_id = params.get('material')
+    search_query = params.get('search')
+    sort_by = params.get('sort', '-created_at')
+    min_price = _decimal_param(params, 'min_price')
+    max_price = _decimal_param(params, 'max_price')
+
+    # Одна таблица без JOIN: в ней только активные товары
+    cards = ProductCard.objects.all()
+
+    # Фильтр по категории
+    if category_slug:
+        cards = cards.filter(category_slug=category_slug)
+
+    # Фильтр по материалу
+    if material_id:
+        cards = cards.filter(material_id=material_id)
+
+    # Тип изделия и размеры: диапазон по индексу (reference_photo_type, размер)
+    item_type = params.get('type')
+    if item_type:
+        cards = cards.filter(reference_photo_type=item_type)
+    for name, field in DIMENSION_FIELDS.items():
+        low = _decimal_param(params, f'min_{name}')
+        high = _decimal_param(params, f'max_{name}')
+        if low is not None:
+            cards = cards.filter(**{f'{field}__gte': low})
+        if high is not None:
+            cards = cards.filter(**{f'{field}__lte': high})
+
+    # Размер кольца предрассчитан при сохранении товара
+    ring_size = _decimal_param(params, 'ring_size')
+    if ring_size is not None:
+        cards = cards.filter(ring_size=ring_size)
+
+    # Цены в валюте покупателя - из предрассчитанной ProductPrice
+    cards, price_field = with_local_price(cards, currency_code, relation='product__prices')
+
+    # Фильтр по цене (некорректное значение - без фильтра)
+    if min_price is not None:
+        cards = cards.filter(**{f'{price_field}__gte': min_price})
+    if max_price is not None:
+        cards = cards.filter(**{f'{price_field}__lte': max_price})
+
+    # Поиск (описание хранится только в Product)
+    if search_query:
+        cards = cards.filter(
+            Q(name__icontains=search_query) |
+            Q(article__icontains=search_query) |
+            Q(product__description__icontains=search_query)
+        )
+
+    # Сортировка
+    if sort_by == 'price_asc':
+        cards = cards.order_by(price_field)
+    elif sort_by == 'price_desc':
+        cards = cards.order_by(f'-{price_field}')
+    elif sort_by == 'popular':
+        cards = cards.order_by('-popularity_score')
+    elif sort_by == 'trending':
+        cards = cards.order_by('-trending_score')
+    elif sort_by == 'name':
+        cards = cards.order_by('name')
+    else:  # -created_at (по умолчанию - новые)
+        cards = cards.order_by('-created_at')
+
+    return cards, price_field
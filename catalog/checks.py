@@ -0,0 +1,39 @@
+# catalog/checks.py
+"""
+Проверки настроек (manage.py check): режимы, которым нужен общий для
+всех воркеров кэш.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+LOCAL_CACHES = {'django.core.cache.backends.locmem.LocMemCache'}
+
+
+def _local_cache():
+    return settings.CACHES.get('default', {}).get('BACKEND') in LOCAL_CACHES
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    errors = []
+    if getattr(settings, 'CATALOG_SHARDS', None) and _local_cache():
+        errors.append(Error(
+            'Шардам каталога нужен общий кэш: размещение заводов по шардам кэшируется, '
+            'и move_factory_shard не сбросит его в кэше других процессов',
+            hint='Укажите AUROOM_CACHE_BACKEND (например, RedisCache)',
+            id='catalog.E001',
+        ))
+    return errors
+
+
+@register(Tags.caches, Tags.security)
+def check_user_cache(app_configs, **kwargs):
+    errors = []
+    if 'catalog.backends.CachedModelBackend' in settings.AUTHENTICATION_BACKENDS and _local_cache():
+        errors.append(Error(
+            'Для CachedModelBackend нужен общий кэш: смена пароля или блокировка пользователя '
+            'сбросит закэшированного пользователя только в одном процессе',
+            hint='Укажите AUROOM_CACHE_BACKEND или уберите CachedModelBackend из AUTHENTICATION_BACKENDS',
+            id='catalog.E002',
+        ))
+    return errors
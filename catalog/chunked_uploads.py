@@ -0,0 +1,224 @@
+# catalog/chunked_uploads.py
+"""
+Загрузка фото товаров частями с докачкой.
+
+Большой файл на медленном соединении в одном multipart-запросе часто
+обрывается и начинается заново, а воркер всё это время занят. Здесь
+клиент:
+1. объявляет загрузку (имя, размер, SHA-256 файла) - start_upload;
+2. отправляет части по CHUNK_BYTES запросами PUT с заголовками
+   Upload-Offset и Upload-Checksum (SHA-256 части) - write_chunk.
+   Часть пишется в файл потоком, без буферизации в памяти; при обрыве
+   клиент спрашивает offset и продолжает с него;
+3. завершает загрузку - attach_upload проверяет SHA-256 всего файла
+   и validate_image_upload и переносит файл в ProductImage.
+
+Части собираются в UPLOAD_TEMP_DIR (при нескольких серверах - общий
+каталог). Брошенные загрузки удаляет команда prune_uploads.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .models import ChunkedUpload, ProductImage
+from .uploads import MAX_UPLOAD_BYTES, validate_image_upload
+
+CHUNK_BYTES = getattr(settings, 'CATALOG_UPLOAD_CHUNK_BYTES', 1024 * 1024)
+UPLOAD_TEMP_DIR = str(getattr(
+    settings, 'CATALOG_UPLOAD_TEMP_DIR', os.path.join(tempfile.gettempdir(), 'auroom-uploads')
+))
+UPLOAD_TTL_HOURS = getattr(settings, 'CATALOG_UPLOAD_TTL_HOURS', 24)
+# Незавершённых загрузок на завод
+MAX_ACTIVE_UPLOADS = 20
+
+READ_BYTES = 64 * 1024
+
+CHECKSUM_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ChunkedUploadError(ValueError):
+    """Ошибка протокола; status - код HTTP-ответа"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class _PartFile(File):
+    """Собранный файл: FileSystemStorage переносит его, а не копирует"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def part_path(upload):
+    return os.path.join(UPLOAD_TEMP_DIR, f'{upload.pk.hex}.part')
+
+
+def _remove_part(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def _checksum(value):
+    value = (value or '').strip().lower()
+    if not CHECKSUM_RE.match(value):
+        raise ChunkedUploadError('Контрольная сумма - SHA-256 в hex')
+    return value
+
+
+def get_upload(factory, upload_id):
+    """Загрузка завода по id или ChunkedUploadError 404"""
+    try:
+        upload_id = uuid.UUID(str(upload_id))
+    except ValueError:
+        upload_id = None
+    upload = upload_id and ChunkedUpload.objects.filter(factory=factory, pk=upload_id).first()
+    if not upload:
+        raise ChunkedUploadError('Загрузка не найдена или устарела', status=404)
+    return upload
+
+
+def start_upload(factory, filename, size, checksum):
+    """Создаёт загрузку и пустой файл для частей"""
+    name = get_valid_filename(os.path.basename(filename or ''))[:100]
+    if not name:
+        raise ChunkedUploadError('Не указано имя файла')
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise ChunkedUploadError('Не указан размер файла')
+    if size <= 0:
+        raise ChunkedUploadError('Пустой файл')
+    if size > MAX_UPLOAD_BYTES:
+        raise ChunkedUploadError(f'Файл больше {MAX_UPLOAD_BYTES // (1024 * 1024)} МБ', status=413)
+    checksum = _checksum(checksum)
+    if ChunkedUpload.objects.filter(factory=factory).count() >= MAX_ACTIVE_UPLOADS:
+        raise ChunkedUploadError('Слишком много незавершённых загрузок', status=429)
+
+    upload = ChunkedUpload.objects.create(factory=factory, filename=name, size=size, checksum=checksum)
+    os.makedirs(UPLOAD_TEMP_DIR, exist_ok=True)
+    open(part_path(upload), 'wb').close()
+    return upload
+
+
+def write_chunk(upload, offset, stream, length, checksum):
+    """
+    Пишет часть [offset, offset + length) из потока stream в файл.
+    Часть принимается, только если начинается с upload.received и её
+    SHA-256 совпал; иначе received не меняется и её можно прислать снова.
+    Возвращает новый offset.
+    """
+    try:
+        offset, length = int(offset), int(length)
+    except (TypeError, ValueError):
+        raise ChunkedUploadError('Нужны заголовки Upload-Offset и Content-Length')
+    checksum = _checksum(checksum)
+    if offset != upload.received:
+        raise ChunkedUploadError(f'Ожидается часть с позиции {upload.received}', status=409)
+    if length <= 0 or length > CHUNK_BYTES:
+        raise ChunkedUploadError(f'Часть должна быть от 1 до {CHUNK_BYTES} байт', status=413)
+    if offset + length > upload.size:
+        raise ChunkedUploadError('Часть выходит за объявленный размер файла')
+
+    digest = hashlib.sha256()
+    remaining = length
+    try:
+        with open(part_path(upload), 'r+b') as part:
+            part.seek(offset)
+            while remaining:
+                data = stream.read(min(READ_BYTES, remaining))
+                if not data:
+                    break
+                part.write(data)
+                digest.update(data)
+                remaining -= len(data)
+    except FileNotFoundError:
+        raise ChunkedUploadError('Загрузка не найдена или устарела', status=404)
+    if remaining:
+        raise ChunkedUploadError('Часть получена не полностью')
+    if digest.hexdigest() != checksum:
+        raise ChunkedUploadError('Контрольная сумма части не совпадает')
+
+    # Условный UPDATE: из двух одновременных запросов с одной частью засчитается один
+    updated = ChunkedUpload.objects.filter(pk=upload.pk, received=offset).update(
+        received=offset + length, updated_at=timezone.now()
+    )
+    if not updated:
+        upload.refresh_from_db(fields=['received'])
+        raise ChunkedUploadError(f'Ожидается часть с позиции {upload.received}', status=409)
+    upload.received = offset + length
+    return upload.received
+
+
+def verify_upload(upload):
+    """
+    Проверяет, что файл получен целиком, его SHA-256 и что это допустимое
+    изображение (ValidationError). Несовпавший файл загружается заново.
+    """
+    if upload.received != upload.size:
+        raise ChunkedUploadError(f'Файл получен не полностью: {upload.received} из {upload.size} байт', status=409)
+    digest = hashlib.sha256()
+    try:
+        with open(part_path(upload), 'rb') as part:
+            for block in iter(lambda: part.read(CHUNK_BYTES), b''):
+                digest.update(block)
+            if digest.hexdigest() != upload.checksum:
+                ChunkedUpload.objects.filter(pk=upload.pk).update(received=0, updated_at=timezone.now())
+                upload.received = 0
+                raise ChunkedUploadError('Контрольная сумма файла не совпадает, загрузите его заново', status=409)
+            part.seek(0)
+            validate_image_upload(File(part, name=upload.filename))
+    except FileNotFoundError:
+        raise ChunkedUploadError('Загрузка не найдена или устарела', status=404)
+
+
+def attach_upload(upload, product, is_main=False, is_reference=False, order=0, verified=False):
+    """
+    Проверяет файл и сохраняет его фото товара. Возвращает ProductImage.
+    verified=True - файл уже проверен verify_upload, повторно не читается.
+    """
+    if not verified:
+        verify_upload(upload)
+    with open(part_path(upload), 'rb') as part:
+        image = ProductImage.objects.create(
+            product=product, image=_PartFile(part, name=upload.filename),
+            is_main=is_main, is_reference=is_reference, order=order,
+        )
+    # Файл уже перенесён в хранилище (или скопирован, если оно не файловое)
+    _remove_part(upload)
+    upload.delete()
+    return image
+
+
+def discard_upload(upload):
+    _remove_part(upload)
+    upload.delete()
+
+
+def prune_uploads(older_than_hours=UPLOAD_TTL_HOURS):
+    """Удаляет загрузки без новых частей дольше older_than_hours и ничьи файлы частей"""
+    threshold = timezone.now() - timedelta(hours=older_than_hours)
+    stale = list(ChunkedUpload.objects.filter(updated_at__lt=threshold))
+    for upload in stale:
+        discard_upload(upload)
+
+    orphaned = 0
+    if os.path.isdir(UPLOAD_TEMP_DIR):
+        known = {f'{pk.hex}.part' for pk in ChunkedUpload.objects.values_list('pk', flat=True)}
+        for entry in os.scandir(UPLOAD_TEMP_DIR):
+            if (entry.name.endswith('.part') and entry.name not in known
+                    and entry.stat().st_mtime < threshold.timestamp()):
+                os.remove(entry.path)
+                orphaned += 1
+    return len(stale), orphaned
@@ -0,0 +1,25 @@
+# catalog/context_processors.py
+from .favorites import favorites_count
+from .roles import get_role
+from .snapshots import SERVICE_WORKER
+
+
+def favorites(request):
+    """
+    Счётчик избранного для шапки. Передаётся функцией: шаблон вызывает её
+    только при выводе, поэтому страницы без шапки не обращаются к кэшу.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'favorites_count': lambda: favorites_count(user.pk)}
+
+
+def role(request):
+    """Роль и завод пользователя (catalog.roles) - вычисляются один раз на запрос"""
+    return {'role': get_role(request)}
+
+
+def service_worker(request):
+    """Включён ли офлайн-каталог (catalog.snapshots): main.js регистрирует service worker"""
+    return {'service_worker_enabled': SERVICE_WORKER}
@@ -0,0 +1,134 @@
+# catalog/currency.py
+"""
+Цены в валютах покупателя.
+
+Цена в базовой валюте хранится в Product.price, цены в остальных валютах -
+в ProductPrice (индекс (currency, price)), поэтому фильтр и сортировка
+в выбранной валюте идут по индексу, а не пересчётом по каждой строке.
+Смена курса - один UPDATE price = base_price * rate по всей валюте.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models import DecimalField, F, FilteredRelation, Q, Value
+from django.db.models.functions import Round
+
+from .models import CurrencyRate, Product, ProductPrice
+
+BASE_CURRENCY = getattr(settings, 'CATALOG_BASE_CURRENCY', 'USD')
+BASE_SYMBOL = getattr(settings, 'CATALOG_BASE_CURRENCY_SYMBOL', '$')
+SESSION_KEY = 'currency'
+
+_RATES_CACHE_KEY = 'catalog:currency:rates'
+# Сброс при изменении курса доходит только до кэша своего процесса (кэш в памяти),
+# поэтому курсы в кэше живут недолго: цены ProductPrice пересчитываются сразу
+_RATES_CACHE_TIMEOUT = 60
+_CENT = Decimal('0.01')
+
+
+def get_rates():
+    """{код: {'name', 'symbol', 'rate'}} - из кэша, сбрасывается при изменении курсов и по сроку"""
+    rates = cache.get(_RATES_CACHE_KEY)
+    if rates is None:
+        rates = {
+            code: {'name': name, 'symbol': symbol or code, 'rate': rate}
+            for code, name, symbol, rate in CurrencyRate.objects.values_list('code', 'name', 'symbol', 'rate')
+        }
+        cache.set(_RATES_CACHE_KEY, rates, _RATES_CACHE_TIMEOUT)
+    return rates
+
+
+def invalidate_rates():
+    cache.delete(_RATES_CACHE_KEY)
+
+
+def convert(amount, rate):
+    return (Decimal(amount) * rate).quantize(_CENT, rounding=ROUND_HALF_UP)
+
+
+def get_request_currency(request):
+    """
+    Валюта покупателя: ?currency=EUR запоминается в сессии.
+    Возвращает (код, символ, курс); для базовой валюты курс None.
+    """
+    rates = get_rates()
+    code = (request.GET.get('currency') or '').upper()
+    if code in rates or code == BASE_CURRENCY:
+        if code != request.session.get(SESSION_KEY):
+            request.session[SESSION_KEY] = code
+    else:
+        code = request.session.get(SESSION_KEY, BASE_CURRENCY)
+
+    if code in rates:
+        return code, rates[code]['symbol'], rates[code]['rate']
+    return BASE_CURRENCY, BASE_SYMBOL, None
+
+
+def with_local_price(queryset, code, relation='prices'):
+    """
+    Добавляет display_price и поле local_price__price для фильтра/сортировки.
+    Для базовой валюты - просто поле price. relation - путь к ProductPrice
+    (для ProductCard - 'product__prices').
+    """
+    if code == BASE_CURRENCY:
+        return queryset.annotate(display_price=F('price')), 'price'
+    queryset = queryset.annotate(
+        local_price=FilteredRelation(relation, condition=Q(**{f'{relation}__currency': code})),
+    ).annotate(display_price=F('local_price__price'))
+    return queryset, 'local_price__price'
+
+
+def sync_product_prices(product_ids, batch_size=1000):
+    """Обновляет цены товаров во всех валютах (после изменения Product.price)"""
+    rates = get_rates()
+    product_ids = list(product_ids)
+    if not rates or not product_ids:
+        return
+
+    for start in range(0, len(product_ids), batch_size):
+        rows = Product.objects.filter(id__in=product_ids[start:start + batch_size]).values_list('id', 'price')
+        prices = [
+            ProductPrice(
+                product_id=product_id,
+                currency=code,
+                base_price=price,
+                price=convert(price, currency['rate']),
+            )
+            for product_id, price in rows
+            for code, currency in rates.items()
+        ]
+        ProductPrice.objects.bulk_create(
+            prices,
+            update_conflicts=True,
+            unique_fields=['product', 'currency'],
+            update_fields=['base_price', 'price'],
+        )
+
+
+def reprice_currency(code, rate, batch_size=2000):
+    """
+    Пересчитывает каталог в валюте одним UPDATE; товары, у которых ещё нет
+    цены в этой валюте (новая валюта), досоздаются пакетами.
+    Возвращает (обновлено, создано).
+    """
+    with transaction.atomic(using=router.db_for_write(ProductPrice)):
+        updated = ProductPrice.objects.filter(currency=code).update(
+            price=Round(F('base_price') * Value(rate, output_field=DecimalField()), 2)
+        )
+        missing = Product.objects.exclude(prices__currency=code).values_list('id', 'price')
+        created = 0
+        batch = []
+        for product_id, price in missing.iterator(chunk_size=batch_size):
+            batch.append(ProductPrice(
+                product_id=product_id, currency=code, base_price=price, price=convert(price, rate)
+            ))
+            if len(batch) >= batch_size:
+                ProductPrice.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            ProductPrice.objects.bulk_create(batch)
+            created += len(batch)
+    return updated, created
@@ -0,0 +1,143 @@
+# catalog/favorites.py
+"""
+Избранное: постраничный список, счётчик для шапки, снятые с продажи товары.
+
+Страницы листаются по ключу (added_at, id) - индекс (user, -added_at, -id),
+поэтому страница у коллекционера с тысячами товаров стоит столько же,
+сколько первая. Счётчик в шапке хранится в кэше COUNT_TIMEOUT секунд и
+сбрасывается сигналами: при изменении избранного и при снятии товара
+с продажи или возврате в продажу.
+Избранное снятых с продажи товаров помечается stale_since пакетной
+командой prune_favorites и через срок удаляется ею же. С шардами каталога
+избранное лежит рядом с товаром, страница и счётчик собираются со всех шардов.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Favorite, Product
+from .sharding import across_shards, each_shard
+
+PAGE_SIZE = 24
+STALE_RETENTION_DAYS = getattr(settings, 'CATALOG_FAVORITES_STALE_DAYS', 30)
+# Счётчик считает только активные товары: срок ограничивает расхождение,
+# если товар изменили в обход сигналов (QuerySet.update, перенос между шардами)
+COUNT_TIMEOUT = getattr(settings, 'CATALOG_FAVORITES_COUNT_TIMEOUT', 300)
+
+
+def _count_key(user_id):
+    return f'catalog:favorites:count:{user_id}'
+
+
+def favorites_count(user_id):
+    """Число действующих избранных товаров пользователя (из кэша)"""
+    key = _count_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = across_shards(Favorite.objects.filter(user_id=user_id, product__is_active=True)).count()
+        cache.set(key, count, COUNT_TIMEOUT)
+    return count
+
+
+def invalidate_favorites_count(*user_ids):
+    cache.delete_many([_count_key(user_id) for user_id in user_ids])
+
+
+def invalidate_product_favorites(product_ids, batch_size=500):
+    """Сбрасывает счётчик у всех, кто добавил эти товары в избранное"""
+    product_ids = list(product_ids)
+    users = set()
+    for _ in each_shard():
+        for start in range(0, len(product_ids), batch_size):
+            users.update(Favorite.objects.filter(
+                product_id__in=product_ids[start:start + batch_size]
+            ).values_list('user_id', flat=True).distinct())
+    invalidate_favorites_count(*users)
+
+
+def encode_cursor(favorite):
+    return f'{favorite.added_at.isoformat()}_{favorite.pk}'
+
+
+def decode_cursor(cursor):
+    """(added_at, id) или None для некорректного курсора"""
+    added_at, _, pk = (cursor or '').rpartition('_')
+    try:
+        return datetime.fromisoformat(added_at), int(pk)
+    except ValueError:
+        return None
+
+
+def favorites_page(user, cursor=None, size=PAGE_SIZE):
+    """
+    Страница избранного после курсора: (избранное, курсор следующей страницы
+    или None). Товары, снятые с продажи, в список не попадают.
+    """
+    favorites = Favorite.objects.filter(
+        user=user, stale_since__isnull=True, product__is_active=True
+    ).select_related(
+        'product__category', 'product__material'
+    ).defer(
+        *(f'product__{name}' for name in Product.LISTING_DEFERRED),
+        'product__category__description',
+    ).order_by('-added_at', '-id')
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        added_at, pk = position
+        favorites = favorites.filter(Q(added_at__lt=added_at) | Q(added_at=added_at, id__lt=pk))
+
+    page = list(across_shards(favorites)[:size + 1])
+    if len(page) > size:
+        return page[:size], encode_cursor(page[size - 1])
+    return page, None
+
+
+def _mark(favorites, stale_since, batch_size, users):
+    """Проставляет stale_since пакетами по batch_size, возвращает число строк"""
+    marked = 0
+    while True:
+        rows = list(favorites.values_list('id', 'user_id')[:batch_size])
+        if not rows:
+            return marked
+        Favorite.objects.filter(id__in=[pk for pk, _ in rows]).update(stale_since=stale_since)
+        users.update(user_id for _, user_id in rows)
+        marked += len(rows)
+
+
+def flag_stale_favorites(batch_size=1000):
+    """
+    Помечает избранное неактивных товаров и снимает пометку с вернувшихся
+    в продажу. Возвращает (помечено, восстановлено).
+    """
+    users = set()
+    flagged = restored = 0
+    now = timezone.now()
+    for _ in each_shard():
+        flagged += _mark(
+            Favorite.objects.filter(stale_since__isnull=True, product__is_active=False),
+            now, batch_size, users,
+        )
+        restored += _mark(
+            Favorite.objects.filter(stale_since__isnull=False, product__is_active=True),
+            None, batch_size, users,
+        )
+    invalidate_favorites_count(*users)
+    return flagged, restored
+
+
+def prune_stale_favorites(older_than_days=STALE_RETENTION_DAYS, batch_size=1000):
+    """Удаляет избранное, помеченное устаревшим раньше older_than_days дней назад"""
+    threshold = timezone.now() - timedelta(days=older_than_days)
+    deleted = 0
+    for _ in each_shard():
+        stale = Favorite.objects.filter(stale_since__lt=threshold)
+        while True:
+            ids = list(stale.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += Favorite.objects.filter(id__in=ids).delete()[0]
+    return deleted
@@ -0,0 +1,193 @@
+# catalog/feeds.py
+"""
+Sitemap и товарный фид (Google Merchant, RSS 2.0) как статические файлы.
+
+Каталог делится на шарды по диапазону id товара (SHARD_SIZE id на шард).
+Для каждого шарда одним GROUP BY считается подпись (число товаров, число
+активных, последний updated_at); пересобираются только шарды, чья подпись
+изменилась с прошлого запуска. Файлы пишутся потоком из .iterator()
+в gzip и атомарно подменяются, так что веб-сервер всегда отдаёт целый файл.
+Шарды БД каталога (catalog.sharding) держат свои диапазоны id, поэтому
+подписи просто складываются, а товары диапазона читаются со всех шардов БД.
+"""
+import gzip
+import json
+import os
+from itertools import chain
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, Max, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Product
+from .sharding import all_shards, read_db
+
+SHARD_SIZE = 10000
+DESCRIPTION_LIMIT = 5000
+
+FEEDS_ROOT = Path(getattr(settings, 'CATALOG_FEEDS_ROOT', Path(settings.MEDIA_ROOT) / 'feeds'))
+FEEDS_URL = getattr(settings, 'CATALOG_FEEDS_URL', settings.MEDIA_URL + 'feeds/')
+SITE_URL = getattr(settings, 'CATALOG_SITE_URL', 'http://localhost:8000').rstrip('/')
+FEED_CURRENCY = getattr(settings, 'CATALOG_FEED_CURRENCY', 'USD')
+
+MANIFEST = 'manifest.json'
+SITEMAP_INDEX = 'sitemap.xml'
+
+
+def sitemap_name(shard):
+    return f'sitemap-products-{shard}.xml.gz'
+
+
+def merchant_name(shard):
+    return f'merchant-{shard}.xml.gz'
+
+
+def absolute_url(path):
+    if path.startswith(('http://', 'https://')):
+        return path
+    return f'{SITE_URL}{path}'
+
+
+def shard_signatures():
+    """{шард: подпись} по всем товарам, включая неактивные (деактивация меняет подпись)"""
+    signatures = {}
+    for alias in all_shards():
+        rows = Product.objects.using(read_db(Product, alias)).order_by().annotate(
+            shard=F('id') / SHARD_SIZE
+        ).values('shard').annotate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+            last_updated=Max('updated_at'),
+        )
+        for row in rows:
+            last_updated = row['last_updated'].isoformat() if row['last_updated'] else None
+            signature = signatures.setdefault(
+                str(row['shard']), {'total': 0, 'active': 0, 'last_updated': last_updated}
+            )
+            signature['total'] += row['total']
+            signature['active'] += row['active']
+            signature['last_updated'] = max(filter(None, [signature['last_updated'], last_updated]), default=None)
+    return signatures
+
+
+def _shard_products(shard):
+    start = int(shard) * SHARD_SIZE
+    products = Product.objects.filter(
+        id__gte=start, id__lt=start + SHARD_SIZE, is_active=True
+    ).select_related('factory', 'category', 'material').only(
+        'id', 'article', 'name', 'description', 'price', 'stock_quantity', 'updated_at',
+        'main_image_url', 'factory__name', 'category__name',
+        'material__material_type', 'material__purity',
+    ).order_by('id')
+    return chain.from_iterable(
+        products.using(read_db(Product, alias)).iterator(chunk_size=2000) for alias in all_shards()
+    )
+
+
+def _write_gzip(path, lines):
+    """Пишет строки в gzip во временный файл и атомарно подменяет path"""
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as stream:
+        for line in lines:
+            stream.write(line)
+    os.replace(tmp_path, path)
+
+
+def _sitemap_lines(shard):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for product in _shard_products(shard):
+        loc = absolute_url(reverse('catalog:product_detail', args=[product.article]))
+        yield (
+            f'<url><loc>{escape(loc)}</loc>'
+            f'<lastmod>{product.updated_at.date().isoformat()}</lastmod></url>\n'
+        )
+    yield '</urlset>\n'
+
+
+def _merchant_lines(shard):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0"><channel>\n'
+    yield f'<title>{escape(SITE_URL)}</title><link>{escape(SITE_URL)}/</link>\n'
+    for product in _shard_products(shard):
+        link = absolute_url(reverse('catalog:product_detail', args=[product.article]))
+        parts = [
+            f'<g:id>{escape(product.article)}</g:id>',
+            f'<title>{escape(product.name)}</title>',
+            f'<description>{escape(product.description[:DESCRIPTION_LIMIT])}</description>',
+            f'<link>{escape(link)}</link>',
+            f'<g:price>{product.price} {FEED_CURRENCY}</g:price>',
+            f'<g:availability>{"in_stock" if product.in_stock else "out_of_stock"}</g:availability>',
+            '<g:condition>new</g:condition>',
+            f'<g:brand>{escape(product.factory.name)}</g:brand>',
+            f'<g:product_type>{escape(product.category.name)}</g:product_type>',
+            f'<g:material>{escape(str(product.material))}</g:material>',
+        ]
+        if product.main_image_url:
+            parts.append(f'<g:image_link>{escape(absolute_url(product.main_image_url))}</g:image_link>')
+        yield f'<item>{"".join(parts)}</item>\n'
+    yield '</channel></rss>\n'
+
+
+def _write_sitemap_index(shards, signatures):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>\n',
+             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+    for shard in shards:
+        loc = absolute_url(FEEDS_URL + sitemap_name(shard))
+        lastmod = (signatures[shard]['last_updated'] or '')[:10]
+        lines.append(f'<sitemap><loc>{escape(loc)}</loc><lastmod>{lastmod}</lastmod></sitemap>\n')
+    lines.append('</sitemapindex>\n')
+
+    path = FEEDS_ROOT / SITEMAP_INDEX
+    tmp_path = path.with_suffix('.xml.tmp')
+    tmp_path.write_text(''.join(lines), encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def _load_manifest():
+    try:
+        return json.loads((FEEDS_ROOT / MANIFEST).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {'shards': {}}
+
+
+def build_feeds(full=False):
+    """
+    Пересобирает изменившиеся шарды (или все при full=True).
+    Возвращает (пересобранные шарды, всего шардов).
+    """
+    FEEDS_ROOT.mkdir(parents=True, exist_ok=True)
+    manifest = _load_manifest()
+    previous = manifest.get('shards', {})
+    current = shard_signatures()
+
+    rebuilt = []
+    for shard, signature in sorted(current.items(), key=lambda item: int(item[0])):
+        if not full and previous.get(shard) == signature:
+            continue
+        _write_gzip(FEEDS_ROOT / sitemap_name(shard), _sitemap_lines(shard))
+        _write_gzip(FEEDS_ROOT / merchant_name(shard), _merchant_lines(shard))
+        rebuilt.append(shard)
+
+    # Шарды, в которых не осталось товаров
+    for shard in set(previous) - set(current):
+        for name in (sitemap_name(shard), merchant_name(shard)):
+            (FEEDS_ROOT / name).unlink(missing_ok=True)
+
+    live_shards = sorted((shard for shard, sig in current.items() if sig['active']), key=int)
+    if rebuilt or set(previous) != set(current) or not (FEEDS_ROOT / SITEMAP_INDEX).exists():
+        _write_sitemap_index(live_shards, current)
+
+    manifest = {
+        'built_at': timezone.now().isoformat(),
+        'shards': current,
+        'merchant_feeds': [FEEDS_URL + merchant_name(shard) for shard in live_shards],
+    }
+    tmp_path = FEEDS_ROOT / (MANIFEST + '.tmp')
+    tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding='utf-8')
+    os.replace(tmp_path, FEEDS_ROOT / MANIFEST)
+
+    return rebuilt, len(current)
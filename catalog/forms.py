@@ -2,7 +2,16 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
+from django.core.exceptions import ValidationError
+from django.db import router, transaction
+from django.forms import modelformset_factory
+from django.utils import timezone
+from .history import batched_history, diff_image, diff_product
+from .image_hashes import hash_file
+from .images import deferred_main_image_refresh, delete_image_files_on_commit
 from .models import Factory, Product, ProductImage
+from .signals import products_bulk_updated
+from .uploads import LimitedImageField
 
 
 class FactoryRegistrationForm(UserCreationForm):
@@ -51,6 +60,7 @@ class FactoryProfileForm(forms.ModelForm):
             'email': 'Email',
             'logo': 'Логотип',
         }
+        field_classes = {'logo': LimitedImageField}
         widgets = {
             'description': forms.Textarea(attrs={'rows': 4}),
         }
@@ -108,6 +118,160 @@ class ProductImageForm(forms.ModelForm):
             'is_reference': '📏 Эталонное фото',
             'order': 'Порядок отображения',
         }
+        field_classes = {'image': LimitedImageField}
+
+
+class _PrefetchedModelChoiceField(forms.ModelChoiceField):
+    """Проверяет pk по уже загруженным объектам формсета вместо запроса на каждую строку"""
+
+    def __init__(self, objects, *args, **kwargs):
+        self._objects = objects
+        super().__init__(*args, **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self._objects[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+
+
+class BatchedModelFormSet(forms.BaseModelFormSet):
+    """Формсет, который загружает queryset одним запросом и сохраняет изменения пакетно"""
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        if not hasattr(self, '_objects_by_pk'):
+            self._objects_by_pk = {obj.pk: obj for obj in self.get_queryset()}
+        pk_name = self.model._meta.pk.name
+        field = form.fields[pk_name]
+        form.fields[pk_name] = _PrefetchedModelChoiceField(
+            self._objects_by_pk,
+            queryset=field.queryset,
+            initial=field.initial,
+            required=False,
+            widget=field.widget,
+        )
+
+
+class BaseProductImageFormSet(BatchedModelFormSet):
+    """Фото товара: одна транзакция, пакетные INSERT/UPDATE/DELETE"""
+
+    def save_batched(self, product, product_form=None):
+        """Сохраняет фото (и форму товара, если передана) одной транзакцией"""
+        to_create, to_update, to_delete = [], {}, []
+        uploaded = []
+        main_candidates = []
+
+        for form in self.forms:
+            instance = form.instance
+            if instance.pk and self._should_delete_form(form):
+                to_delete.append(instance)
+                continue
+            if instance.pk is None and not form.cleaned_data.get('image'):
+                # Пустая дополнительная форма
+                continue
+
+            if form.has_changed():
+                if instance.pk:
+                    to_update[instance.pk] = instance
+                else:
+                    instance.product = product
+                    to_create.append(instance)
+                if 'image' in form.changed_data:
+                    uploaded.append((instance, form.initial.get('image')))
+            if instance.is_main:
+                main_candidates.append((instance, 'is_main' in form.changed_data))
+
+        # Главное фото одно: приоритет у только что отмеченного
+        if main_candidates:
+            main = next((inst for inst, changed in main_candidates if changed), main_candidates[0][0])
+            for instance, _ in main_candidates:
+                if instance is not main:
+                    instance.is_main = False
+                    if instance.pk:
+                        to_update[instance.pk] = instance
+
+        # Файлы пишем до транзакции, чтобы не держать блокировку БД на время записи
+        written, replaced = [], []
+        for instance, old_file in uploaded:
+            instance.phash = hash_file(instance.image.file)
+            instance.image.save(instance.image.name, instance.image.file, save=False)
+            written.append(instance.image.name)
+            if old_file:
+                replaced.append(str(old_file))
+
+        try:
+            with transaction.atomic(using=router.db_for_write(Product)), batched_history('edit') as history:
+                if product_form is not None:
+                    product_form.save()
+                with deferred_main_image_refresh() as pending:
+                    if to_delete:
+                        ProductImage.objects.filter(pk__in=[image.pk for image in to_delete]).delete()
+                    if to_update:
+                        ProductImage.objects.bulk_update(
+                            to_update.values(), ['image', 'is_main', 'is_reference', 'order', 'phash']
+                        )
+                        for image in to_update.values():
+                            history.extend(diff_image(image))
+                    if to_create:
+                        ProductImage.objects.bulk_create(to_create)
+                        for image in to_create:
+                            history.extend(diff_image(image, created=True))
+                    pending.add(product.pk)
+                delete_image_files_on_commit([image.image.name for image in to_delete] + replaced)
+        except Exception:
+            storage = ProductImage._meta.get_field('image').storage
+            for name in written:
+                storage.delete(name)
+            raise
+
+
+ProductImageFormSet = modelformset_factory(
+    ProductImage, form=ProductImageForm, formset=BaseProductImageFormSet, extra=2, can_delete=True
+)
+
+
+class ProductBulkForm(forms.ModelForm):
+    """Строка массового редактирования товара"""
+    class Meta:
+        model = Product
+        fields = ['price', 'stock_quantity', 'is_active']
+        labels = {
+            'price': 'Цена ($)',
+            'stock_quantity': 'Остаток',
+            'is_active': 'Активен',
+        }
+        widgets = {
+            'price': forms.NumberInput(attrs={'step': '0.01', 'style': 'width: 7rem'}),
+            'stock_quantity': forms.NumberInput(attrs={'style': 'width: 5rem'}),
+        }
+
+
+class BaseProductBulkFormSet(BatchedModelFormSet):
+    """Массовое изменение цены, остатка и статуса одним UPDATE на пакет"""
+
+    def save_batched(self):
+        changed = [form.instance for form in self.forms if form.has_changed()]
+        now = timezone.now()
+        for product in changed:
+            product.updated_at = now
+        with transaction.atomic(using=router.db_for_write(Product)), batched_history('bulk_edit') as history:
+            Product.objects.bulk_update(
+                changed, ['price', 'stock_quantity', 'is_active', 'updated_at'], batch_size=500
+            )
+            for product in changed:
+                history.extend(diff_product(product, update_fields=self.form._meta.fields))
+        if changed:
+            products_bulk_updated.send(sender=Product, product_ids=[product.pk for product in changed])
+        return changed
+
+
+ProductBulkFormSet = modelformset_factory(
+    Product, form=ProductBulkForm, formset=BaseProductBulkFormSet,
+    extra=0, edit_only=True, max_num=1000, absolute_max=1000
+)
 
 
 class CustomerRegistrationForm(UserCreationForm):
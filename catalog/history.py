@@ -0,0 +1,296 @@
+# catalog/history.py
+"""
+Журнал изменений товаров и фото (ProductChange).
+
+Каждая запись - одно изменённое поле: старое и новое значение строкой.
+Исходные значения берутся из _loaded_values (Product.from_db /
+ProductImage.from_db), поэтому дифф не требует лишнего SELECT.
+Записи пишутся одним bulk_create в той же транзакции, что и изменение;
+внутри batched_history() сигналы только копят записи, а запись
+происходит один раз при выходе из блока.
+
+Старые записи сворачиваются (rollup_history) до одной на поле за день:
+объём истории ограничен «поля × дни», а не числом правок.
+"""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import router, transaction
+from django.db.models import Count
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Product, ProductChange
+
+PRODUCT_FIELDS = [
+    'name', 'category', 'material', 'price', 'stock_quantity', 'is_active',
+    'weight', 'size', 'has_stones', 'reference_photo_type',
+    'width_mm', 'height_mm', 'diameter_mm',
+]
+# Для нового товара пишем только поля, нужные для истории цены и наличия
+CREATED_PRODUCT_FIELDS = ['price', 'stock_quantity', 'is_active']
+IMAGE_FIELDS = ['image', 'is_main', 'is_reference', 'order']
+
+# Служебные значения поля field
+IMAGE_CREATED = 'image_created'
+IMAGE_DELETED = 'image_deleted'
+
+SOURCE_SAVE = 'save'
+SOURCE_ROLLUP = 'rollup'
+
+ROLLUP_AFTER_DAYS = getattr(settings, 'CATALOG_HISTORY_ROLLUP_DAYS', 90)
+RETENTION_DAYS = getattr(settings, 'CATALOG_HISTORY_RETENTION_DAYS', None)
+
+_local = threading.local()
+
+
+def _to_text(value):
+    return None if value is None else str(value)
+
+
+def _normalize(field, value):
+    """Значение в виде, как его хранит поле: 55 из формы и 55.00 из БД - одно и то же '55.00'"""
+    if isinstance(value, FieldFile):
+        return value.name
+    try:
+        value = field.to_python(value)
+    except ValidationError:
+        return value
+    places = getattr(field, 'decimal_places', None)
+    if isinstance(value, Decimal) and places is not None and value.is_finite():
+        value = value.quantize(Decimal(1).scaleb(-places))
+    return value
+
+
+def _loaded_value(instance, loaded, attname):
+    return _normalize(instance._meta.get_field(attname), loaded[attname])
+
+
+def _field_values(instance, names):
+    """{attname: (имя поля, текущее значение)}"""
+    values = {}
+    for name in names:
+        field = instance._meta.get_field(name)
+        values[field.attname] = (name, _normalize(field, getattr(instance, field.attname)))
+    return values
+
+
+def _entry(product_id, field, old, new, article='', image_id=None, changed_at=None):
+    return ProductChange(
+        product_id=product_id,
+        article=article,
+        image_id=image_id,
+        field=field,
+        old_value=_to_text(old),
+        new_value=_to_text(new),
+        source=current_source(),
+        changed_at=changed_at or timezone.now(),
+    )
+
+
+def _saved_fields(names, update_fields):
+    if update_fields is None:
+        return names
+    return [name for name in names if name in update_fields]
+
+
+def diff_product(product, update_fields=None, created=False):
+    """Записи об изменённых полях товара относительно загруженных значений"""
+    now = timezone.now()
+    if created:
+        return [
+            _entry(product.pk, name, None, value, product.article, changed_at=now)
+            for name, value in _field_values(product, CREATED_PRODUCT_FIELDS).values()
+        ]
+
+    loaded = getattr(product, '_loaded_values', None)
+    if loaded is None:
+        return []
+    names = _saved_fields(PRODUCT_FIELDS, update_fields)
+    changes = []
+    for attname, (name, value) in _field_values(product, names).items():
+        if attname not in loaded:
+            continue
+        old = _loaded_value(product, loaded, attname)
+        if old != value:
+            changes.append(_entry(product.pk, name, old, value, product.article, changed_at=now))
+    return changes
+
+
+def diff_image(image, created=False):
+    """Записи об изменениях фото; артикул дополняется при записи"""
+    now = timezone.now()
+    if created:
+        return [_entry(image.product_id, IMAGE_CREATED, None, image.image.name, image_id=image.pk, changed_at=now)]
+
+    loaded = getattr(image, '_loaded_values', None)
+    if loaded is None:
+        return []
+    changes = []
+    for attname, (name, value) in _field_values(image, IMAGE_FIELDS).items():
+        if attname not in loaded:
+            continue
+        old = _loaded_value(image, loaded, attname)
+        if old != value:
+            changes.append(_entry(image.product_id, name, old, value, image_id=image.pk, changed_at=now))
+    return changes
+
+
+def deleted_image(image):
+    return [_entry(image.product_id, IMAGE_DELETED, image.image.name, None, image_id=image.pk)]
+
+
+def remember_loaded(instance, names):
+    """После сохранения текущие значения становятся исходными для следующего диффа"""
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is None:
+        loaded = instance._loaded_values = {}
+    for attname, (name, value) in _field_values(instance, names).items():
+        loaded[attname] = value
+
+
+def track_product_save(product, created, update_fields=None):
+    """Журналирует сохранение товара (post_save)"""
+    record(diff_product(product, update_fields, created))
+    remember_loaded(product, _saved_fields(PRODUCT_FIELDS, update_fields))
+
+
+def track_image_save(image, created):
+    """Журналирует сохранение фото (post_save)"""
+    record(diff_image(image, created))
+    remember_loaded(image, IMAGE_FIELDS)
+
+
+def _fill_articles(entries):
+    """Артикулы для записей о фото - одним запросом"""
+    missing = {entry.product_id for entry in entries if not entry.article}
+    if not missing:
+        return
+    articles = dict(Product.objects.filter(id__in=missing).values_list('id', 'article'))
+    for entry in entries:
+        if not entry.article:
+            entry.article = articles.get(entry.product_id, '')
+
+
+def write_entries(entries, using=None):
+    """Пишет записи одним bulk_create (в текущей транзакции)"""
+    entries = list(entries)
+    if not entries:
+        return
+    _fill_articles(entries)
+    ProductChange.objects.using(using).bulk_create(entries, batch_size=1000)
+
+
+def record(entries):
+    """Пишет записи сейчас или в конце текущего batched_history()"""
+    pending = getattr(_local, 'entries', None)
+    if pending is not None:
+        pending.extend(entries)
+    else:
+        write_entries(entries)
+
+
+def current_source():
+    return getattr(_local, 'source', None) or SOURCE_SAVE
+
+
+@contextmanager
+def batched_history(source=SOURCE_SAVE):
+    """
+    Внутри блока записи истории копятся и пишутся одним bulk_create при
+    успешном выходе. Блок должен быть внутри transaction.atomic(), чтобы
+    история попала в ту же транзакцию. Возвращает список для ручных записей.
+    """
+    pending = getattr(_local, 'entries', None)
+    if pending is not None:
+        yield pending
+        return
+
+    _local.entries = pending = []
+    _local.source = source
+    try:
+        yield pending
+    finally:
+        _local.entries = None
+        _local.source = None
+    write_entries(pending)
+
+
+def field_history(article, field, since=None, limit=None):
+    """
+    [(дата, было, стало)] по артикулу и полю в хронологическом порядке.
+    Выборка - диапазон индекса (article, field, changed_at).
+    """
+    changes = ProductChange.objects.filter(article=article, field=field)
+    if since is not None:
+        changes = changes.filter(changed_at__gte=since)
+    changes = changes.values_list('changed_at', 'old_value', 'new_value')
+    if limit is None:
+        return list(changes.order_by('changed_at', 'id'))
+    # Последние limit записей, но по возрастанию даты
+    return list(changes.order_by('-changed_at', '-id')[:limit])[::-1]
+
+
+def price_history(article, since=None, limit=None):
+    """[(дата, старая цена, новая цена)] по артикулу; цены - Decimal"""
+    return [
+        (changed_at, Decimal(old) if old is not None else None, Decimal(new) if new is not None else None)
+        for changed_at, old, new in field_history(article, 'price', since=since, limit=limit)
+    ]
+
+
+def rollup_history(older_than_days=ROLLUP_AFTER_DAYS, retention_days=RETENTION_DAYS, batch_size=500):
+    """
+    Сворачивает записи старше older_than_days до одной на (товар, фото, поле, день):
+    остаётся последняя запись дня со значением «было» от первой. Правки,
+    вернувшие значение к исходному за день, удаляются целиком. Записи старше
+    retention_days (если задано) удаляются. Возвращает (свёрнуто, удалено).
+    """
+    now = timezone.now()
+    deleted = 0
+    if retention_days:
+        deleted, _ = ProductChange.objects.filter(changed_at__lt=now - timedelta(days=retention_days)).delete()
+
+    old = ProductChange.objects.filter(changed_at__lt=now - timedelta(days=older_than_days))
+    # Только товары, у которых есть что сворачивать (GROUP BY в БД)
+    product_ids = sorted({
+        product_id for product_id, count in old.annotate(day=TruncDate('changed_at')).values(
+            'product_id', 'image_id', 'field', 'day'
+        ).annotate(count=Count('id')).filter(count__gt=1).values_list('product_id', 'count')
+    })
+
+    rolled = 0
+    for start in range(0, len(product_ids), batch_size):
+        rows = old.filter(product_id__in=product_ids[start:start + batch_size]).order_by(
+            'product_id', 'image_id', 'field', 'changed_at', 'id'
+        ).values_list('id', 'product_id', 'image_id', 'field', 'changed_at', 'old_value', 'new_value')
+
+        groups = OrderedDict()
+        for row in rows:
+            key = (row[1], row[2], row[3], timezone.localdate(row[4]))
+            groups.setdefault(key, []).append(row)
+
+        keep, drop = [], []
+        for group in groups.values():
+            if len(group) == 1:
+                continue
+            first, last = group[0], group[-1]
+            drop.extend(row[0] for row in group[:-1])
+            if first[5] == last[6]:
+                drop.append(last[0])
+            else:
+                keep.append(ProductChange(id=last[0], old_value=first[5], source=SOURCE_ROLLUP))
+
+        with transaction.atomic(using=router.db_for_write(ProductChange)):
+            ProductChange.objects.bulk_update(keep, ['old_value', 'source'], batch_size=500)
+            for chunk_start in range(0, len(drop), 500):
+                ProductChange.objects.filter(id__in=drop[chunk_start:chunk_start + 500]).delete()
+        rolled += len(drop)
+
+    return rolled, deleted
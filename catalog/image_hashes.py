@@ -0,0 +1,284 @@
+# catalog/image_hashes.py
+"""
+Перцептивные хэши фото товаров: поиск дублей и визуально похожих.
+
+При загрузке фото Pillow уменьшает его до 32×32 в оттенках серого,
+от пикселей берётся DCT, и 64 бита хэша - это знаки низкочастотных
+коэффициентов относительно их медианы (pHash). Пересжатие, масштаб и
+небольшая цветокоррекция меняют лишь несколько бит, поэтому похожесть -
+расстояние Хэмминга. Хэш хранится в ProductImage.phash (знаковое
+64-битное число).
+
+Индекс - массивы NumPy в памяти воркера (id фото, товара, завода, хэш):
+поиск - XOR и подсчёт бит по всему массиву, на миллионе фото это
+единицы миллисекунд и ~30 МБ памяти. Изменения доходят до воркеров как
+в catalog.autocomplete: версия в общем кэше и id изменённых товаров.
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from PIL import Image
+
+from .models import Product, ProductCard, ProductImage
+from .sharding import all_shards, read_db
+
+# Не дальше - почти наверняка то же фото (пересжатое, уменьшенное)
+DUPLICATE_DISTANCE = getattr(settings, 'CATALOG_DUPLICATE_PHOTO_DISTANCE', 6)
+# Не дальше - визуально похожее
+SIMILAR_DISTANCE = getattr(settings, 'CATALOG_SIMILAR_PHOTO_DISTANCE', 12)
+
+HASH_SIZE = 8
+SAMPLE_SIZE = 32
+
+CHECK_INTERVAL = 1
+MAX_AGE = 3600
+INCREMENTAL_LIMIT = 2000
+
+VERSION_KEY = 'catalog:image_hashes:version'
+CHANGES_TIMEOUT = 24 * 3600
+
+
+def _dct_matrix(size):
+    """Матрица DCT-II: D @ X @ D.T - двумерное преобразование"""
+    n = np.arange(size)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size))
+    matrix[0] /= np.sqrt(2)
+    return matrix * np.sqrt(2 / size)
+
+
+DCT = _dct_matrix(SAMPLE_SIZE)
+
+
+def compute_phash(image):
+    """64-битный pHash изображения PIL - знаковое число для BigIntegerField"""
+    # JPEG декодируется сразу в уменьшенном виде - без полного разрешения в памяти
+    image.draft('L', (SAMPLE_SIZE * 4, SAMPLE_SIZE * 4))
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # Прозрачный фон (экспорт редактора) считаем белым
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, 'white')
+        image = Image.alpha_composite(background, image)
+    pixels = np.asarray(
+        image.convert('L').resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.Resampling.LANCZOS), dtype=np.float64
+    )
+    low = (DCT @ pixels @ DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    # Постоянная составляющая (средняя яркость) в медиану не входит
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view('>i8')[0])
+
+
+def hash_file(file):
+    """pHash файла (загруженного или из хранилища) или None, если это не изображение"""
+    try:
+        position = file.tell()
+    except (AttributeError, OSError, ValueError):
+        position = None
+    try:
+        with Image.open(file) as image:
+            return compute_phash(image)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    finally:
+        if position is not None:
+            file.seek(position)
+
+
+def hash_stored_images(rehash=False, batch_size=500):
+    """
+    Считает хэши фото текущего шарда из файлов хранилища: без хэша или,
+    при rehash, все. Возвращает число обработанных фото.
+    """
+    images = ProductImage.objects.order_by('id').only('id', 'image', 'phash')
+    if not rehash:
+        images = images.filter(phash=None)
+    done = 0
+    last_id = 0
+    while True:
+        batch = list(images.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return done
+        for image in batch:
+            try:
+                with image.image.open('rb') as file:
+                    image.phash = hash_file(file)
+            except OSError:
+                # Файла нет в хранилище
+                image.phash = None
+        ProductImage.objects.bulk_update(batch, ['phash'])
+        done += len(batch)
+        last_id = batch[-1].pk
+
+
+def _changes_key(version):
+    return f'catalog:image_hashes:changes:{version}'
+
+
+def current_version():
+    return cache.get(VERSION_KEY, 0)
+
+
+def mark_changed(product_ids=None):
+    """Фото товаров изменились (None - пересобрать индекс целиком)"""
+    if product_ids is not None:
+        product_ids = sorted(set(product_ids))
+        if not product_ids:
+            return
+        if len(product_ids) > INCREMENTAL_LIMIT:
+            product_ids = None
+    cache.add(VERSION_KEY, 0, None)
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+        version = 1
+    cache.set(_changes_key(version), product_ids, CHANGES_TIMEOUT)
+
+
+def mark_changed_on_commit(product_ids):
+    """mark_changed после фиксации: воркер не должен перечитать старые строки"""
+    product_ids = list(product_ids)
+    if product_ids:
+        transaction.on_commit(lambda: mark_changed(product_ids), using=router.db_for_write(ProductImage))
+
+
+def _load(product_ids=None):
+    """Массивы (id фото, id товара, id завода, хэш) со всех шардов"""
+    rows = []
+    for alias in all_shards():
+        images = ProductImage.objects.using(read_db(ProductImage, alias)).exclude(phash=None)
+        if product_ids is not None:
+            images = images.filter(product_id__in=product_ids)
+        rows.extend(
+            images.values_list('id', 'product_id', 'product__factory_id', 'phash').iterator(chunk_size=20000)
+        )
+    columns = np.array(rows, dtype=np.int64).reshape(-1, 4)
+    return columns[:, 0], columns[:, 1], columns[:, 2], columns[:, 3].view(np.uint64)
+
+
+class HashIndex:
+    """Массивы хэшей фото; обновление пересобирает массивы под блокировкой"""
+
+    def __init__(self, ids, product_ids, factory_ids, hashes):
+        self.lock = threading.Lock()
+        self.ids, self.product_ids, self.factory_ids, self.hashes = ids, product_ids, factory_ids, hashes
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nearest(self, phash, max_distance, limit=10, exclude_product=None):
+        """[(id фото, id товара, id завода, расстояние)] по возрастанию расстояния"""
+        query = np.array([phash], dtype=np.int64).view(np.uint64)[0]
+        with self.lock:
+            ids, product_ids, factory_ids, hashes = self.ids, self.product_ids, self.factory_ids, self.hashes
+        distances = np.bitwise_count(hashes ^ query)
+        mask = distances <= max_distance
+        if exclude_product is not None:
+            mask &= product_ids != exclude_product
+        found = np.flatnonzero(mask)
+        found = found[np.argsort(distances[found], kind='stable')]
+        results, seen = [], set()
+        for position in found:
+            # Товар - один раз, по ближайшему фото
+            product_id = int(product_ids[position])
+            if product_id in seen:
+                continue
+            seen.add(product_id)
+            results.append((int(ids[position]), product_id, int(factory_ids[position]), int(distances[position])))
+            if len(results) >= limit:
+                break
+        return results
+
+    def update(self, product_ids, loaded):
+        """Заменяет фото товаров product_ids строками loaded"""
+        with self.lock:
+            keep = ~np.isin(self.product_ids, list(product_ids))
+            self.ids, self.product_ids, self.factory_ids, self.hashes = (
+                np.concatenate((old[keep], new))
+                for old, new in zip((self.ids, self.product_ids, self.factory_ids, self.hashes), loaded)
+            )
+
+
+class _State:
+
+    def __init__(self):
+        self.index = None
+        self.version = 0
+        self.built_at = 0.0
+        self.checked_at = 0.0
+
+
+_state = _State()
+_lock = threading.Lock()
+
+
+def _refresh():
+    version = current_version()
+    now = time.monotonic()
+    if _state.index is not None and version == _state.version and now - _state.built_at < MAX_AGE:
+        return
+
+    if (_state.index is not None and 0 < version - _state.version <= INCREMENTAL_LIMIT
+            and now - _state.built_at < MAX_AGE):
+        missing = object()
+        changes = cache.get_many([_changes_key(v) for v in range(_state.version + 1, version + 1)])
+        product_ids = set()
+        for v in range(_state.version + 1, version + 1):
+            batch = changes.get(_changes_key(v), missing)
+            if batch is missing or batch is None:
+                product_ids = None
+                break
+            product_ids.update(batch)
+        if product_ids is not None and len(product_ids) <= INCREMENTAL_LIMIT:
+            _state.index.update(product_ids, _load(product_ids))
+            _state.version = version
+            return
+
+    _state.index = HashIndex(*_load())
+    _state.version = version
+    _state.built_at = now
+
+
+def get_index():
+    """Индекс воркера; версия в кэше проверяется не чаще CHECK_INTERVAL"""
+    now = time.monotonic()
+    if _state.index is None or now - _state.checked_at >= CHECK_INTERVAL:
+        with _lock:
+            if _state.index is None or now - _state.checked_at >= CHECK_INTERVAL:
+                _refresh()
+                _state.checked_at = now
+    return _state.index
+
+
+def _by_id(queryset, field, ids):
+    """Строки со всех шардов по списку id, в порядке ids"""
+    found = {}
+    for alias in all_shards():
+        rows = queryset.using(read_db(queryset.model, alias)).filter(**{f'{field}__in': ids})
+        found.update((getattr(obj, field), obj) for obj in rows)
+    return [found[pk] for pk in ids if pk in found]
+
+
+def find_duplicates(phash, exclude_product=None, limit=5):
+    """Товары с почти таким же фото: [(товар, расстояние)], свои и чужие"""
+    if phash is None:
+        return []
+    matches = get_index().nearest(phash, DUPLICATE_DISTANCE, limit, exclude_product)
+    distances = {product_id: distance for _, product_id, _, distance in matches}
+    products = _by_id(
+        Product.objects.select_related('factory').only('id', 'article', 'name', 'is_active', 'factory__name'),
+        'id', list(distances),
+    )
+    return [(product, distances[product.pk]) for product in products]
+
+
+def find_similar_cards(phash, exclude_product=None, limit=12):
+    """Карточки активных товаров с визуально похожим фото, ближайшие первыми"""
+    if phash is None:
+        return []
+    # С запасом: часть найденных товаров может быть снята с продажи
+    matches = get_index().nearest(phash, SIMILAR_DISTANCE, limit * 2, exclude_product)
+    return _by_id(ProductCard.objects.all(), 'product_id', [product_id for _, product_id, _, _ in matches])[:limit]
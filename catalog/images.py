@@ -0,0 +1,93 @@
+# catalog/images.py
+"""Поддержка денормализованного главного фото товара (Product.main_image) и файлов фото"""
+import threading
+from contextlib import contextmanager
+
+from django.db import router, transaction
+from django.utils import timezone
+
+from .image_hashes import mark_changed_on_commit
+from .models import Product, ProductCard, ProductImage
+
+
+def refresh_main_images(product_ids):
+    """
+    Пересчитывает main_image и main_image_url для товаров.
+    Главное фото - отмеченное is_main, иначе первое по порядку.
+    Вызывается сигналами ProductImage и явно после массовых операций
+    (bulk_update / QuerySet.delete), которые сигналы не отправляют.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+
+    main_images = {}
+    images = ProductImage.objects.filter(product_id__in=product_ids).order_by(
+        'product_id', '-is_main', 'order', 'uploaded_at', 'id'
+    ).values_list('product_id', 'id', 'image')
+    storage = ProductImage._meta.get_field('image').storage
+    for product_id, image_id, name in images:
+        if product_id not in main_images:
+            main_images[product_id] = (image_id, storage.url(name) if name else '')
+
+    now = timezone.now()
+    updates, cards = [], []
+    for product_id in product_ids:
+        image_id, url = main_images.get(product_id, (None, ''))
+        updates.append(Product(id=product_id, main_image_id=image_id, main_image_url=url, updated_at=now))
+        cards.append(ProductCard(product_id=product_id, main_image_url=url))
+    Product.objects.bulk_update(updates, ['main_image', 'main_image_url', 'updated_at'], batch_size=500)
+    # Карточки неактивных товаров отсутствуют - UPDATE их просто не затронет
+    ProductCard.objects.bulk_update(cards, ['main_image_url'], batch_size=500)
+    # Фото товаров менялись - индекс хэшей перечитает их
+    mark_changed_on_commit(product_ids)
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_main_image_refresh():
+    """
+    Внутри блока сигналы ProductImage только запоминают товары,
+    а main_image пересчитывается один раз при успешном выходе.
+    В блоке можно добавить товары вручную: pending.add(product_id).
+    """
+    pending = getattr(_deferred, 'product_ids', None)
+    if pending is not None:
+        # Вложенный блок - пересчитает внешний
+        yield pending
+        return
+
+    _deferred.product_ids = pending = set()
+    try:
+        yield pending
+    finally:
+        _deferred.product_ids = None
+    refresh_main_images(pending)
+
+
+def schedule_main_image_refresh(product_ids):
+    """Пересчёт сейчас или в конце текущего deferred_main_image_refresh()"""
+    pending = getattr(_deferred, 'product_ids', None)
+    if pending is not None:
+        pending.update(product_ids)
+    else:
+        refresh_main_images(product_ids)
+
+
+def delete_image_files_on_commit(names):
+    """Удаляет файлы фото из хранилища после фиксации транзакции"""
+    names = [name for name in names if name]
+    if not names:
+        return
+    storage = ProductImage._meta.get_field('image').storage
+
+    def cleanup():
+        for name in names:
+            try:
+                storage.delete(name)
+            except OSError:
+                pass
+
+    transaction.on_commit(cleanup, using=router.db_for_write(ProductImage))
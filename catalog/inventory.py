@@ -0,0 +1,264 @@
+# catalog/inventory.py
+"""
+Приём дельты остатков и цен из ERP завода.
+
+Строки читаются потоком (JSONL или CSV), группируются в пакеты по артикулу,
+для пакета делается один SELECT и один executemany UPDATE в транзакции.
+Неизменившиеся строки не пишутся, поэтому повторная загрузка того же файла
+ничего не меняет. Инвалидация кэшей/индексов - один сигнал
+products_bulk_updated на всю загрузку, а не на каждую строку (при обрыве
+загрузки - на уже зафиксированные пакеты).
+Товар из архива (catalog.archive) строка с is_active=1 возвращает
+в продажу, остальные строки по нему пропускаются со статусом archived.
+"""
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .archive import restore_articles
+from .history import batched_history, diff_product
+from .models import ArchivedProduct, FactoryApiToken, Product
+from .signals import products_bulk_updated
+
+FEED_FIELDS = ['price', 'stock_quantity', 'is_active']
+DEFAULT_CHUNK_SIZE = 2000
+MAX_PRICE = Decimal('99999999.99')
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'да', 'on'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'нет', 'off'}
+
+
+class FeedRowError(ValueError):
+    pass
+
+
+def get_token_factory(request):
+    """Завод по заголовку «Authorization: Token <ключ>» или None"""
+    header = request.headers.get('Authorization', '')
+    scheme, _, key = header.partition(' ')
+    if scheme.lower() != 'token' or not key.strip():
+        return None
+
+    token = FactoryApiToken.objects.select_related('factory').filter(
+        key_hash=FactoryApiToken.hash_key(key.strip())
+    ).first()
+    if token is None:
+        return None
+    FactoryApiToken.objects.filter(pk=token.pk).update(last_used_at=timezone.now())
+    return token.factory
+
+
+def iter_jsonl(lines):
+    """(номер строки, словарь | FeedRowError) из JSONL"""
+    for number, raw in enumerate(lines, 1):
+        try:
+            raw = raw.decode('utf-8-sig') if isinstance(raw, bytes) else raw
+        except UnicodeDecodeError:
+            yield number, FeedRowError('строка не в кодировке UTF-8')
+            continue
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            yield number, FeedRowError('некорректный JSON')
+            continue
+        if not isinstance(record, dict):
+            yield number, FeedRowError('ожидается JSON-объект')
+            continue
+        yield number, record
+
+
+def iter_csv(lines):
+    """
+    (номер строки, словарь) из CSV с заголовком article,price,stock_quantity,is_active.
+    Строка не в UTF-8 останавливает чтение: границы записей CSV за ней ненадёжны
+    """
+    decoded = (raw.decode('utf-8-sig') if isinstance(raw, bytes) else raw for raw in lines)
+    reader = csv.DictReader(decoded)
+    try:
+        for record in reader:
+            yield reader.line_num, record
+    except UnicodeDecodeError:
+        yield reader.line_num + 1, FeedRowError('строка не в кодировке UTF-8, дальше файл не читается')
+
+
+def clean_row(record):
+    """Возвращает (article, {поле: значение}) только для переданных полей"""
+    article = str(record.get('article') or '').strip()
+    if not article:
+        raise FeedRowError('не указан article')
+
+    changes = {}
+    price = record.get('price')
+    if price not in (None, ''):
+        try:
+            price = Decimal(str(price).replace(',', '.'))
+        except InvalidOperation:
+            raise FeedRowError('некорректная цена')
+        # NaN и Infinity - не цена (и NaN нельзя сравнивать)
+        if not price.is_finite():
+            raise FeedRowError('некорректная цена')
+        price = price.quantize(Decimal('0.01'))
+        if not Decimal('0') <= price <= MAX_PRICE:
+            raise FeedRowError('цена вне допустимого диапазона')
+        changes['price'] = price
+
+    stock = record.get('stock_quantity')
+    if stock not in (None, ''):
+        try:
+            stock = Decimal(str(stock).strip())
+        except InvalidOperation:
+            raise FeedRowError('некорректный остаток')
+        # 1.7 не округляем до 1 молча
+        if not stock.is_finite() or stock != stock.to_integral_value():
+            raise FeedRowError('остаток должен быть целым числом')
+        stock = int(stock)
+        if stock < 0:
+            raise FeedRowError('остаток не может быть отрицательным')
+        changes['stock_quantity'] = stock
+
+    is_active = record.get('is_active')
+    if is_active not in (None, ''):
+        if isinstance(is_active, bool):
+            changes['is_active'] = is_active
+        elif str(is_active).strip().lower() in TRUE_VALUES:
+            changes['is_active'] = True
+        elif str(is_active).strip().lower() in FALSE_VALUES:
+            changes['is_active'] = False
+        else:
+            raise FeedRowError('некорректный is_active')
+
+    return article, changes
+
+
+class FeedResult:
+    """Сводка загрузки: счётчики и построчные проблемы"""
+
+    def __init__(self):
+        self.rows = 0
+        self.counts = {'updated': 0, 'unchanged': 0, 'restored': 0, 'archived': 0, 'not_found': 0, 'error': 0}
+        self.problems = []
+        self.updated_ids = set()
+
+    def add(self, line, article, status, error=''):
+        self.counts[status] += 1
+        if status in ('archived', 'not_found', 'error'):
+            problem = {'line': line, 'article': article, 'status': status}
+            if error:
+                problem['error'] = error
+            self.problems.append(problem)
+
+    def as_dict(self):
+        problems = sorted(self.problems, key=lambda problem: problem['line'])
+        return {'rows': self.rows, **self.counts, 'problems': problems}
+
+
+def _write_products(products):
+    """
+    UPDATE по pk через executemany. Для тысяч строк в разы быстрее
+    bulk_update, который строит CASE WHEN на каждое поле и строку.
+    История изменений пишется в той же транзакции.
+    """
+    using = router.db_for_write(Product)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    fields = [Product._meta.get_field(name) for name in FEED_FIELDS + ['updated_at']]
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(Product._meta.db_table),
+        ', '.join(f'{quote(field.column)} = %s' for field in fields),
+        quote(Product._meta.pk.column),
+    )
+    params = [
+        [field.get_db_prep_save(getattr(product, field.attname), connection) for field in fields] + [product.pk]
+        for product in products
+    ]
+    with transaction.atomic(using=using), batched_history('feed') as history:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        for product in products:
+            history.extend(diff_product(product, update_fields=FEED_FIELDS))
+
+
+def _fetch_products(factory, articles):
+    return {
+        product.article: product
+        for product in Product.objects.filter(factory=factory, article__in=articles).only('id', 'article', *FEED_FIELDS)
+    }
+
+
+def _apply_chunk(factory, chunk, result):
+    products = _fetch_products(factory, {article for _, article, _ in chunk})
+
+    archived = set()
+    missing = {article for _, article, _ in chunk if article not in products}
+    if missing:
+        archived = set(
+            ArchivedProduct.objects.filter(factory=factory, article__in=missing).values_list('article', flat=True)
+        )
+    restored = set()
+    if archived:
+        reactivated = {article for _, article, changes in chunk if article in archived and changes.get('is_active')}
+        if reactivated and restore_articles(factory, reactivated, activate=True):
+            products.update(_fetch_products(factory, reactivated))
+            restored = reactivated & set(products)
+
+    changed = {}
+    for line, article, changes in chunk:
+        product = products.get(article)
+        if product is None:
+            result.add(line, article, 'archived' if article in archived else 'not_found')
+            continue
+        modified = False
+        for field, value in changes.items():
+            if getattr(product, field) != value:
+                setattr(product, field, value)
+                modified = True
+        if modified:
+            changed[product.pk] = product
+        if article in restored:
+            result.add(line, article, 'restored')
+        else:
+            result.add(line, article, 'updated' if modified else 'unchanged')
+
+    if changed:
+        now = timezone.now()
+        for product in changed.values():
+            product.updated_at = now
+        _write_products(changed.values())
+        result.updated_ids.update(changed)
+
+
+def apply_inventory_feed(factory, records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Применяет поток записей (номер строки, словарь) к товарам завода.
+    Каждый пакет - отдельная транзакция: при обрыве загрузки применённые
+    пакеты остаются, а повтор файла безопасен (идемпотентен).
+    """
+    result = FeedResult()
+    chunk = []
+    try:
+        for line, record in records:
+            result.rows += 1
+            if isinstance(record, Exception):
+                result.add(line, '', 'error', str(record))
+                continue
+            try:
+                article, changes = clean_row(record)
+            except FeedRowError as exc:
+                result.add(line, str(record.get('article') or ''), 'error', str(exc))
+                continue
+            chunk.append((line, article, changes))
+            if len(chunk) >= chunk_size:
+                _apply_chunk(factory, chunk, result)
+                chunk = []
+        if chunk:
+            _apply_chunk(factory, chunk, result)
+    finally:
+        # И при ошибке в середине: зафиксированные пакеты должны дойти до карточек и цен
+        if result.updated_ids:
+            products_bulk_updated.send(sender=Product, product_ids=result.updated_ids)
+    return result
@@ -0,0 +1,34 @@
+# catalog/lookups.py
+"""
+Справочники для фильтров каталога (категории, материалы) из кэша.
+Сбрасываются сигналами при изменении; прогреваются catalog.warmup.
+Срок хранения конечный: с кэшем в памяти процесса сигнал сбрасывает
+только кэш воркера, где сохранили изменение.
+"""
+from django.core.cache import cache
+
+from .models import Category, Material
+
+CATEGORIES_KEY = 'catalog:lookups:categories'
+MATERIALS_KEY = 'catalog:lookups:materials'
+LOOKUPS_TIMEOUT = 300
+
+
+def get_categories():
+    categories = cache.get(CATEGORIES_KEY)
+    if categories is None:
+        categories = list(Category.objects.all())
+        cache.set(CATEGORIES_KEY, categories, LOOKUPS_TIMEOUT)
+    return categories
+
+
+def get_materials():
+    materials = cache.get(MATERIALS_KEY)
+    if materials is None:
+        materials = list(Material.objects.all())
+        cache.set(MATERIALS_KEY, materials, LOOKUPS_TIMEOUT)
+    return materials
+
+
+def invalidate_lookups():
+    cache.delete_many([CATEGORIES_KEY, MATERIALS_KEY])
@@ -0,0 +1,26 @@
+# catalog/management/commands/archive_products.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.archive import ARCHIVE_AFTER_DAYS, archive_inactive
+from catalog.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = 'Переносит давно неактивные товары и метаданные их фото в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=ARCHIVE_AFTER_DAYS,
+                            help='Архивировать товары, неактивные и не менявшиеся N дней')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Сколько товаров переносить одной транзакцией')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        archived = sum(
+            archive_inactive(options['older_than'], options['batch_size']) for _ in each_shard()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: в архив перенесено {archived} товаров за {time.monotonic() - started:.1f} с'
+        ))
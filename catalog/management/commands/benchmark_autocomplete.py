@@ -0,0 +1,95 @@
+# catalog/management/commands/benchmark_autocomplete.py
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from catalog.autocomplete import CatalogIndex, build_index
+
+WORDS = [
+    'кольцо', 'серьги', 'подвеска', 'браслет', 'колье', 'цепь', 'брошь', 'пусеты',
+    'золотое', 'серебряное', 'обручальное', 'помолвочное', 'классическое', 'детское',
+    'с', 'бриллиантом', 'фианитом', 'изумрудом', 'сапфиром', 'рубином', 'жемчугом',
+    'топазом', 'гранатом', 'эмалью', 'родированием', 'гравировкой', 'узором', 'сердцем',
+]
+
+
+def synthetic_entries(count, seed=1):
+    """Записи товаров как в build_index: {id: (название, артикул, вес)}"""
+    rnd = random.Random(seed)
+    return {
+        product_id: (
+            ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(2, 5))).capitalize(),
+            f'{rnd.randint(1, 300)}-{product_id:06d}',
+            rnd.random(),
+        )
+        for product_id in range(1, count + 1)
+    }
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = 'Замеряет задержку подсказок поиска и память индекса (синтетический или текущий каталог)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=100_000,
+                            help='Число синтетических товаров')
+        parser.add_argument('--queries', type=int, default=20_000,
+                            help='Число запросов')
+        parser.add_argument('--catalog', action='store_true',
+                            help='Индекс из текущей БД вместо синтетических данных')
+
+    def handle(self, *args, **options):
+        def build():
+            if options['catalog']:
+                return build_index()
+            return CatalogIndex(synthetic_entries(options['entries']), [], [])
+
+        started = time.perf_counter()
+        index = build()
+        build_seconds = time.perf_counter() - started
+
+        # Память - отдельной сборкой: tracemalloc замедляет её в разы
+        del index
+        tracemalloc.start()
+        index = build()
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        rnd = random.Random(2)
+        queries = []
+        for _ in range(options['queries']):
+            key = rnd.choice(index.products.keys)
+            queries.append(key[:rnd.randint(2, min(8, len(key)))] if len(key) > 2 else key)
+
+        timings = []
+        for query in queries:
+            started = time.perf_counter_ns()
+            index.search(query)
+            timings.append((time.perf_counter_ns() - started) / 1000)
+
+        # Инкрементальное обновление: 100 изменённых товаров
+        products = list(index.products.entries)[:100]
+        started = time.perf_counter()
+        index.products.update({
+            product_id: (f'Новое название {product_id}', f'1-{product_id:06d}', 0.0)
+            for product_id in products
+        })
+        update_ms = (time.perf_counter() - started) * 1000
+
+        per_100k = memory / max(len(index), 1) * 100_000
+        self.stdout.write(
+            f'Записей: {len(index)}, ключей: {len(index.products.keys)}\n'
+            f'Сборка: {build_seconds:.2f} с, память: {memory / 1e6:.1f} МБ '
+            f'({per_100k / 1e6:.1f} МБ на 100 тыс. записей)\n'
+            f'Поиск, мкс: медиана {statistics.median(timings):.1f}, '
+            f'p99 {percentile(timings, 0.99):.1f}, максимум {max(timings):.1f}\n'
+            f'Обновление {len(products)} товаров: {update_ms:.1f} мс'
+        )
+        self.stdout.write(self.style.SUCCESS('Готово'))
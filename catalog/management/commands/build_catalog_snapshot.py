@@ -0,0 +1,17 @@
+# catalog/management/commands/build_catalog_snapshot.py
+from django.core.management.base import BaseCommand
+
+from catalog.snapshots import SNAPSHOT_PRODUCTS, SNAPSHOTS_ROOT, build_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Собирает JSON-снимок каталога для офлайн-режима (service worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=SNAPSHOT_PRODUCTS, help='Товаров в снимке')
+
+    def handle(self, *args, **options):
+        manifest = build_snapshot(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: версия {manifest["version"]}, товаров {manifest["count"]} ({SNAPSHOTS_ROOT})'
+        ))
@@ -0,0 +1,21 @@
+# catalog/management/commands/build_feeds.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.feeds import FEEDS_ROOT, build_feeds
+
+
+class Command(BaseCommand):
+    help = 'Собирает sitemap и товарный фид (только изменившиеся шарды)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Пересобрать все шарды')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rebuilt, total = build_feeds(full=options['full'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: пересобрано {len(rebuilt)} из {total} шардов за {elapsed:.1f} с ({FEEDS_ROOT})'
+        ))
@@ -0,0 +1,25 @@
+# catalog/management/commands/hash_product_images.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.image_hashes import hash_stored_images, mark_changed
+from catalog.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = 'Считает перцептивные хэши фото товаров, загруженных до появления индекса дублей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rehash', action='store_true',
+                            help='Пересчитать хэши всех фото, а не только отсутствующие')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Сколько фото сохранять за один запрос')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        hashed = sum(hash_stored_images(options['rehash'], options['batch_size']) for _ in each_shard())
+        mark_changed()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {hashed} фото за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,23 @@
+# catalog/management/commands/issue_api_token.py
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.models import Factory, FactoryApiToken
+
+
+class Command(BaseCommand):
+    help = 'Выпускает API-ключ завода для загрузки остатков и цен из ERP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('factory_id', type=int, help='ID завода')
+        parser.add_argument('--name', default='', help='Название ключа (например, "1C")')
+
+    def handle(self, *args, **options):
+        try:
+            factory = Factory.objects.get(pk=options['factory_id'])
+        except Factory.DoesNotExist:
+            raise CommandError(f'Завод {options["factory_id"]} не найден')
+
+        token, key = FactoryApiToken.issue(factory, name=options['name'])
+        self.stdout.write(self.style.SUCCESS(f'Ключ для "{factory}" создан (id={token.pk}).'))
+        self.stdout.write('Сохраните его - повторно он не показывается:')
+        self.stdout.write(key)
@@ -0,0 +1,52 @@
+# catalog/management/commands/load_currency_rates.py
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.models import CurrencyRate
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает курсы валют из файла и пересчитывает цены каталога. '
+        'JSON: {"EUR": {"rate": "0.92", "name": "Евро", "symbol": "€"}}; '
+        'CSV: code,rate,name,symbol'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к .json или .csv файлу')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        try:
+            if path.suffix.lower() == '.json':
+                data = json.loads(path.read_text(encoding='utf-8'))
+                rows = [dict(values, code=code) for code, values in data.items()]
+            else:
+                with path.open(encoding='utf-8-sig', newline='') as stream:
+                    rows = list(csv.DictReader(stream))
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Не удалось прочитать {path}: {exc}')
+
+        for row in rows:
+            code = str(row.get('code', '')).strip().upper()
+            try:
+                rate = Decimal(str(row['rate']))
+            except (KeyError, InvalidOperation):
+                raise CommandError(f'Некорректный курс для {code or row}')
+            if len(code) != 3 or rate <= 0:
+                raise CommandError(f'Некорректная строка: {row}')
+
+            currency, created = CurrencyRate.objects.get_or_create(
+                code=code,
+                defaults={'name': row.get('name') or code, 'symbol': row.get('symbol') or '', 'rate': rate},
+            )
+            if not created and currency.rate != rate:
+                currency.rate = rate
+                currency.save()
+            self.stdout.write(f'{code}: {rate}')
+
+        self.stdout.write(self.style.SUCCESS(f'Загружено курсов: {len(rows)}'))
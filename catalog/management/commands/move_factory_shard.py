@@ -0,0 +1,114 @@
+# catalog/management/commands/move_factory_shard.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from catalog.autocomplete import mark_changed
+from catalog.history import batched_history
+from catalog.images import deferred_main_image_refresh
+from catalog.models import (
+    ArchivedProduct, ArchivedProductImage, Factory, Favorite, Product, ProductActivity, ProductCard,
+    ProductChange, ProductImage, ProductPrice,
+)
+from catalog.sharding import SHARDS, all_shards, insert_rows, shard_for_factory, use_shard
+
+# Что переносится вместе с товаром. SimilarProduct не переносится:
+# соседи ищутся внутри шарда, их пересчитает rebuild_similar_products
+MOVED_MODELS = [
+    (Product, 'id'), (ProductImage, 'product_id'), (ProductPrice, 'product_id'),
+    (ProductActivity, 'product_id'), (ProductChange, 'product_id'), (Favorite, 'product_id'),
+    (ProductCard, 'product_id'),
+]
+ARCHIVE_MODELS = [(ArchivedProduct, 'id'), (ArchivedProductImage, 'product_id'), (ProductChange, 'product_id')]
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит товары завода со всеми связанными строками в другой шард каталога. '
+        'На время переноса правки товаров завода (кабинет, фид остатков) нужно остановить'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('factory_id', type=int)
+        parser.add_argument('shard', help=f'Алиас БД: {DEFAULT_DB_ALIAS} или один из CATALOG_SHARDS')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Сколько товаров переносить за один шаг')
+
+    def _copy(self, model, queryset, target, batch_size):
+        copied = 0
+        batch = []
+        for instance in queryset.iterator(chunk_size=batch_size):
+            batch.append(instance)
+            if len(batch) >= batch_size:
+                insert_rows(model, batch, target, batch_size)
+                copied += len(batch)
+                batch = []
+        if batch:
+            insert_rows(model, batch, target, batch_size)
+            copied += len(batch)
+        return copied
+
+    def handle(self, *args, **options):
+        if not SHARDS:
+            raise CommandError('Шарды не настроены (AUROOM_DB_SHARDS)')
+        try:
+            factory = Factory.objects.using(DEFAULT_DB_ALIAS).get(pk=options['factory_id'])
+        except Factory.DoesNotExist:
+            raise CommandError(f'Завод {options["factory_id"]} не найден')
+
+        source, target = shard_for_factory(factory), options['shard']
+        if target not in all_shards():
+            raise CommandError(f'Неизвестный шард {target}')
+        if source == target:
+            raise CommandError(f'Завод уже в шарде {target}')
+        if not Factory.objects.using(target).filter(pk=factory.pk).exists():
+            raise CommandError(f'Справочников нет в шарде {target}: выполните sync_catalog_shards')
+
+        started = time.monotonic()
+        batch_size = options['batch_size']
+        product_ids = list(Product.objects.using(source).filter(factory=factory).values_list('id', flat=True))
+        archived_ids = list(
+            ArchivedProduct.objects.using(source).filter(factory=factory).values_list('id', flat=True)
+        )
+
+        # Копия - одной транзакцией: внешние ключи (главное фото) проверяются при фиксации
+        copied = 0
+        with transaction.atomic(using=target):
+            for start in range(0, len(product_ids), batch_size):
+                batch = product_ids[start:start + batch_size]
+                for model, field in MOVED_MODELS:
+                    queryset = model.objects.using(source).filter(**{f'{field}__in': batch}).order_by('pk')
+                    copied += self._copy(model, queryset, target, batch_size)
+            for start in range(0, len(archived_ids), batch_size):
+                batch = archived_ids[start:start + batch_size]
+                for model, field in ARCHIVE_MODELS:
+                    queryset = model.objects.using(source).filter(**{f'{field}__in': batch}).order_by('pk')
+                    copied += self._copy(model, queryset, target, batch_size)
+
+        # С этого момента товары читаются из нового шарда
+        factory.shard = '' if target == DEFAULT_DB_ALIAS else target
+        factory.save(update_fields=['shard'])
+
+        # Удаление из старого шарда: история и главные фото не пересчитываются -
+        # товары уже живут в новом шарде
+        with use_shard(source):
+            for start in range(0, len(product_ids), batch_size):
+                batch = product_ids[start:start + batch_size]
+                with transaction.atomic(using=source), batched_history() as history, \
+                        deferred_main_image_refresh() as pending:
+                    Product.objects.using(source).filter(id__in=batch).delete()
+                    ProductChange.objects.using(source).filter(product_id__in=batch).delete()
+                    history.clear()
+                    pending.clear()
+            for start in range(0, len(archived_ids), batch_size):
+                batch = archived_ids[start:start + batch_size]
+                with transaction.atomic(using=source):
+                    ArchivedProduct.objects.using(source).filter(id__in=batch).delete()
+                    ProductChange.objects.using(source).filter(product_id__in=batch).delete()
+        mark_changed(product_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {len(product_ids)} товаров ({copied} строк) из {source} в {target} '
+            f'за {time.monotonic() - started:.1f} с. Запустите rebuild_similar_products'
+        ))
@@ -0,0 +1,21 @@
+# catalog/management/commands/prune_favorites.py
+from django.core.management.base import BaseCommand
+
+from catalog.favorites import STALE_RETENTION_DAYS, flag_stale_favorites, prune_stale_favorites
+
+
+class Command(BaseCommand):
+    help = 'Помечает избранное снятых с продажи товаров и удаляет давно помеченное'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=STALE_RETENTION_DAYS,
+                            help='Удалять избранное, помеченное больше N дней назад')
+        parser.add_argument('--flag-only', action='store_true',
+                            help='Только пометить, ничего не удалять')
+
+    def handle(self, *args, **options):
+        flagged, restored = flag_stale_favorites()
+        deleted = 0 if options['flag_only'] else prune_stale_favorites(options['older_than'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: помечено {flagged}, восстановлено {restored}, удалено {deleted}'
+        ))
@@ -0,0 +1,18 @@
+# catalog/management/commands/prune_uploads.py
+from django.core.management.base import BaseCommand
+
+from catalog.chunked_uploads import UPLOAD_TTL_HOURS, prune_uploads
+
+
+class Command(BaseCommand):
+    help = 'Удаляет брошенные загрузки фото частями и их временные файлы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=UPLOAD_TTL_HOURS,
+                            help='Удалять загрузки без новых частей дольше N часов')
+
+    def handle(self, *args, **options):
+        uploads, orphaned = prune_uploads(options['older_than'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: удалено загрузок {uploads}, ничьих файлов {orphaned}'
+        ))
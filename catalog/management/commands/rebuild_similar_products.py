@@ -0,0 +1,33 @@
+# catalog/management/commands/rebuild_similar_products.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.recommendations import DEFAULT_CHUNK_SIZE, DEFAULT_TOP_K, rebuild_similar_products
+from catalog.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает похожие товары (top-K соседей) для всех активных товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K,
+                            help='Сколько похожих товаров хранить на товар')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Сколько строк матрицы сходства считать за один шаг')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        products = links = 0
+        # Соседи ищутся внутри шарда каталога: связи между шардами невозможны
+        for _ in each_shard():
+            shard_products, shard_links = rebuild_similar_products(
+                top_k=options['top_k'],
+                chunk_size=options['chunk_size'],
+            )
+            products += shard_products
+            links += shard_links
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {products} товаров, {links} связей за {elapsed:.1f} с'
+        ))
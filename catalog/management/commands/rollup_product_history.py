@@ -0,0 +1,25 @@
+# catalog/management/commands/rollup_product_history.py
+from django.core.management.base import BaseCommand
+
+from catalog.history import RETENTION_DAYS, ROLLUP_AFTER_DAYS, rollup_history
+from catalog.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = 'Сворачивает старую историю изменений товаров до одной записи на поле за день'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=ROLLUP_AFTER_DAYS,
+                            help='Сворачивать записи старше N дней')
+        parser.add_argument('--retention', type=int, default=RETENTION_DAYS,
+                            help='Удалять записи старше N дней (по умолчанию - хранить всё)')
+
+    def handle(self, *args, **options):
+        rolled = deleted = 0
+        for _ in each_shard():
+            shard_rolled, shard_deleted = rollup_history(options['older_than'], options['retention'])
+            rolled += shard_rolled
+            deleted += shard_deleted
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: свёрнуто {rolled} записей, удалено по сроку хранения {deleted}'
+        ))
@@ -0,0 +1,55 @@
+# catalog/management/commands/sync_catalog_shards.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from catalog.sharding import MIRRORED_MODELS, SHARDS, mirror, reserve_id_ranges, unmirror
+
+
+class Command(BaseCommand):
+    help = (
+        'Готовит шарды каталога после migrate --database: сдвигает счётчики id '
+        'и копирует справочники (пользователи, заводы, категории, материалы)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Сколько строк копировать за один запрос')
+
+    def handle(self, *args, **options):
+        if not SHARDS:
+            raise CommandError('Шарды не настроены (AUROOM_DB_SHARDS)')
+
+        started = time.monotonic()
+        for alias in SHARDS:
+            if not reserve_id_ranges(alias):
+                raise CommandError(f'{alias}: СУБД {connections[alias].vendor} не поддерживается')
+
+        batch_size = options['batch_size']
+        for model in MIRRORED_MODELS:
+            # Строки, удалённые из основной БД мимо сигналов - до копирования,
+            # иначе новая строка с тем же username/slug нарушит уникальность
+            existing = set(model.objects.using(DEFAULT_DB_ALIAS).values_list('pk', flat=True))
+            removed = 0
+            for alias in SHARDS:
+                stale = set(model.objects.using(alias).values_list('pk', flat=True)) - existing
+                for pk in stale:
+                    unmirror(model, pk, aliases=[alias])
+                removed += len(stale)
+
+            copied = 0
+            batch = []
+            for instance in model.objects.using(DEFAULT_DB_ALIAS).order_by('pk').iterator(chunk_size=batch_size):
+                batch.append(instance)
+                if len(batch) >= batch_size:
+                    mirror(model, batch)
+                    copied += len(batch)
+                    batch = []
+            mirror(model, batch)
+            copied += len(batch)
+            self.stdout.write(f'{model._meta.verbose_name_plural}: скопировано {copied}, удалено {removed}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {len(SHARDS)} шардов за {time.monotonic() - started:.1f} с'
+        ))
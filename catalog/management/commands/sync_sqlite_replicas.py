@@ -0,0 +1,36 @@
+# catalog/management/commands/sync_sqlite_replicas.py
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную SQLite-БД в файлы реплик (локальная проверка catalog.routers)'
+
+    def handle(self, *args, **options):
+        databases = settings.DATABASES
+        replicas = getattr(settings, 'CATALOG_DB_REPLICAS', [])
+        if not replicas:
+            raise CommandError('Реплики не настроены (AUROOM_DB_REPLICAS)')
+        for alias in [DEFAULT_DB_ALIAS, *replicas]:
+            if not databases[alias]['ENGINE'].endswith('sqlite3'):
+                raise CommandError(f'{alias}: команда только для SQLite, у других СУБД своя репликация')
+
+        started = time.monotonic()
+        source = sqlite3.connect(databases[DEFAULT_DB_ALIAS]['NAME'])
+        try:
+            for alias in replicas:
+                target = sqlite3.connect(databases[alias]['NAME'])
+                try:
+                    # Backup API даёт согласованную копию даже при открытых соединениях
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: скопировано в {len(replicas)} реплик за {time.monotonic() - started:.2f} с'
+        ))
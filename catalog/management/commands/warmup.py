@@ -0,0 +1,63 @@
+# catalog/management/commands/warmup.py
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.warmup import warm_up
+
+# Холодный старт меряется в новых процессах: текущий уже всё импортировал
+MANAGE_SCRIPT = '''
+import json, time
+started = time.perf_counter()
+import django
+django.setup()
+print(json.dumps(round(time.perf_counter() - started, 4)))
+'''
+WSGI_SCRIPT = '''
+import json
+import auroom.wsgi
+from catalog.warmup import STARTUP
+print(json.dumps(STARTUP))
+'''
+
+
+def _run(script):
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'auroom.settings')
+    result = subprocess.run(
+        [sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise CommandError(f'Процесс не запустился:\n{result.stderr}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class Command(BaseCommand):
+    help = 'Прогревает шаблоны, URL и кэши; с --cold замеряет холодный старт процесса'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cold', action='store_true',
+                            help='Замерить импорт manage.py/WSGI и прогрев в новом процессе')
+        parser.add_argument('--budget', type=float,
+                            help='Ошибка, если холодный старт WSGI дольше N секунд')
+
+    def handle(self, *args, **options):
+        if not options['cold']:
+            timings = warm_up()
+            self.stdout.write(self.style.SUCCESS(f'Готово: {timings}'))
+            return
+
+        setup_seconds = _run(MANAGE_SCRIPT)
+        wsgi = _run(WSGI_SCRIPT)
+        self.stdout.write(
+            f"manage.py (django.setup): {setup_seconds:.3f} с\n"
+            f"WSGI: импорт {wsgi['import']:.3f} с, всего с прогревом {wsgi['total']:.3f} с\n"
+            f"Прогрев по шагам: {wsgi['warmup']}"
+        )
+        if options['budget'] is not None and wsgi['total'] > options['budget']:
+            raise CommandError(f"Холодный старт {wsgi['total']:.3f} с превышает бюджет {options['budget']} с")
+        self.stdout.write(self.style.SUCCESS('Готово'))
@@ -0,0 +1,58 @@
+# Generated by Django 5.1 on 2026-10-19 15:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_similarproduct'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(verbose_name='Начало интервала')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотры')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='Добавления в избранное')),
+            ],
+            options={
+                'verbose_name': 'Активность товара',
+                'verbose_name_plural': 'Активность товаров',
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='popularity_score',
+            field=models.FloatField(default=0, verbose_name='Популярность'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='trending_score',
+            field=models.FloatField(default=0, verbose_name='Тренд недели'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', '-popularity_score'], name='catalog_pro_is_acti_67d2a3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', '-trending_score'], name='catalog_pro_is_acti_6cb6ea_idx'),
+        ),
+        migrations.AddField(
+            model_name='productactivity',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='catalog.product', verbose_name='Товар'),
+        ),
+        migrations.AddIndex(
+            model_name='productactivity',
+            index=models.Index(fields=['bucket'], name='catalog_pro_bucket_42a44d_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='productactivity',
+            unique_together={('product', 'bucket')},
+        ),
+    ]
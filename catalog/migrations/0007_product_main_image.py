@@ -0,0 +1,44 @@
+# Generated by Django 5.1 on 2026-10-19 15:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_main_images(apps, schema_editor):
+    """Заполняет главное фото для уже существующих товаров"""
+    Product = apps.get_model('catalog', 'Product')
+    ProductImage = apps.get_model('catalog', 'ProductImage')
+    storage = ProductImage._meta.get_field('image').storage
+    db_alias = schema_editor.connection.alias
+
+    main_images = {}
+    images = ProductImage.objects.using(db_alias).order_by(
+        'product_id', '-is_main', 'order', 'uploaded_at', 'id'
+    ).values_list('product_id', 'id', 'image')
+    for product_id, image_id, name in images.iterator():
+        if product_id not in main_images:
+            main_images[product_id] = Product(
+                id=product_id, main_image_id=image_id, main_image_url=storage.url(name) if name else ''
+            )
+    Product.objects.using(db_alias).bulk_update(main_images.values(), ['main_image', 'main_image_url'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_productactivity_product_popularity_score_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='main_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog.productimage', verbose_name='Главное фото'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='main_image_url',
+            field=models.CharField(blank=True, editable=False, max_length=300, verbose_name='URL главного фото'),
+        ),
+        migrations.RunPython(fill_main_images, migrations.RunPython.noop),
+    ]
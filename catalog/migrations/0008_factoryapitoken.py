@@ -0,0 +1,30 @@
+# Generated by Django 5.1 on 2026-10-19 15:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_product_main_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FactoryApiToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=100, verbose_name='Название')),
+                ('key_hash', models.CharField(editable=False, max_length=64, unique=True, verbose_name='Хэш ключа')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('last_used_at', models.DateTimeField(blank=True, null=True, verbose_name='Последнее использование')),
+                ('factory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='api_tokens', to='catalog.factory', verbose_name='Завод')),
+            ],
+            options={
+                'verbose_name': 'API-ключ завода',
+                'verbose_name_plural': 'API-ключи заводов',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
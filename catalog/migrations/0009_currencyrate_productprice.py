@@ -0,0 +1,47 @@
+# Generated by Django 5.1 on 2026-10-19 15:33
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_factoryapitoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrencyRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(help_text='ISO 4217, например EUR', max_length=3, unique=True, verbose_name='Код')),
+                ('name', models.CharField(max_length=50, verbose_name='Название')),
+                ('symbol', models.CharField(blank=True, max_length=5, verbose_name='Символ')),
+                ('rate', models.DecimalField(decimal_places=6, help_text='Сколько единиц валюты за 1 единицу базовой валюты', max_digits=16, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Курс')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Курс валюты',
+                'verbose_name_plural': 'Курсы валют',
+                'ordering': ['code'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3, verbose_name='Валюта')),
+                ('base_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена в базовой валюте')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=16, verbose_name='Цена')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prices', to='catalog.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Цена в валюте',
+                'verbose_name_plural': 'Цены в валютах',
+                'indexes': [models.Index(fields=['currency', 'price'], name='catalog_pro_currenc_1b0dfc_idx')],
+                'unique_together': {('product', 'currency')},
+            },
+        ),
+    ]
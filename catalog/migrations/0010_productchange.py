@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-19 15:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_currencyrate_productprice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('article', models.CharField(max_length=50, verbose_name='Артикул')),
+                ('image_id', models.BigIntegerField(blank=True, null=True, verbose_name='Фото')),
+                ('field', models.CharField(max_length=30, verbose_name='Поле')),
+                ('old_value', models.TextField(blank=True, null=True, verbose_name='Было')),
+                ('new_value', models.TextField(blank=True, null=True, verbose_name='Стало')),
+                ('source', models.CharField(max_length=20, verbose_name='Источник')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата изменения')),
+                ('product', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='changes', to='catalog.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Изменение товара',
+                'verbose_name_plural': 'История изменений товаров',
+                'indexes': [models.Index(fields=['article', 'field', 'changed_at'], name='catalog_pro_article_6f0e24_idx'), models.Index(fields=['product', 'changed_at'], name='catalog_pro_product_fbae63_idx'), models.Index(fields=['changed_at'], name='catalog_pro_changed_755006_idx')],
+            },
+        ),
+    ]
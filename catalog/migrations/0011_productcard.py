@@ -0,0 +1,70 @@
+# Generated by Django 5.1 on 2026-10-19 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_cards(apps, schema_editor):
+    """Карточки для уже существующих активных товаров"""
+    Product = apps.get_model('catalog', 'Product')
+    ProductCard = apps.get_model('catalog', 'ProductCard')
+    db_alias = schema_editor.connection.alias
+
+    rows = Product.objects.using(db_alias).filter(is_active=True).values_list(
+        'id', 'article', 'name', 'price', 'weight', 'stock_quantity', 'main_image_url',
+        'factory_id', 'factory__name', 'category_id', 'category__slug', 'category__name',
+        'material_id', 'material__name', 'created_at', 'popularity_score', 'trending_score',
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=2000):
+        batch.append(ProductCard(
+            product_id=row[0], article=row[1], name=row[2], price=row[3], weight=row[4],
+            in_stock=row[5] > 0, main_image_url=row[6],
+            factory_id=row[7], factory_name=row[8],
+            category_id=row[9], category_slug=row[10], category_name=row[11],
+            material_id=row[12], material_label=row[13],
+            created_at=row[14], popularity_score=row[15], trending_score=row[16],
+        ))
+        if len(batch) >= 2000:
+            ProductCard.objects.using(db_alias).bulk_create(batch)
+            batch = []
+    ProductCard.objects.using(db_alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_productchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='catalog.product', verbose_name='Товар')),
+                ('article', models.CharField(max_length=50, verbose_name='Артикул')),
+                ('name', models.CharField(max_length=200, verbose_name='Название')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена')),
+                ('weight', models.DecimalField(decimal_places=2, max_digits=6, verbose_name='Вес (г)')),
+                ('in_stock', models.BooleanField(default=False, verbose_name='В наличии')),
+                ('main_image_url', models.CharField(blank=True, max_length=300, verbose_name='URL главного фото')),
+                ('factory_name', models.CharField(max_length=200, verbose_name='Название завода')),
+                ('category_slug', models.SlugField(db_index=False, verbose_name='URL категории')),
+                ('category_name', models.CharField(max_length=100, verbose_name='Название категории')),
+                ('material_label', models.CharField(max_length=100, verbose_name='Материал (подпись)')),
+                ('created_at', models.DateTimeField(verbose_name='Дата добавления')),
+                ('popularity_score', models.FloatField(default=0, verbose_name='Популярность')),
+                ('trending_score', models.FloatField(default=0, verbose_name='Тренд недели')),
+                ('category', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.category', verbose_name='Категория')),
+                ('factory', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.factory', verbose_name='Завод')),
+                ('material', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.material', verbose_name='Материал')),
+            ],
+            options={
+                'verbose_name': 'Карточка каталога',
+                'verbose_name_plural': 'Карточки каталога',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['-created_at'], name='catalog_pro_created_8a6845_idx'), models.Index(fields=['category_slug', '-created_at'], name='catalog_pro_categor_96f6f2_idx'), models.Index(fields=['factory', '-created_at'], name='catalog_pro_factory_0af437_idx'), models.Index(fields=['material', '-created_at'], name='catalog_pro_materia_d3f88b_idx'), models.Index(fields=['price'], name='catalog_pro_price_2f8362_idx'), models.Index(fields=['name'], name='catalog_pro_name_3ff8b6_idx'), models.Index(fields=['-popularity_score'], name='catalog_pro_popular_a2053b_idx'), models.Index(fields=['-trending_score'], name='catalog_pro_trendin_16c97c_idx')],
+            },
+        ),
+        migrations.RunPython(fill_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-19 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_productcard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-created_at'], name='catalog_pro_created_eee82f_idx'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.1 on 2026-10-19 15:42
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+
+def fill_dimensions(apps, schema_editor):
+    """Размер кольца для существующих колец и размеры в карточках каталога"""
+    Product = apps.get_model('catalog', 'Product')
+    ProductCard = apps.get_model('catalog', 'ProductCard')
+    db_alias = schema_editor.connection.alias
+
+    rings = []
+    for product in Product.objects.using(db_alias).filter(reference_photo_type='finger', diameter_mm__isnull=False).only('id', 'diameter_mm'):
+        size = (product.diameter_mm * 2).quantize(Decimal('1'), rounding=ROUND_HALF_UP) / 2
+        if Decimal('14') <= size <= Decimal('23'):
+            product.ring_size = size
+            rings.append(product)
+    Product.objects.using(db_alias).bulk_update(rings, ['ring_size'], batch_size=500)
+
+    cards = [
+        ProductCard(
+            product_id=row[0], reference_photo_type=row[1], width_mm=row[2],
+            height_mm=row[3], diameter_mm=row[4], ring_size=row[5],
+        )
+        for row in Product.objects.using(db_alias).filter(is_active=True).values_list(
+            'id', 'reference_photo_type', 'width_mm', 'height_mm', 'diameter_mm', 'ring_size'
+        ).iterator(chunk_size=2000)
+    ]
+    ProductCard.objects.using(db_alias).bulk_update(
+        cards, ['reference_photo_type', 'width_mm', 'height_mm', 'diameter_mm', 'ring_size'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0012_product_catalog_pro_created_eee82f_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='ring_size',
+            field=models.DecimalField(blank=True, decimal_places=1, editable=False, max_digits=4, null=True, verbose_name='Размер кольца'),
+        ),
+        migrations.AddField(
+            model_name='productcard',
+            name='diameter_mm',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True, verbose_name='Диаметр (мм)'),
+        ),
+        migrations.AddField(
+            model_name='productcard',
+            name='height_mm',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True, verbose_name='Высота (мм)'),
+        ),
+        migrations.AddField(
+            model_name='productcard',
+            name='reference_photo_type',
+            field=models.CharField(default='none', max_length=20, verbose_name='Тип изделия'),
+        ),
+        migrations.AddField(
+            model_name='productcard',
+            name='ring_size',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True, verbose_name='Размер кольца'),
+        ),
+        migrations.AddField(
+            model_name='productcard',
+            name='width_mm',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True, verbose_name='Ширина (мм)'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(fields=['reference_photo_type', 'diameter_mm'], name='catalog_pro_referen_00aa2b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(fields=['reference_photo_type', 'height_mm'], name='catalog_pro_referen_6a58d1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(fields=['reference_photo_type', 'width_mm'], name='catalog_pro_referen_752c20_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(fields=['ring_size'], name='catalog_pro_ring_si_4d0eb7_idx'),
+        ),
+        migrations.RunPython(fill_dimensions, migrations.RunPython.noop),
+    ]
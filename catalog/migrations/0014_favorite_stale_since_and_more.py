@@ -0,0 +1,24 @@
+# Generated by Django 5.1 on 2026-10-19 15:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_product_ring_size_productcard_diameter_mm_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='stale_since',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Снят с продажи'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', '-added_at', '-id'], name='catalog_fav_user_id_87de4b_idx'),
+        ),
+    ]
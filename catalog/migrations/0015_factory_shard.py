@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-19 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_favorite_stale_since_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='factory',
+            name='shard',
+            field=models.CharField(blank=True, editable=False, help_text='БД с товарами завода, пусто - основная', max_length=50, verbose_name='Шард БД'),
+        ),
+    ]
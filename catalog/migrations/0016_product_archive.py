@@ -0,0 +1,53 @@
+# Generated by Django 5.1 on 2026-10-19 16:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0015_factory_shard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedProduct',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID товара')),
+                ('article', models.CharField(max_length=50, unique=True, verbose_name='Артикул')),
+                ('name', models.CharField(max_length=200, verbose_name='Название')),
+                ('data', models.JSONField(verbose_name='Остальные поля')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата архивации')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='catalog.category', verbose_name='Категория')),
+                ('factory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_products', to='catalog.factory', verbose_name='Завод')),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='catalog.material', verbose_name='Материал')),
+            ],
+            options={
+                'verbose_name': 'Архивный товар',
+                'verbose_name_plural': 'Архив товаров',
+                'ordering': ['-archived_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedProductImage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID фото')),
+                ('image', models.CharField(max_length=100, verbose_name='Файл')),
+                ('is_main', models.BooleanField(default=False, verbose_name='Главное фото')),
+                ('is_reference', models.BooleanField(default=False, verbose_name='Эталонное фото')),
+                ('order', models.IntegerField(default=0, verbose_name='Порядок')),
+                ('uploaded_at', models.DateTimeField(verbose_name='Дата загрузки')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='catalog.archivedproduct', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Фото архивного товара',
+                'verbose_name_plural': 'Фото архивных товаров',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedproduct',
+            index=models.Index(fields=['factory', '-archived_at'], name='catalog_arc_factory_c23a60_idx'),
+        ),
+    ]
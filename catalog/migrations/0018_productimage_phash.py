@@ -0,0 +1,23 @@
+# Generated by Django 5.1 on 2026-10-19 16:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0017_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedproductimage',
+            name='phash',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Перцептивный хэш'),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='phash',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='Перцептивный хэш'),
+        ),
+    ]
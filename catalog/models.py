@@ -1,8 +1,15 @@
 # catalog/models.py
-from django.db import models
+from django.db import models, router
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+import hashlib
 import json
+import secrets
+import uuid
+
+from .sizes import ring_size_for
 
 
 class Factory(models.Model):
@@ -16,6 +23,14 @@ class Factory(models.Model):
     logo = models.ImageField(upload_to='factory_logos/', blank=True, null=True, verbose_name="Логотип")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата регистрации")
     is_verified = models.BooleanField(default=False, verbose_name="Верифицирован")
+    # Переносится командой move_factory_shard (catalog.sharding)
+    shard = models.CharField(
+        max_length=50,
+        blank=True,
+        editable=False,
+        verbose_name="Шард БД",
+        help_text="БД с товарами завода, пусто - основная"
+    )
 
     class Meta:
         verbose_name = "Завод"
@@ -26,6 +41,34 @@ class Factory(models.Model):
         return self.name
 
 
+class FactoryApiToken(models.Model):
+    """API-ключ завода для интеграций (ERP). Хранится только SHA-256 ключа"""
+    factory = models.ForeignKey(Factory, on_delete=models.CASCADE, related_name='api_tokens', verbose_name="Завод")
+    name = models.CharField(max_length=100, blank=True, verbose_name="Название")
+    key_hash = models.CharField(max_length=64, unique=True, editable=False, verbose_name="Хэш ключа")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    last_used_at = models.DateTimeField(blank=True, null=True, verbose_name="Последнее использование")
+
+    class Meta:
+        verbose_name = "API-ключ завода"
+        verbose_name_plural = "API-ключи заводов"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.factory} - {self.name or self.pk}"
+
+    @staticmethod
+    def hash_key(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @classmethod
+    def issue(cls, factory, name=''):
+        """Создаёт ключ; открытое значение возвращается только здесь"""
+        key = secrets.token_urlsafe(32)
+        token = cls.objects.create(factory=factory, name=name, key_hash=cls.hash_key(key))
+        return token, key
+
+
 class Category(models.Model):
     """Категории ювелирных изделий"""
     name = models.CharField(max_length=100, verbose_name="Название")
@@ -115,6 +158,13 @@ class ReferenceImage(models.Model):
         return f"{self.get_reference_type_display()} ({self.width_mm}×{self.height_mm} мм)"
 
 
+class ProductQuerySet(models.QuerySet):
+
+    def for_listing(self):
+        """Без тяжёлых текстовых полей (Product.LISTING_DEFERRED) - для списков и карточек"""
+        return self.defer(*Product.LISTING_DEFERRED)
+
+
 class Product(models.Model):
     """Модель ювелирного изделия"""
     
@@ -126,6 +176,9 @@ class Product(models.Model):
         ('none', 'Без эталона'),
     ]
     
+    # Неограниченные текстовые поля, которые списки не показывают
+    LISTING_DEFERRED = ['description', 'stone_description', 'editor_data']
+    
     factory = models.ForeignKey(Factory, on_delete=models.CASCADE, related_name='products', verbose_name="Завод")
     category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='products', verbose_name="Категория")
     material = models.ForeignKey(Material, on_delete=models.PROTECT, related_name='products', verbose_name="Материал")
@@ -151,6 +204,10 @@ class Product(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
     
     views_count = models.IntegerField(default=0, verbose_name="Количество просмотров")
+
+    # Пересчитываются командой recompute_popularity из ProductActivity
+    popularity_score = models.FloatField(default=0, verbose_name="Популярность")
+    trending_score = models.FloatField(default=0, verbose_name="Тренд недели")
     
     reference_photo_type = models.CharField(
         max_length=20,
@@ -187,6 +244,16 @@ class Product(models.Model):
         help_text="Для колец - рассчитывается автоматически"
     )
     
+    # Российский размер кольца по diameter_mm (catalog.sizes), считается при сохранении
+    ring_size = models.DecimalField(
+        max_digits=4,
+        decimal_places=1,
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Размер кольца"
+    )
+    
     editor_data = models.TextField(
         blank=True,
         verbose_name="Данные редактора",
@@ -199,6 +266,25 @@ class Product(models.Model):
         help_text="Отображать интерактивную линейку на странице товара"
     )
 
+    # Денормализованное главное фото для карточек (поддерживается catalog.images)
+    main_image = models.ForeignKey(
+        'ProductImage',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+',
+        editable=False,
+        verbose_name="Главное фото"
+    )
+    main_image_url = models.CharField(
+        max_length=300,
+        blank=True,
+        editable=False,
+        verbose_name="URL главного фото"
+    )
+
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
@@ -207,28 +293,62 @@ class Product(models.Model):
             models.Index(fields=['article']),
             models.Index(fields=['category', 'is_active']),
             models.Index(fields=['factory', 'is_active']),
+            models.Index(fields=['is_active', '-popularity_score']),
+            models.Index(fields=['is_active', '-trending_score']),
+            # Сортировка списка товаров в админке
+            models.Index(fields=['-created_at']),
         ]
 
     def save(self, *args, **kwargs):
         """Автоматическая генерация артикула"""
         if not self.article:
-            last_product = Product.objects.filter(
-                factory=self.factory
-            ).order_by('-id').first()
+            # Номер продолжает и архив: последние товары могли уйти туда.
+            # Читаем из шарда завода (catalog.sharding), а не из текущего шарда запроса
+            using = kwargs.get('using') or router.db_for_write(Product, instance=self)
+            last_articles = [
+                model.objects.using(using).filter(
+                    factory=self.factory
+                ).order_by('-id').values_list('article', flat=True).first()
+                for model in (Product, ArchivedProduct)
+            ]
             
-            if last_product and '-' in last_product.article:
-                try:
-                    last_number = int(last_product.article.split('-')[1])
-                    next_number = last_number + 1
-                except (ValueError, IndexError):
-                    next_number = 1
-            else:
-                next_number = 1
+            next_number = 1
+            for last_article in last_articles:
+                if last_article and '-' in last_article:
+                    try:
+                        next_number = max(next_number, int(last_article.split('-')[1]) + 1)
+                    except (ValueError, IndexError):
+                        pass
             
             self.article = f"{self.factory.id}-{next_number:06d}"
         
+        self.ring_size = ring_size_for(self.diameter_mm) if self.reference_photo_type == 'finger' else None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'diameter_mm', 'reference_photo_type'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'ring_size'}
+        
         super().save(*args, **kwargs)
 
+    def validate_unique(self, exclude=None):
+        """
+        Артикул уникален и среди архивных товаров (catalog.archive).
+        Проверки идут в шарде завода товара, а не в текущем шарде запроса
+        """
+        from .sharding import shard_for_factory, use_shard  # sharding импортирует модели
+
+        with use_shard(shard_for_factory(self.factory_id)):
+            super().validate_unique(exclude)
+            if self.article and 'article' not in (exclude or ()):
+                if ArchivedProduct.objects.filter(article=self.article).exclude(pk=self.pk).exists():
+                    raise ValidationError({'article': 'Артикул занят товаром из архива'})
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Исходные значения для журнала изменений (catalog.history)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def __str__(self):
         return f"{self.article} - {self.name}"
 
@@ -276,27 +396,284 @@ class ProductImage(models.Model):
     )
     order = models.IntegerField(default=0, verbose_name="Порядок")
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата загрузки")
+    # Перцептивный хэш для поиска дублей (catalog.image_hashes)
+    phash = models.BigIntegerField(blank=True, null=True, editable=False, verbose_name="Перцептивный хэш")
 
     class Meta:
         verbose_name = "Изображение товара"
         verbose_name_plural = "Изображения товаров"
         ordering = ['order', 'uploaded_at']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def __str__(self):
         return f"Фото {self.product.article}"
 
 
+class ChunkedUpload(models.Model):
+    """Загрузка фото частями (catalog.chunked_uploads); файл собирается во временном каталоге"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    factory = models.ForeignKey(Factory, on_delete=models.CASCADE, related_name='+', verbose_name="Завод")
+    filename = models.CharField(max_length=255, verbose_name="Имя файла")
+    size = models.PositiveIntegerField(verbose_name="Размер, байт")
+    checksum = models.CharField(max_length=64, verbose_name="SHA-256")
+    received = models.PositiveIntegerField(default=0, verbose_name="Получено, байт")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Начата")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Последняя часть")
+
+    class Meta:
+        verbose_name = "Загрузка частями"
+        verbose_name_plural = "Загрузки частями"
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+
 class Favorite(models.Model):
     """Избранные товары клиентов"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='favorites', verbose_name="Пользователь")
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='favorited_by', verbose_name="Товар")
     added_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата добавления")
+    # Товар снят с продажи (проставляет команда prune_favorites)
+    stale_since = models.DateTimeField(blank=True, null=True, editable=False, verbose_name="Снят с продажи")
 
     class Meta:
         verbose_name = "Избранное"
         verbose_name_plural = "Избранное"
         unique_together = ['user', 'product']
         ordering = ['-added_at']
+        indexes = [
+            # Постраничный список по ключу (added_at, id)
+            models.Index(fields=['user', '-added_at', '-id']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.product.name}"
+
+class CurrencyRate(models.Model):
+    """Курс валюты к базовой валюте каталога (settings.CATALOG_BASE_CURRENCY)"""
+    code = models.CharField(max_length=3, unique=True, verbose_name="Код", help_text="ISO 4217, например EUR")
+    name = models.CharField(max_length=50, verbose_name="Название")
+    symbol = models.CharField(max_length=5, blank=True, verbose_name="Символ")
+    rate = models.DecimalField(
+        max_digits=16,
+        decimal_places=6,
+        validators=[MinValueValidator(0)],
+        verbose_name="Курс",
+        help_text="Сколько единиц валюты за 1 единицу базовой валюты"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Курс валюты"
+        verbose_name_plural = "Курсы валют"
+        ordering = ['code']
+
+    def __str__(self):
+        return f"{self.code} ({self.rate})"
+
+
+class ProductPrice(models.Model):
+    """Предрассчитанная цена товара в валюте (обновляется catalog.currency)"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='prices', verbose_name="Товар")
+    currency = models.CharField(max_length=3, verbose_name="Валюта")
+    base_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена в базовой валюте")
+    price = models.DecimalField(max_digits=16, decimal_places=2, verbose_name="Цена")
+
+    class Meta:
+        verbose_name = "Цена в валюте"
+        verbose_name_plural = "Цены в валютах"
+        unique_together = ['product', 'currency']
+        indexes = [
+            models.Index(fields=['currency', 'price']),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} - {self.product.name}"
\ No newline at end of file
+        return f"{self.product_id}: {self.price} {self.currency}"
+
+
+class ProductActivity(models.Model):
+    """Агрегаты событий товара (просмотры, избранное) по часовым интервалам"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='activity', verbose_name="Товар")
+    bucket = models.DateTimeField(verbose_name="Начало интервала")
+    views = models.PositiveIntegerField(default=0, verbose_name="Просмотры")
+    favorites = models.PositiveIntegerField(default=0, verbose_name="Добавления в избранное")
+
+    class Meta:
+        verbose_name = "Активность товара"
+        verbose_name_plural = "Активность товаров"
+        unique_together = ['product', 'bucket']
+        indexes = [
+            models.Index(fields=['bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.bucket:%Y-%m-%d %H:%M}"
+
+
+class SimilarProduct(models.Model):
+    """Предрассчитанные похожие товары (обновляются командой rebuild_similar_products)"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar_links', verbose_name="Товар")
+    similar = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='similar_for', verbose_name="Похожий товар")
+    score = models.FloatField(verbose_name="Оценка сходства")
+    rank = models.PositiveSmallIntegerField(verbose_name="Позиция")
+
+    class Meta:
+        verbose_name = "Похожий товар"
+        verbose_name_plural = "Похожие товары"
+        # Уникальный индекс (product, rank) обслуживает выборку соседей на странице товара
+        unique_together = ['product', 'rank']
+        ordering = ['product', 'rank']
+
+    def __str__(self):
+        return f"{self.product_id} → {self.similar_id} ({self.score:.3f})"
+
+
+class ProductChange(models.Model):
+    """
+    Запись журнала изменений товара или его фото: одно поле, старое и новое значение.
+    Журнал только пополняется (catalog.history); старые записи сворачиваются
+    командой rollup_product_history до одной записи на поле за день.
+    """
+    # Без внешнего ключа в БД: история переживает удаление товара
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='changes',
+        verbose_name="Товар"
+    )
+    article = models.CharField(max_length=50, verbose_name="Артикул")
+    image_id = models.BigIntegerField(blank=True, null=True, verbose_name="Фото")
+    field = models.CharField(max_length=30, verbose_name="Поле")
+    old_value = models.TextField(blank=True, null=True, verbose_name="Было")
+    new_value = models.TextField(blank=True, null=True, verbose_name="Стало")
+    source = models.CharField(max_length=20, verbose_name="Источник")
+    changed_at = models.DateTimeField(default=timezone.now, verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Изменение товара"
+        verbose_name_plural = "История изменений товаров"
+        indexes = [
+            # «История цены артикула X» - диапазон по одному индексу
+            models.Index(fields=['article', 'field', 'changed_at']),
+            models.Index(fields=['product', 'changed_at']),
+            models.Index(fields=['changed_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.article}.{self.field}: {self.old_value} → {self.new_value}"
+
+
+class ProductCard(models.Model):
+    """
+    Плоская карточка активного товара для листингов (главная, страница завода, API).
+    Всё, что нужно карточке, лежит в одной строке - без JOIN с заводом, категорией
+    и материалом. Поддерживается catalog.cards из сигналов; неактивных товаров нет.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='card',
+        verbose_name="Товар"
+    )
+    article = models.CharField(max_length=50, verbose_name="Артикул")
+    name = models.CharField(max_length=200, verbose_name="Название")
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена")
+    weight = models.DecimalField(max_digits=6, decimal_places=2, verbose_name="Вес (г)")
+    in_stock = models.BooleanField(default=False, verbose_name="В наличии")
+    main_image_url = models.CharField(max_length=300, blank=True, verbose_name="URL главного фото")
+
+    factory = models.ForeignKey(Factory, on_delete=models.CASCADE, db_index=False, related_name='+', verbose_name="Завод")
+    factory_name = models.CharField(max_length=200, verbose_name="Название завода")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, db_index=False, related_name='+', verbose_name="Категория")
+    category_slug = models.SlugField(db_index=False, verbose_name="URL категории")
+    category_name = models.CharField(max_length=100, verbose_name="Название категории")
+    material = models.ForeignKey(Material, on_delete=models.CASCADE, db_index=False, related_name='+', verbose_name="Материал")
+    material_label = models.CharField(max_length=100, verbose_name="Материал (подпись)")
+
+    reference_photo_type = models.CharField(max_length=20, default='none', verbose_name="Тип изделия")
+    width_mm = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True, verbose_name="Ширина (мм)")
+    height_mm = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True, verbose_name="Высота (мм)")
+    diameter_mm = models.DecimalField(max_digits=6, decimal_places=2, blank=True, null=True, verbose_name="Диаметр (мм)")
+    ring_size = models.DecimalField(max_digits=4, decimal_places=1, blank=True, null=True, verbose_name="Размер кольца")
+
+    created_at = models.DateTimeField(verbose_name="Дата добавления")
+    popularity_score = models.FloatField(default=0, verbose_name="Популярность")
+    trending_score = models.FloatField(default=0, verbose_name="Тренд недели")
+
+    class Meta:
+        verbose_name = "Карточка каталога"
+        verbose_name_plural = "Карточки каталога"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['category_slug', '-created_at']),
+            models.Index(fields=['factory', '-created_at']),
+            models.Index(fields=['material', '-created_at']),
+            models.Index(fields=['price']),
+            models.Index(fields=['name']),
+            models.Index(fields=['-popularity_score']),
+            models.Index(fields=['-trending_score']),
+            # Поиск по размерам - диапазон внутри типа изделия
+            models.Index(fields=['reference_photo_type', 'diameter_mm']),
+            models.Index(fields=['reference_photo_type', 'height_mm']),
+            models.Index(fields=['reference_photo_type', 'width_mm']),
+            models.Index(fields=['ring_size']),
+        ]
+
+    def __str__(self):
+        return f"{self.article} - {self.name}"
+
+
+class ArchivedProduct(models.Model):
+    """
+    Давно неактивный товар, вынесенный из Product (catalog.archive).
+    id и артикул сохраняются: при возврате товар получает их обратно,
+    поэтому история и ссылки на артикул не ломаются. Поля, по которым
+    архив не ищут, лежат в data.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name="ID товара")
+    factory = models.ForeignKey(Factory, on_delete=models.CASCADE, related_name='archived_products', verbose_name="Завод")
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='+', verbose_name="Категория")
+    material = models.ForeignKey(Material, on_delete=models.PROTECT, related_name='+', verbose_name="Материал")
+    article = models.CharField(max_length=50, unique=True, verbose_name="Артикул")
+    name = models.CharField(max_length=200, verbose_name="Название")
+    data = models.JSONField(verbose_name="Остальные поля")
+    archived_at = models.DateTimeField(default=timezone.now, verbose_name="Дата архивации")
+
+    class Meta:
+        verbose_name = "Архивный товар"
+        verbose_name_plural = "Архив товаров"
+        ordering = ['-archived_at']
+        indexes = [
+            models.Index(fields=['factory', '-archived_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.article} - {self.name}"
+
+
+class ArchivedProductImage(models.Model):
+    """Метаданные фото архивного товара; сами файлы остаются в хранилище"""
+    id = models.BigIntegerField(primary_key=True, verbose_name="ID фото")
+    product = models.ForeignKey(ArchivedProduct, on_delete=models.CASCADE, related_name='images', verbose_name="Товар")
+    image = models.CharField(max_length=100, verbose_name="Файл")
+    is_main = models.BooleanField(default=False, verbose_name="Главное фото")
+    is_reference = models.BooleanField(default=False, verbose_name="Эталонное фото")
+    order = models.IntegerField(default=0, verbose_name="Порядок")
+    uploaded_at = models.DateTimeField(verbose_name="Дата загрузки")
+    phash = models.BigIntegerField(blank=True, null=True, verbose_name="Перцептивный хэш")
+
+    class Meta:
+        verbose_name = "Фото архивного товара"
+        verbose_name_plural = "Фото архивных товаров"
+
+    def __str__(self):
+        return f"Фото {self.product.article}"
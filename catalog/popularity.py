@@ -0,0 +1,111 @@
+# catalog/popularity.py
+"""
+Популярность товаров с затуханием во времени.
+
+События (просмотр, добавление в избранное) не пишутся построчно: каждое
+увеличивает счётчик в часовом интервале ProductActivity, поэтому объём
+таблицы ограничен «товары × часы», а не числом событий. Команда
+recompute_popularity периодически сворачивает интервалы в индексированные
+поля Product.popularity_score и Product.trending_score.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Product, ProductActivity, ProductCard
+
+BUCKET_SECONDS = 3600
+
+# Вес событий в оценке
+VIEW_WEIGHT = 1.0
+FAVORITE_WEIGHT = 5.0
+
+# «Популярные»: длинное окно, медленное затухание
+POPULAR_WINDOW_DAYS = 90
+POPULAR_HALF_LIFE_DAYS = 14
+# «В тренде за неделю»: короткое окно, быстрое затухание
+TRENDING_WINDOW_DAYS = 7
+TRENDING_HALF_LIFE_DAYS = 2
+
+
+def bucket_start(moment):
+    """Начало часового интервала, в который попадает момент времени"""
+    timestamp = int(moment.timestamp())
+    return moment - timedelta(seconds=timestamp % BUCKET_SECONDS, microseconds=moment.microsecond)
+
+
+def record_event(product_id, views=0, favorites=0, when=None):
+    """Учитывает событие в текущем интервале (UPDATE, при первом событии - INSERT)"""
+    bucket = bucket_start(when or timezone.now())
+    activity = ProductActivity.objects.filter(product_id=product_id, bucket=bucket)
+
+    if activity.update(views=F('views') + views, favorites=F('favorites') + favorites):
+        return
+    try:
+        with transaction.atomic(using=router.db_for_write(ProductActivity)):
+            ProductActivity.objects.create(
+                product_id=product_id, bucket=bucket, views=views, favorites=favorites
+            )
+    except IntegrityError:
+        # Параллельный запрос успел создать интервал
+        activity.update(views=F('views') + views, favorites=F('favorites') + favorites)
+
+
+def _decay(age_days, half_life_days):
+    return 0.5 ** (age_days / half_life_days)
+
+
+def recompute_scores(now=None, batch_size=1000):
+    """
+    Пересчитывает popularity_score и trending_score всех товаров.
+    Интервалы старше окна популярности удаляются. Возвращает число обновлённых товаров.
+    """
+    now = now or timezone.now()
+    popular_since = now - timedelta(days=POPULAR_WINDOW_DAYS)
+    trending_since = now - timedelta(days=TRENDING_WINDOW_DAYS)
+
+    ProductActivity.objects.filter(bucket__lt=popular_since).delete()
+
+    popular = defaultdict(float)
+    trending = defaultdict(float)
+    rows = ProductActivity.objects.filter(bucket__gte=popular_since).values_list(
+        'product_id', 'bucket', 'views', 'favorites'
+    )
+    for product_id, bucket, views, favorites in rows.iterator(chunk_size=10000):
+        weight = views * VIEW_WEIGHT + favorites * FAVORITE_WEIGHT
+        age_days = max((now - bucket).total_seconds(), 0) / 86400
+        popular[product_id] += weight * _decay(age_days, POPULAR_HALF_LIFE_DAYS)
+        if bucket >= trending_since:
+            trending[product_id] += weight * _decay(age_days, TRENDING_HALF_LIFE_DAYS)
+
+    # Товары, выпавшие из окна, обнуляем
+    stale_ids = Product.objects.filter(
+        Q(popularity_score__gt=0) | Q(trending_score__gt=0)
+    ).values_list('id', flat=True)
+    updates = [
+        Product(id=product_id, popularity_score=0, trending_score=0)
+        for product_id in stale_ids.iterator(chunk_size=10000)
+        if product_id not in popular
+    ]
+    updates.extend(
+        Product(
+            id=product_id,
+            popularity_score=round(score, 4),
+            trending_score=round(trending.get(product_id, 0.0), 4),
+        )
+        for product_id, score in popular.items()
+    )
+
+    cards = [
+        ProductCard(product_id=product.id, popularity_score=product.popularity_score,
+                    trending_score=product.trending_score)
+        for product in updates
+    ]
+    with transaction.atomic(using=router.db_for_write(Product)):
+        Product.objects.bulk_update(updates, ['popularity_score', 'trending_score'], batch_size=batch_size)
+        ProductCard.objects.bulk_update(cards, ['popularity_score', 'trending_score'], batch_size=batch_size)
+
+    return len(updates)
@@ -0,0 +1,162 @@
+# catalog/ratelimit.py
+"""
+Ограничение частоты запросов: token bucket в общем кэше (settings.CACHES).
+
+Корзина на ключ (пользователь, завод, IP) вмещает N токенов и пополняется
+со скоростью N за период; запрос берёт токен из всех своих корзин.
+Состояние - пара (токены, время) в кэше: один get_many и один set_many
+на запрос, без обращения к БД. Отказ - лёгкий ответ 429 с Retry-After,
+без шаблонов. Гонки при одновременных запросах лишь немного ослабляют
+лимит, поэтому атомарные операции кэша не требуются.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+from .roles import get_role
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+DEFAULT_RATES = {
+    'favorite': '30/m',
+    'search': '60/m',
+    'product_write': '20/m',
+    'upload_chunk': '120/m',
+    'inventory_feed': '6/m',
+}
+RATES = {**DEFAULT_RATES, **getattr(settings, 'CATALOG_RATE_LIMITS', {})}
+
+MAX_REQUEST_BYTES = getattr(settings, 'CATALOG_MAX_UPLOAD_REQUEST_BYTES', 25 * 1024 * 1024)
+
+
+def parse_rate(rate):
+    """'30/m' -> (30, 60)"""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period]
+
+
+def client_ip(request):
+    # За обратным прокси REMOTE_ADDR должен выставлять сам прокси (nginx real_ip)
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def rate_limit_keys(request, scope):
+    """Ключи корзин: пользователь и его завод, для анонимов - IP"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return [f'catalog:rl:{scope}:ip:{client_ip(request)}']
+    keys = [f'catalog:rl:{scope}:user:{user.pk}']
+    factory = get_role(request).factory
+    if factory is not None:
+        keys.append(f'catalog:rl:{scope}:factory:{factory.pk}')
+    return keys
+
+
+def take_token(keys, rate):
+    """
+    Берёт по токену из каждой корзины. Возвращает 0, если запрос разрешён,
+    иначе число секунд до появления токена (корзины при отказе не меняются).
+    """
+    capacity, period = parse_rate(rate)
+    refill_per_second = capacity / period
+    now = time.time()
+
+    states = cache.get_many(keys)
+    updated = {}
+    wait = 0.0
+    for key in keys:
+        tokens, stamp = states.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - stamp) * refill_per_second)
+        if tokens < 1:
+            wait = max(wait, (1 - tokens) / refill_per_second)
+        updated[key] = (tokens - 1, now)
+
+    if wait:
+        return wait
+    cache.set_many(updated, timeout=period + 1)
+    return 0
+
+
+def check_rate_limit(request, scope):
+    """None, если запрос разрешён, иначе готовый ответ 429"""
+    wait = take_token(rate_limit_keys(request, scope), RATES[scope])
+    if wait:
+        return too_many_requests(request, wait)
+    return None
+
+
+def wants_json(request):
+    return (
+        request.path.startswith('/api/')
+        or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+        or 'application/json' in request.headers.get('Accept', '')
+    )
+
+
+def too_many_requests(request, retry_after):
+    retry_after = max(1, math.ceil(retry_after))
+    message = 'Слишком много запросов, попробуйте позже'
+    if wants_json(request):
+        response = JsonResponse({'error': message, 'retry_after': retry_after}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def rate_limit(scope, methods=None):
+    """
+    Декоратор view: лимит scope (из RATES) для всех или указанных методов.
+    Как csrf_exempt, только помечает view; проверяет RateLimitMiddleware
+    до CsrfViewMiddleware, то есть до разбора тела запроса.
+    """
+    def decorator(view):
+        view.rate_limit = (scope, methods)
+        return view
+    return decorator
+
+
+def limit_request_size(view):
+    """Помечает view: тело больше MAX_REQUEST_BYTES отклоняется по Content-Length"""
+    view.limit_request_size = True
+    return view
+
+
+def request_too_large(request):
+    message = f'Запрос больше {MAX_REQUEST_BYTES // (1024 * 1024)} МБ'
+    if wants_json(request):
+        return JsonResponse({'error': message}, status=413)
+    return HttpResponse(message, status=413, content_type='text/plain; charset=utf-8')
+
+
+class RateLimitMiddleware:
+    """
+    Применяет пометки rate_limit и limit_request_size. Должен стоять
+    в MIDDLEWARE до CsrfViewMiddleware: тот читает request.POST и тем самым
+    принимает загружаемые файлы целиком.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'limit_request_size', False):
+            try:
+                length = int(request.META.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                length = 0
+            if length > MAX_REQUEST_BYTES:
+                return request_too_large(request)
+
+        limit = getattr(view_func, 'rate_limit', None)
+        if limit is not None:
+            scope, methods = limit
+            if methods is None or request.method in methods:
+                return check_rate_limit(request, scope)
+        return None
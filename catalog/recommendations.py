@@ -0,0 +1,252 @@
+# catalog/recommendations.py
+"""
+Офлайн-расчёт похожих товаров (item-to-item).
+
+Кандидаты делятся на блоки по категории: внутри категории сходство считается
+векторно в NumPy по блокам строк (память - chunk_size × размер категории),
+а межкатегорийные пары добавляются только из co-favorite сигнала (разреженно).
+Так полный пересчёт растёт как сумма квадратов категорий, а не квадрат каталога.
+Результат (top-K соседей на товар) сохраняется в SimilarProduct.
+"""
+import numpy as np
+from django.db import router, transaction
+
+from .models import Product, Favorite, SimilarProduct
+
+DEFAULT_TOP_K = 8
+DEFAULT_CHUNK_SIZE = 256
+
+# Веса сигналов в итоговой оценке
+WEIGHTS = {
+    'category': 4.0,
+    'material': 2.0,
+    'price': 1.5,
+    'dimensions': 1.0,
+    'co_favorite': 3.0,
+}
+
+# Ценовой диапазон: соседние диапазоны отличаются в PRICE_BAND_RATIO раз
+PRICE_BAND_RATIO = 1.5
+# Сколько диапазонов разницы ещё дают ненулевой вклад
+PRICE_BAND_SPAN = 3
+# Характерная разница размеров (мм), при которой сходство падает в e раз
+DIMENSION_SCALE_MM = 5.0
+# Для co-favorite берём только последние N избранных пользователя,
+# чтобы «коллекционеры» не давали квадратичный взрыв пар
+MAX_FAVORITES_PER_USER = 100
+
+
+def load_product_features():
+    """
+    Загружает признаки активных товаров в массивы NumPy.
+    Товары упорядочены по категории, чтобы каждая категория была непрерывным блоком.
+    """
+    rows = Product.objects.filter(is_active=True).order_by('category_id', 'id').values_list(
+        'id', 'category_id', 'material_id', 'price', 'width_mm', 'height_mm', 'diameter_mm'
+    )
+
+    ids, categories, materials, prices, dimensions = [], [], [], [], []
+    for product_id, category_id, material_id, price, width, height, diameter in rows.iterator(chunk_size=5000):
+        ids.append(product_id)
+        categories.append(category_id)
+        materials.append(material_id)
+        prices.append(float(price))
+        dimensions.append([
+            float(value) if value is not None else np.nan
+            for value in (width, height, diameter)
+        ])
+
+    prices = np.maximum(np.array(prices, dtype=np.float64), 1.0)
+    return {
+        'ids': np.array(ids, dtype=np.int64),
+        'category': np.array(categories, dtype=np.int64),
+        'material': np.array(materials, dtype=np.int64),
+        'price_band': np.floor(np.log(prices) / np.log(PRICE_BAND_RATIO)).astype(np.float32),
+        'dimensions': np.array(dimensions, dtype=np.float32).reshape(-1, 3),
+    }
+
+
+def _positions(ids, product_ids):
+    """Позиции товаров в массиве ids (-1, если товара нет среди активных)"""
+    sorter = np.argsort(ids)
+    found = np.searchsorted(ids, product_ids, sorter=sorter).clip(0, max(len(ids) - 1, 0))
+    positions = sorter[found]
+    return np.where(ids[positions] == product_ids, positions, -1)
+
+
+def load_co_favorites(ids):
+    """
+    Считает, сколько пользователей добавили в избранное одновременно оба товара.
+    Возвращает COO-массивы (rows, cols, values) в позициях ids, отсортированные по строке.
+    """
+    n = len(ids)
+    empty = np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32)
+    if n == 0:
+        return empty
+
+    favorites = Favorite.objects.filter(product__is_active=True).order_by(
+        'user_id', '-added_at'
+    ).values_list('user_id', 'product_id')
+
+    keys = []
+    current_user, current_items = None, []
+
+    def flush():
+        positions = _positions(ids, np.array(current_items[:MAX_FAVORITES_PER_USER], dtype=np.int64))
+        positions = positions[positions >= 0]
+        if len(positions) < 2:
+            return
+        pair_rows, pair_cols = np.meshgrid(positions, positions, indexing='ij')
+        mask = pair_rows != pair_cols
+        keys.append(pair_rows[mask] * n + pair_cols[mask])
+
+    for user_id, product_id in favorites.iterator(chunk_size=10000):
+        if user_id != current_user:
+            if current_items:
+                flush()
+            current_user, current_items = user_id, []
+        current_items.append(product_id)
+    if current_items:
+        flush()
+
+    if not keys:
+        return empty
+
+    unique_keys, counts = np.unique(np.concatenate(keys), return_counts=True)
+    values = np.log1p(counts) / np.log1p(counts.max())
+    return unique_keys // n, unique_keys % n, values.astype(np.float32)
+
+
+def _base_scores(features, a, b):
+    """
+    Оценка сходства без co-favorite для индексов a и b.
+    Работает и для матрицы (a[:, None], b[None, :]), и для списка пар одинаковой длины.
+    """
+    scores = WEIGHTS['category'] * (features['category'][a] == features['category'][b]).astype(np.float32)
+    scores += WEIGHTS['material'] * (features['material'][a] == features['material'][b])
+
+    band_distance = np.abs(features['price_band'][a] - features['price_band'][b])
+    scores += WEIGHTS['price'] * np.clip(1.0 - band_distance / PRICE_BAND_SPAN, 0.0, None)
+
+    # Размеры сравниваем только там, где они указаны у обоих товаров
+    dimensions = features['dimensions']
+    dim_total = np.zeros_like(scores)
+    dim_count = np.zeros_like(scores)
+    for axis in range(dimensions.shape[1]):
+        column = dimensions[:, axis]
+        similarity = np.exp(-np.abs(column[a] - column[b]) / DIMENSION_SCALE_MM)
+        valid = ~np.isnan(similarity)
+        dim_total += np.where(valid, similarity, 0.0)
+        dim_count += valid
+    scores += WEIGHTS['dimensions'] * dim_total / np.maximum(dim_count, 1.0)
+    return scores
+
+
+def _top_k_in_category(features, co_favorites, block_start, block_end, k, chunk_size):
+    """Top-K соседей внутри одной категории; возвращает пары (rows, cols, scores)"""
+    rows, cols, values = co_favorites
+    block = np.arange(block_start, block_end)
+    k = min(k, len(block) - 1)
+    if k <= 0:
+        return None
+
+    result_rows, result_cols, result_scores = [], [], []
+    for start in range(block_start, block_end, chunk_size):
+        end = min(start + chunk_size, block_end)
+        chunk = np.arange(start, end)
+        scores = _base_scores(features, chunk[:, None], block[None, :])
+
+        lo, hi = np.searchsorted(rows, [start, end])
+        in_block = (cols[lo:hi] >= block_start) & (cols[lo:hi] < block_end)
+        scores[rows[lo:hi][in_block] - start, cols[lo:hi][in_block] - block_start] += (
+            WEIGHTS['co_favorite'] * values[lo:hi][in_block]
+        )
+
+        # Товар не может быть похож сам на себя
+        scores[np.arange(end - start), chunk - block_start] = -np.inf
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        result_rows.append(np.repeat(chunk, k))
+        result_cols.append((top + block_start).ravel())
+        result_scores.append(np.take_along_axis(scores, top, axis=1).ravel())
+
+    return np.concatenate(result_rows), np.concatenate(result_cols), np.concatenate(result_scores)
+
+
+def compute_neighbors(features, co_favorites, top_k=DEFAULT_TOP_K, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Возвращает (rows, cols, scores, ranks) - top-K соседей каждого товара
+    в позициях features['ids'], ранг 0 - самый похожий.
+    """
+    category = features['category']
+    parts = []
+
+    # Плотный расчёт внутри каждой категории (категории идут непрерывными блоками)
+    boundaries = np.flatnonzero(np.diff(category)) + 1
+    starts = np.concatenate(([0], boundaries)) if len(category) else np.empty(0, np.int64)
+    ends = np.concatenate((boundaries, [len(category)])) if len(category) else np.empty(0, np.int64)
+    for block_start, block_end in zip(starts, ends):
+        part = _top_k_in_category(features, co_favorites, block_start, block_end, top_k, chunk_size)
+        if part is not None:
+            parts.append(part)
+
+    # Межкатегорийные кандидаты - только пары с общими «лайками»
+    rows, cols, values = co_favorites
+    cross = category[rows] != category[cols]
+    if cross.any():
+        cross_rows, cross_cols = rows[cross], cols[cross]
+        cross_scores = _base_scores(features, cross_rows, cross_cols) + WEIGHTS['co_favorite'] * values[cross]
+        parts.append((cross_rows, cross_cols, cross_scores))
+
+    if not parts:
+        empty = np.empty(0, np.int64)
+        return empty, empty, np.empty(0, np.float32), empty
+
+    rows = np.concatenate([part[0] for part in parts])
+    cols = np.concatenate([part[1] for part in parts])
+    scores = np.concatenate([part[2] for part in parts]).astype(np.float32)
+
+    # Сортируем по (товар, -оценка) и оставляем первые K в каждой группе
+    order = np.lexsort((-scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    ranks = np.arange(len(rows)) - np.searchsorted(rows, rows, side='left')
+    keep = (ranks < top_k) & np.isfinite(scores) & (scores > 0)
+    return rows[keep], cols[keep], scores[keep], ranks[keep]
+
+
+def rebuild_similar_products(top_k=DEFAULT_TOP_K, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=5000):
+    """
+    Полный пересчёт таблицы SimilarProduct.
+    Расчёт идёт вне транзакции; замена строк - одной транзакцией,
+    чтобы страница товара никогда не видела пустую таблицу.
+    """
+    features = load_product_features()
+    co_favorites = load_co_favorites(features['ids'])
+    rows, cols, scores, ranks = compute_neighbors(features, co_favorites, top_k, chunk_size)
+
+    ids = features['ids']
+    links = (
+        SimilarProduct(
+            product_id=int(ids[row]),
+            similar_id=int(ids[col]),
+            score=float(score),
+            rank=int(rank),
+        )
+        for row, col, score, rank in zip(rows, cols, scores, ranks)
+    )
+
+    created = 0
+    with transaction.atomic(using=router.db_for_write(SimilarProduct)):
+        SimilarProduct.objects.all().delete()
+        batch = []
+        for link in links:
+            batch.append(link)
+            if len(batch) >= batch_size:
+                SimilarProduct.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            SimilarProduct.objects.bulk_create(batch)
+            created += len(batch)
+
+    return len(ids), created
@@ -0,0 +1,69 @@
+# catalog/roles.py
+"""
+Роль пользователя и его завод - один раз на запрос.
+
+RoleMiddleware кладёт в request.role ленивый Role: он вычисляется при
+первом обращении (из view, шаблона или лимитов частоты) и дальше
+берётся готовым. Завод приходит вместе с пользователем из кэша
+CachedModelBackend, поэтому обычно это ноль запросов и никаких
+исключений DoesNotExist для покупателей.
+"""
+from django.utils.functional import SimpleLazyObject
+
+from .models import Factory
+
+ROLE_ANONYMOUS = 'anonymous'
+ROLE_CUSTOMER = 'customer'
+ROLE_FACTORY = 'factory'
+
+
+def factory_of(user):
+    """Завод пользователя или None"""
+    if user is None or not user.is_authenticated:
+        return None
+    try:
+        return user.factory
+    except Factory.DoesNotExist:
+        return None
+
+
+class Role:
+    """Роль пользователя на время запроса"""
+
+    def __init__(self, user):
+        self.user = user
+        self.factory = factory_of(user)
+        if self.factory is not None:
+            self.name = ROLE_FACTORY
+        elif user.is_authenticated:
+            self.name = ROLE_CUSTOMER
+        else:
+            self.name = ROLE_ANONYMOUS
+
+    @property
+    def is_factory(self):
+        return self.name == ROLE_FACTORY
+
+    @property
+    def is_customer(self):
+        return self.name == ROLE_CUSTOMER
+
+    def __str__(self):
+        return self.name
+
+
+def get_role(request):
+    """Role запроса; без RoleMiddleware (тесты, команды) - вычисляется на месте"""
+    role = getattr(request, 'role', None)
+    return role if role is not None else Role(request.user)
+
+
+class RoleMiddleware:
+    """Ставится после AuthenticationMiddleware"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.role = SimpleLazyObject(lambda: Role(request.user))
+        return self.get_response(request)
@@ -0,0 +1,112 @@
+# catalog/routers.py
+"""
+Чтение с реплик, запись на основную БД.
+
+Реплики перечислены в settings.CATALOG_DB_REPLICAS (алиасы DATABASES).
+Чтения моделей из CATALOG_DB_REPLICA_APPS идут на реплику, выбранную
+один раз на запрос; всё остальное - на default. Чтобы пользователь
+видел свои изменения, основная БД «закрепляется»:
+- на весь небезопасный запрос (POST, PUT, ...);
+- после первой записи моделей этих приложений и внутри transaction.atomic();
+- на CATALOG_DB_PIN_SECONDS после запроса с записью (cookie), пока
+  реплики догоняют основную БД.
+Счётчики просмотров и подобные записи, которые не нужно сразу читать,
+делаются внутри unpinned() и закрепления не вызывают. Вне HTTP-запросов
+(команды) всё идёт на default. Без реплик роутер ничего не меняет.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICAS = list(getattr(settings, 'CATALOG_DB_REPLICAS', []))
+REPLICA_APPS = set(getattr(settings, 'CATALOG_DB_REPLICA_APPS', ['catalog']))
+PIN_SECONDS = getattr(settings, 'CATALOG_DB_PIN_SECONDS', 5)
+PIN_COOKIE = 'db_primary'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_local = threading.local()
+
+
+def reset(pinned=False):
+    """Начало запроса: свой выбор реплики и закрепления"""
+    _local.pinned = pinned
+    _local.wrote = False
+    _local.unpinned = 0
+    _local.replica = None
+
+
+def is_pinned():
+    # Вне запроса (команды, фоновые задачи) реплики не используются:
+    # чтение с отстающей реплики перед записью испортило бы данные
+    return getattr(_local, 'pinned', True)
+
+
+def wrote():
+    """Была ли в текущем запросе запись, требующая чтения с основной БД"""
+    return getattr(_local, 'wrote', False)
+
+
+@contextmanager
+def unpinned():
+    """Записи внутри блока не закрепляют основную БД (счётчики, статистика)"""
+    _local.unpinned = getattr(_local, 'unpinned', 0) + 1
+    try:
+        yield
+    finally:
+        _local.unpinned -= 1
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if not REPLICAS or model._meta.app_label not in REPLICA_APPS:
+            return None
+        if is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replica = getattr(_local, 'replica', None)
+        if replica is None:
+            replica = _local.replica = random.choice(REPLICAS)
+        return replica
+
+    def db_for_write(self, model, **hints):
+        if REPLICAS and model._meta.app_label in REPLICA_APPS and not getattr(_local, 'unpinned', 0):
+            _local.pinned = True
+            _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема и данные приходят на реплики репликацией
+        if db in REPLICAS:
+            return False
+        return None
+
+
+class ReplicaPinMiddleware:
+    """
+    Закрепляет основную БД за небезопасными запросами и ставит cookie
+    после записи. Ставится первым после SecurityMiddleware, чтобы видеть
+    записи всех остальных слоёв.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not REPLICAS:
+            return self.get_response(request)
+
+        reset(pinned=request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES)
+        response = self.get_response(request)
+        if wrote():
+            response.set_cookie(PIN_COOKIE, '1', max_age=PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,351 @@
+# catalog/sharding.py
+"""
+Шардирование каталога по заводам (необязательный режим).
+
+Товары завода и всё, что к ним привязано (фото, цены, карточки, история,
+активность, избранное, архив), лежат в одной БД - шарде завода (Factory.shard,
+пусто - основная БД). Шарды перечислены в settings.CATALOG_SHARDS; без
+них модуль ничего не меняет. Обычно почти все заводы живут в основной БД,
+а на отдельные шарды командой move_factory_shard выносятся крупнейшие,
+чтобы их таблицы не замедляли общие.
+
+- ShardRouter отправляет запросы к моделям SHARDED_MODELS в текущий шард
+  (activate / use_shard), новые товары - в шард своего завода.
+- ShardMiddleware на каждый запрос выбирает шард завода пользователя;
+  страницы товара и завода переключаются сами (shard_for_article).
+- Общий каталог и избранное читаются со всех шардов: across_shards()
+  сливает отсортированные выборки (scatter-gather).
+- Справочники (пользователи, заводы, категории, материалы) живут в
+  основной БД и копируются на шарды сигналами (mirror) и командой
+  sync_catalog_shards - они нужны для внешних ключей и JOIN. Пароли
+  на шарды не копируются.
+- id строк на шарде N начинаются с N * ID_RANGE (reserve_id_ranges),
+  поэтому id товаров уникальны во всём каталоге. Порядок CATALOG_SHARDS
+  не меняют, новые шарды добавляют в конец.
+"""
+import heapq
+import threading
+from contextlib import contextmanager
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.db.models import F
+from django.db.models.constants import LOOKUP_SEP
+
+from .models import Category, Factory, Material, Product
+from .roles import get_role
+
+SHARDS = list(getattr(settings, 'CATALOG_SHARDS', []))
+
+# Модели, строки которых лежат в шарде завода
+SHARDED_MODELS = {
+    'product', 'productimage', 'productprice', 'productactivity', 'similarproduct',
+    'productchange', 'productcard', 'favorite', 'archivedproduct', 'archivedproductimage',
+}
+# Справочники, копируемые на все шарды
+MIRRORED_MODELS = [User, Factory, Category, Material]
+
+ID_RANGE = 10 ** 12
+
+PLACEMENT_KEY = 'catalog:shards:placement'
+# Страховка на случай, если удаление ключа не дошло до кэша воркера
+PLACEMENT_TIMEOUT = 30
+
+_local = threading.local()
+
+
+def all_shards():
+    """Основная БД и шарды"""
+    return [DEFAULT_DB_ALIAS, *SHARDS]
+
+
+def is_sharded(model):
+    return model._meta.app_label == 'catalog' and model._meta.model_name in SHARDED_MODELS
+
+
+def current():
+    return getattr(_local, 'shard', DEFAULT_DB_ALIAS)
+
+
+def activate(alias):
+    """Шард для запросов до конца HTTP-запроса (ShardMiddleware сбрасывает)"""
+    _local.shard = alias or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_shard(alias):
+    previous = current()
+    activate(alias)
+    try:
+        yield alias
+    finally:
+        activate(previous)
+
+
+def each_shard():
+    """Перебирает шарды, делая каждый текущим (команды, массовые обновления)"""
+    for alias in all_shards():
+        with use_shard(alias):
+            yield alias
+
+
+def read_db(model, alias):
+    """БД для чтения модели из шарда alias (основная - с учётом реплик)"""
+    with use_shard(alias):
+        return router.db_for_read(model)
+
+
+def _placement():
+    """{id завода: шард} для заводов вне основной БД - их единицы"""
+    placement = cache.get(PLACEMENT_KEY)
+    if placement is None:
+        placement = dict(Factory.objects.using(DEFAULT_DB_ALIAS).exclude(shard='').values_list('id', 'shard'))
+        cache.set(PLACEMENT_KEY, placement, PLACEMENT_TIMEOUT)
+    return placement
+
+
+def invalidate_placement():
+    cache.delete(PLACEMENT_KEY)
+
+
+def shard_for_factory(factory):
+    """Шард завода (объект или id)"""
+    if not SHARDS or factory is None:
+        return DEFAULT_DB_ALIAS
+    if isinstance(factory, Factory):
+        return factory.shard or DEFAULT_DB_ALIAS
+    return _placement().get(factory, DEFAULT_DB_ALIAS)
+
+
+def shard_for_article(article):
+    """
+    Шард товара по артикулу «<id завода>-<номер>» без запросов к БД.
+    Артикул другого вида (задан вручную) ищется по всем шардам.
+    """
+    if not SHARDS:
+        return DEFAULT_DB_ALIAS
+    prefix, _, _ = article.partition('-')
+    if prefix.isdigit():
+        return shard_for_factory(int(prefix))
+    for alias in all_shards():
+        if Product.objects.using(alias).filter(article=article).exists():
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+class _Descending:
+    """Значение с обратным порядком для ключа слияния"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+class ScatterGather:
+    """
+    Отсортированный QuerySet, выполняемый на всех шардах. count() - сумма
+    по шардам, срез [a:b] - первые b строк с каждого шарда, слитые по ключу
+    сортировки. Этого достаточно Paginator'у; страница N стоит N страниц
+    строк с каждого шарда, поэтому глубокая пагинация дороже обычной.
+    NULL при сортировке всегда в конце - одинаково во всех СУБД.
+    Сортировка по связанному полю (local_price__price) сливается по
+    аннотации merge_key_N: у объекта нет атрибута с именем лукапа.
+    """
+    ordered = True
+
+    def __init__(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering] + [('pk', False)]
+        lookups = {
+            f'merge_key_{i}': F(name) for i, (name, _) in enumerate(self.fields) if LOOKUP_SEP in name
+        }
+        if lookups:
+            queryset = queryset.annotate(**lookups)
+            self.fields = [
+                (f'merge_key_{i}' if LOOKUP_SEP in name else name, descending)
+                for i, (name, descending) in enumerate(self.fields)
+            ]
+        self.queryset = queryset.order_by(*(
+            F(name).desc(nulls_last=True) if descending else F(name).asc(nulls_last=True)
+            for name, descending in self.fields
+        ))
+
+    def _key(self, obj):
+        key = []
+        for name, descending in self.fields:
+            value = getattr(obj, name)
+            if value is None:
+                key.append((1,))
+            else:
+                key.append((0, _Descending(value) if descending else value))
+        return key
+
+    def _parts(self):
+        return [self.queryset.using(read_db(self.queryset.model, alias)) for alias in all_shards()]
+
+    def count(self):
+        return sum(part.count() for part in self._parts())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        parts = [list(part[:stop]) for part in self._parts()]
+        return list(islice(heapq.merge(*parts, key=self._key), start, stop))
+
+    def __iter__(self):
+        return heapq.merge(*(part.iterator() for part in self._parts()), key=self._key)
+
+
+def across_shards(queryset):
+    """QuerySet по всем шардам; без шардов - он же без изменений"""
+    return ScatterGather(queryset) if SHARDS else queryset
+
+
+def _mirror_values(instance):
+    values = {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+    if isinstance(instance, User):
+        values['password'] = '!'
+    return values
+
+
+def mirror(model, instances, aliases=None):
+    """Upsert справочных строк основной БД на шарды"""
+    pk = model._meta.pk
+    fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+    rows = [_mirror_values(instance) for instance in instances]
+    if not rows:
+        return
+    for alias in aliases or SHARDS:
+        model.objects.using(alias).bulk_create(
+            [model(**values) for values in rows],
+            update_conflicts=True, unique_fields=[pk.name], update_fields=fields,
+        )
+
+
+def unmirror(model, pk, aliases=None):
+    """Удаляет справочную строку с шардов вместе с зависящими от неё товарами"""
+    for alias in aliases or SHARDS:
+        # Сигналы удаляемых товаров пишут историю и карточки в тот же шард
+        with use_shard(alias):
+            model.objects.using(alias).filter(pk=pk).delete()
+
+
+def insert_rows(model, objs, using=None, batch_size=500):
+    """
+    bulk_create без подмены дат: поля auto_now/auto_now_add при вставке
+    получают текущее время, поэтому исходные значения возвращаются UPDATE'ом
+    """
+    dated = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    values = [[getattr(obj, field.attname) for field in dated] for obj in objs]
+    model.objects.using(using).bulk_create(objs, batch_size=batch_size)
+    if dated and objs:
+        for obj, row in zip(objs, values):
+            for field, value in zip(dated, row):
+                setattr(obj, field.attname, value)
+        model.objects.using(using).bulk_update(objs, [field.name for field in dated], batch_size=batch_size)
+
+
+def _set_sequence(connection, table, column, start):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s AND seq < %s', [start, table, start])
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                [table, start, table],
+            )
+        elif connection.vendor == 'postgresql':
+            quote = connection.ops.quote_name
+            cursor.execute(
+                f'SELECT setval(pg_get_serial_sequence(%s, %s), '
+                f'GREATEST(%s, (SELECT COALESCE(MAX({quote(column)}), 0) FROM {quote(table)})))',
+                [table, column, start],
+            )
+        elif connection.vendor == 'mysql':
+            # MySQL сам не опускает счётчик ниже MAX(id)
+            cursor.execute(f'ALTER TABLE {connection.ops.quote_name(table)} AUTO_INCREMENT = {int(start) + 1}')
+        else:
+            return False
+    return True
+
+
+def reserve_id_ranges(alias):
+    """
+    Сдвигает счётчики id шардированных таблиц шарда к началу его диапазона.
+    Возвращает False, если СУБД не поддерживается.
+    """
+    start = all_shards().index(alias) * ID_RANGE
+    if not start:
+        return True
+    connection = connections[alias]
+    for model in apps.get_app_config('catalog').get_models():
+        pk = model._meta.pk
+        if is_sharded(model) and pk.get_internal_type() in ('AutoField', 'BigAutoField'):
+            if not _set_sequence(connection, model._meta.db_table, pk.column, start):
+                return False
+    return True
+
+
+class ShardRouter:
+    """
+    Ставится перед PrimaryReplicaRouter: запросы к основной БД он
+    не решает, и реплики работают как прежде.
+    """
+
+    def _shard(self, model, hints):
+        instance = hints.get('instance')
+        if instance is not None and is_sharded(type(instance)):
+            if instance._state.db is not None:
+                # Связанные объекты - из БД исходного (реплика -> основная)
+                return instance._state.db if instance._state.db in SHARDS else DEFAULT_DB_ALIAS
+            if isinstance(instance, Product):
+                return shard_for_factory(instance.factory_id)
+        elif isinstance(instance, Factory):
+            # factory.products, product.factory = factory
+            return shard_for_factory(instance)
+        return current()
+
+    def db_for_read(self, model, **hints):
+        if not SHARDS or not is_sharded(model):
+            return None
+        alias = self._shard(model, hints)
+        return alias if alias != DEFAULT_DB_ALIAS else None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not SHARDS or not {obj1._state.db, obj2._state.db} & set(SHARDS):
+            return None
+        if is_sharded(type(obj1)) and is_sharded(type(obj2)):
+            return obj1._state.db == obj2._state.db
+        # Справочники есть в каждом шарде
+        return True
+
+
+class ShardMiddleware:
+    """Ставится после RoleMiddleware: завод пользователя работает со своим шардом"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if SHARDS:
+            activate(shard_for_factory(get_role(request).factory))
+        return self.get_response(request)
@@ -0,0 +1,231 @@
+# catalog/signals.py
+from functools import wraps
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from django.contrib.auth.models import User
+
+from .autocomplete import mark_changed_on_commit
+from .backends import invalidate_cached_user
+from .cards import SOURCE_FIELDS, refresh_cards
+from .currency import invalidate_rates, reprice_currency, sync_product_prices
+from .favorites import invalidate_favorites_count, invalidate_product_favorites
+from .history import deleted_image, record, track_image_save, track_product_save
+from .image_hashes import hash_file
+from .images import schedule_main_image_refresh
+from .lookups import invalidate_lookups
+from .models import (
+    Category, CurrencyRate, Factory, Favorite, Material, Product, ProductCard, ProductImage, ProductPrice,
+)
+from .sharding import (
+    SHARDS, all_shards, each_shard, invalidate_placement, mirror, shard_for_factory, unmirror, use_shard,
+)
+
+# Отправляется один раз на пакет после массовых изменений товаров
+# (bulk_update не отправляет post_save). Аргументы: product_ids
+products_bulk_updated = Signal()
+
+
+def _on_instance_shard(handler):
+    """
+    Запросы обработчика - в шард, куда записан объект (using), а не в текущий:
+    товар, сохранённый из shell или команды, попадает в шард своего завода
+    """
+    @wraps(handler)
+    def wrapper(sender, instance, using=None, **kwargs):
+        with use_shard(using):
+            return handler(sender, instance, using=using, **kwargs)
+    return wrapper
+
+
+@receiver(pre_save, sender=ProductImage)
+def product_image_hash(sender, instance, raw=False, **kwargs):
+    """Хэш нового файла - до записи в хранилище, пока он ещё в памяти"""
+    if not raw and instance.image and not instance.image._committed:
+        instance.phash = hash_file(instance.image)
+
+
+@receiver(post_save, sender=ProductImage)
+@_on_instance_shard
+def product_image_saved(sender, instance, created=False, raw=False, **kwargs):
+    """Главное фото у товара одно: снимаем флаг с остальных и обновляем указатель"""
+    if not raw:
+        track_image_save(instance, created)
+    if instance.is_main:
+        ProductImage.objects.filter(
+            product_id=instance.product_id, is_main=True
+        ).exclude(pk=instance.pk).update(is_main=False)
+    schedule_main_image_refresh([instance.product_id])
+
+
+@receiver(post_delete, sender=ProductImage)
+@_on_instance_shard
+def product_image_deleted(sender, instance, **kwargs):
+    record(deleted_image(instance))
+    schedule_main_image_refresh([instance.product_id])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=Factory)
+@receiver(post_delete, sender=Factory)
+def factory_changed(sender, instance, **kwargs):
+    """Профиль завода кэшируется вместе с пользователем"""
+    invalidate_cached_user(instance.user_id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def favorite_changed(sender, instance, **kwargs):
+    """Счётчик избранного в шапке"""
+    invalidate_favorites_count(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Factory)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Material)
+def mirror_saved(sender, instance, using=DEFAULT_DB_ALIAS, update_fields=None, **kwargs):
+    """Справочники копируются на шарды каталога (catalog.sharding)"""
+    if not SHARDS or using != DEFAULT_DB_ALIAS:
+        return
+    # Вход пользователя меняет только last_login - шардам он не нужен
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    mirror(sender, [instance])
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Factory)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Material)
+def mirror_deleted(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Удаление на шардах - внутри транзакции удаления в основной БД: если шард
+    откажет (PROTECT), откатится и основная
+    """
+    if SHARDS and using == DEFAULT_DB_ALIAS:
+        unmirror(sender, instance.pk)
+
+
+@receiver(post_save, sender=Factory)
+@receiver(post_delete, sender=Factory)
+def factory_placement_changed(sender, **kwargs):
+    if SHARDS:
+        invalidate_placement()
+
+
+@receiver(post_save, sender=Factory)
+def factory_card_name(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ProductCard.objects.using(shard_for_factory(instance)).filter(
+            factory=instance
+        ).update(factory_name=instance.name)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+def lookups_changed(sender, **kwargs):
+    invalidate_lookups()
+
+
+@receiver(post_save, sender=Category)
+def category_cards(sender, instance, raw=False, **kwargs):
+    if not raw:
+        for alias in all_shards():
+            ProductCard.objects.using(alias).filter(category=instance).update(
+                category_slug=instance.slug, category_name=instance.name
+            )
+
+
+@receiver(post_save, sender=Material)
+def material_cards(sender, instance, raw=False, **kwargs):
+    if not raw:
+        for alias in all_shards():
+            ProductCard.objects.using(alias).filter(material=instance).update(material_label=instance.name)
+
+
+@receiver(post_save, sender=Factory)
+@receiver(post_delete, sender=Factory)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def autocomplete_names_changed(sender, raw=False, using=None, **kwargs):
+    """Заводы и категории в подсказках - полная пересборка индекса воркеров"""
+    if not raw:
+        mark_changed_on_commit(using=using)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, using=None, **kwargs):
+    mark_changed_on_commit([instance.pk], using=using)
+
+
+@receiver(post_save, sender=CurrencyRate)
+def currency_rate_saved(sender, instance, **kwargs):
+    """Новый курс - один UPDATE цен в этой валюте"""
+    invalidate_rates()
+    for _ in each_shard():
+        reprice_currency(instance.code, instance.rate)
+
+
+@receiver(post_delete, sender=CurrencyRate)
+def currency_rate_deleted(sender, instance, **kwargs):
+    invalidate_rates()
+    for alias in all_shards():
+        ProductPrice.objects.using(alias).filter(currency=instance.code).delete()
+
+
+@receiver(post_save, sender=Product)
+@_on_instance_shard
+def product_history(sender, instance, created=False, update_fields=None, raw=False, **kwargs):
+    """Изменённые поля товара - в журнал ProductChange"""
+    if not raw:
+        track_product_save(instance, created, update_fields)
+
+
+@receiver(post_save, sender=Product)
+@_on_instance_shard
+def product_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'price' not in update_fields:
+        return
+    sync_product_prices([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+@_on_instance_shard
+def product_card_saved(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Карточка каталога пересобирается, только если изменились её поля"""
+    if raw or (update_fields is not None and not SOURCE_FIELDS.intersection(update_fields)):
+        return
+    refresh_cards([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def product_favorites_count(sender, instance, created=False, update_fields=None, raw=False, **kwargs):
+    """Счётчик избранного считает только активные товары"""
+    if raw or created or (update_fields is not None and 'is_active' not in update_fields):
+        return
+    invalidate_product_favorites([instance.pk])
+
+
+@receiver(products_bulk_updated)
+def products_prices_bulk_updated(sender, product_ids, **kwargs):
+    sync_product_prices(product_ids)
+
+
+@receiver(products_bulk_updated)
+def products_cards_bulk_updated(sender, product_ids, **kwargs):
+    refresh_cards(product_ids)
+
+
+@receiver(products_bulk_updated)
+def products_favorites_bulk_updated(sender, product_ids, **kwargs):
+    invalidate_product_favorites(product_ids)
@@ -0,0 +1,41 @@
+# catalog/sizes.py
+"""
+Размеры колец.
+
+Российский размер кольца - внутренний диаметр в миллиметрах с шагом 0.5.
+Размер считается при сохранении товара (Product.ring_size), поэтому поиск
+по размеру - равенство по индексу, а не вычисление по каждой строке.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+RING_SIZE_MIN = Decimal('14')
+RING_SIZE_MAX = Decimal('23')
+RING_SIZE_STEP = Decimal('0.5')
+
+
+def _us_size(ru_size):
+    """Ближайший американский размер (шаг 0.5): диаметр = 11.63 + 0.8128 × размер"""
+    us = (ru_size - Decimal('11.63')) / Decimal('0.8128')
+    return (us * 2).quantize(Decimal('1'), rounding=ROUND_HALF_UP) / 2
+
+
+# (размер RU, размер US) - таблица соответствия для фильтра и подписей
+RING_SIZES = []
+_size = RING_SIZE_MIN
+while _size <= RING_SIZE_MAX:
+    RING_SIZES.append((_size, _us_size(_size)))
+    _size += RING_SIZE_STEP
+
+
+def ring_size_for(diameter_mm):
+    """Российский размер по внутреннему диаметру или None, если вне таблицы"""
+    if diameter_mm is None:
+        return None
+    size = (Decimal(diameter_mm) * 2).quantize(Decimal('1'), rounding=ROUND_HALF_UP) / 2
+    if not RING_SIZE_MIN <= size <= RING_SIZE_MAX:
+        return None
+    return size.quantize(Decimal('0.1'))
+
+
+def ring_size_choices():
+    return [(str(ru.quantize(Decimal('0.1'))), f'{ru.normalize()} (US {us.normalize()})') for ru, us in RING_SIZES]
@@ -0,0 +1,143 @@
+# catalog/snapshots.py
+"""
+Офлайн-каталог: service worker и сжатый JSON-снимок каталога.
+
+Команда build_catalog_snapshot пишет в SNAPSHOTS_ROOT снимок самых
+популярных карточек (ProductCard) - таблицу: список полей и строки
+массивами, справочники (категории, материалы, заводы) отдельно. Имя
+файла содержит версию - хэш содержимого, поэтому файл неизменяем и
+кэшируется навсегда; manifest.json указывает на текущую версию.
+
+Service worker (шаблон catalog/sw.js, включается CATALOG_SERVICE_WORKER):
+- заранее кэширует статику и страницу /offline/;
+- главную, страницы товаров и заводов отдаёт из кэша и обновляет
+  в фоне (stale-while-revalidate). Кэшируются только ответы с заголовком
+  OFFLINE_HEADER - страницы анонимных посетителей без flash-сообщений
+  (offline_page): персональные страницы в кэш не попадают;
+- раз в минуту сверяет версию снимка (ETag манифеста); новая версия -
+  загрузка снимка и сброс кэша страниц;
+- без сети страницы, которых нет в кэше, строятся из снимка (js/offline.js).
+"""
+import hashlib
+import json
+import os
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .currency import BASE_CURRENCY, BASE_SYMBOL
+from .models import ProductCard
+from .sharding import across_shards
+
+SERVICE_WORKER = getattr(settings, 'CATALOG_SERVICE_WORKER', False)
+SNAPSHOTS_ROOT = Path(getattr(settings, 'CATALOG_SNAPSHOTS_ROOT', Path(settings.MEDIA_ROOT) / 'snapshots'))
+SNAPSHOTS_URL = getattr(settings, 'CATALOG_SNAPSHOTS_URL', settings.MEDIA_URL + 'snapshots/')
+# Товаров в снимке (самые популярные)
+SNAPSHOT_PRODUCTS = getattr(settings, 'CATALOG_SNAPSHOT_PRODUCTS', 2000)
+
+MANIFEST = 'manifest.json'
+# Прежние версии хранятся, пока их могут докачивать клиенты со старым манифестом
+KEEP_VERSIONS = 2
+
+OFFLINE_HEADER = 'X-Catalog-Offline'
+
+# Статика страниц каталога - кэшируется service worker'ом при установке
+OFFLINE_STATIC = [
+    'css/base.css', 'css/catalog.css', 'css/dashboard.css', 'css/product.css', 'css/ruler.css',
+    'js/main.js', 'js/ruler.js', 'js/offline.js',
+]
+
+FIELDS = ['article', 'name', 'price', 'weight', 'in_stock', 'image', 'factory', 'category', 'material']
+
+
+def snapshot_name(version):
+    return f'catalog-{version}.json'
+
+
+def _write_atomic(path, content):
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    tmp_path.write_text(content, encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def _snapshot_payload(limit):
+    cards = across_shards(ProductCard.objects.order_by('-popularity_score').only(
+        'article', 'name', 'price', 'weight', 'in_stock', 'main_image_url',
+        'factory_id', 'factory_name', 'category_slug', 'category_name', 'material_id', 'material_label',
+        'popularity_score',
+    ))[:limit]
+    factories, categories, materials, rows = {}, {}, {}, []
+    for card in cards:
+        factories[str(card.factory_id)] = card.factory_name
+        categories[card.category_slug] = card.category_name
+        materials[str(card.material_id)] = card.material_label
+        rows.append([
+            card.article, card.name, str(card.price), str(card.weight), card.in_stock,
+            card.main_image_url, card.factory_id, card.category_slug, card.material_id,
+        ])
+    return {
+        'fields': FIELDS,
+        'currency': BASE_CURRENCY,
+        'currency_symbol': BASE_SYMBOL,
+        'factories': factories,
+        'categories': categories,
+        'materials': materials,
+        'products': rows,
+    }
+
+
+def read_manifest():
+    """Манифест текущего снимка или None, если снимок ещё не собран"""
+    try:
+        return json.loads((SNAPSHOTS_ROOT / MANIFEST).read_text(encoding='utf-8'))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def build_snapshot(limit=SNAPSHOT_PRODUCTS):
+    """Собирает снимок; если каталог не изменился, версия остаётся прежней. Возвращает манифест"""
+    payload = _snapshot_payload(limit)
+    content = json.dumps(payload, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    version = hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]
+    SNAPSHOTS_ROOT.mkdir(parents=True, exist_ok=True)
+    path = SNAPSHOTS_ROOT / snapshot_name(version)
+    if not path.exists():
+        _write_atomic(path, content)
+
+    previous = read_manifest()
+    if previous and previous['version'] == version:
+        return previous
+    manifest = {
+        'version': version,
+        'url': SNAPSHOTS_URL + snapshot_name(version),
+        'count': len(payload['products']),
+        'generated_at': timezone.now().isoformat(),
+        'history': ([version] + (previous or {}).get('history', []))[:KEEP_VERSIONS],
+    }
+    _write_atomic(SNAPSHOTS_ROOT / MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=1))
+
+    keep = {snapshot_name(v) for v in manifest['history']}
+    for entry in SNAPSHOTS_ROOT.glob(snapshot_name('*')):
+        if entry.name not in keep:
+            entry.unlink(missing_ok=True)
+    return manifest
+
+
+def offline_page(view):
+    """
+    Помечает ответ заголовком OFFLINE_HEADER, если service worker может
+    отдать его из кэша другим визитам этого посетителя: GET анонимного
+    посетителя, 200, не потоковый и без flash-сообщений.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        storage = getattr(request, '_messages', None)
+        if (SERVICE_WORKER and request.method == 'GET' and response.status_code == 200
+                and not response.streaming and not request.user.is_authenticated
+                and not (storage is not None and storage.used)):
+            response[OFFLINE_HEADER] = '1'
+        return response
+    return wrapper
@@ -0,0 +1,52 @@
+# catalog/streaming.py
+"""
+Потоковая отдача длинных списков.
+
+Страница рендерится один раз с меткой STREAM_MARKER на месте списка:
+всё до метки (шапка, стили, начало разметки) уходит клиенту сразу,
+затем карточки - пачками по chunk_size из .iterator(), затем хвост
+страницы. В памяти воркера одновременно только одна пачка строк,
+поэтому время до первого байта и память не растут с размером списка.
+"""
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+STREAM_MARKER = mark_safe('<!-- catalog:stream -->')
+
+CHUNK_SIZE = 200
+
+
+def _stream(request, head, tail, items, item_template, item_name, context, chunk_size):
+    yield head
+    template = get_template(item_template)
+    chunk = []
+    for item in items.iterator(chunk_size=chunk_size):
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield template.render({**context, item_name: chunk}, request)
+            chunk = []
+    if chunk:
+        yield template.render({**context, item_name: chunk}, request)
+    yield tail
+
+
+def stream_list(request, template_name, context, items, item_template, item_name='products',
+                chunk_size=CHUNK_SIZE):
+    """
+    StreamingHttpResponse для страницы template_name, в которой на месте
+    списка стоит {{ stream_marker }}. items - QuerySet, item_template
+    рендерит пачку строк из переменной item_name.
+    """
+    # Поток читается уже после выхода из view (и из activate() шарда):
+    # базу выбираем сейчас, пока активен нужный шард
+    items = items.using(items.db)
+    page = render_to_string(template_name, {**context, 'stream_marker': STREAM_MARKER}, request)
+    head, _, tail = page.partition(STREAM_MARKER)
+    response = StreamingHttpResponse(
+        _stream(request, head, tail, items, item_template, item_name, context, chunk_size),
+        content_type='text/html; charset=utf-8',
+    )
+    # nginx не должен копить ответ в буфере, иначе поток теряет смысл
+    response['X-Accel-Buffering'] = 'no'
+    return response
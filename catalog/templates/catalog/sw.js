@@ -0,0 +1,159 @@
+// Service worker офлайн-каталога (catalog/snapshots.py, отдаётся views.service_worker)
+//
+// Статика - из кэша с обновлением в фоне, фото товаров - из кэша.
+// Главная, страницы товаров и заводов - stale-while-revalidate: кэшируются
+// только ответы с заголовком CONFIG.header (страницы анонимного посетителя).
+// Без сети недостающие страницы строит js/offline.js из JSON-снимка каталога.
+
+const CONFIG = {{ config|safe }};
+
+const STATIC_CACHE = 'auroom-static';
+const MEDIA_CACHE = 'auroom-media';
+const PAGES_CACHE = 'auroom-pages';
+const DATA_CACHE = 'auroom-data';
+const CACHE_NAMES = [STATIC_CACHE, MEDIA_CACHE, PAGES_CACHE, DATA_CACHE];
+
+const MEDIA_LIMIT = 300;
+// Версия снимка сверяется не чаще раза в минуту
+const CHECK_INTERVAL = 60 * 1000;
+
+const PAGE_PATTERNS = [/^\/$/, /^\/product\/[^/]+\/$/, /^\/factory\/\d+\/$/];
+
+async function clearCaches(names) {
+    const existing = await caches.keys();
+    await Promise.all(existing
+        .filter(name => name.startsWith('auroom-') && !names.includes(name))
+        .map(name => caches.delete(name)));
+}
+
+if (!CONFIG.enabled) {
+    // Офлайн-каталог выключен: удаляем кэши и снимаем регистрацию
+    self.addEventListener('install', () => self.skipWaiting());
+    self.addEventListener('activate', event => {
+        event.waitUntil(clearCaches([]).then(() => self.registration.unregister()));
+    });
+} else {
+    let checkedAt = 0;
+
+    // Новая версия снимка: загружаем его и сбрасываем кэш страниц
+    async function checkSnapshot(force) {
+        if (!force && Date.now() - checkedAt < CHECK_INTERVAL) return;
+        checkedAt = Date.now();
+
+        const cache = await caches.open(DATA_CACHE);
+        const stored = await cache.match(CONFIG.manifestUrl);
+        const current = stored ? await stored.json() : null;
+        const response = await fetch(CONFIG.manifestUrl, {
+            credentials: 'omit',
+            headers: current ? { 'If-None-Match': `"${current.version}"` } : {}
+        });
+        // 304 - снимок не изменился
+        if (!response.ok) return;
+        const manifest = await response.clone().json();
+        if (current && current.version === manifest.version) return;
+
+        const snapshot = await fetch(manifest.url, { credentials: 'omit' });
+        if (!snapshot.ok) return;
+        await cache.put(manifest.url, snapshot);
+        await cache.put(CONFIG.manifestUrl, response);
+        if (current) {
+            await cache.delete(current.url);
+            await caches.delete(PAGES_CACHE);
+        }
+    }
+
+    async function offlinePage() {
+        const cached = await caches.match(CONFIG.offlineUrl);
+        return cached || Response.error();
+    }
+
+    async function cachedPage(event) {
+        const request = event.request;
+        const cache = await caches.open(PAGES_CACHE);
+        const cached = await cache.match(request, { ignoreVary: true });
+
+        let stored = Promise.resolve();
+        const network = fetch(request).then(response => {
+            // Страницу без пометки (вход, flash-сообщения, ошибка) из кэша удаляем
+            stored = response.ok && response.headers.get(CONFIG.header)
+                ? cache.put(request, response.clone())
+                : cache.delete(request, { ignoreVary: true });
+            return response;
+        });
+        event.waitUntil(network.then(() => stored).then(() => checkSnapshot(false)).catch(() => {}));
+
+        if (cached) return cached;
+        return network.catch(offlinePage);
+    }
+
+    async function staleWhileRevalidate(event, cacheName) {
+        const cache = await caches.open(cacheName);
+        const cached = await cache.match(event.request);
+        const network = fetch(event.request).then(response => {
+            if (response.ok) {
+                event.waitUntil(cache.put(event.request, response.clone()));
+            }
+            return response;
+        });
+        if (cached) {
+            event.waitUntil(network.catch(() => {}));
+            return cached;
+        }
+        return network;
+    }
+
+    async function cacheFirst(event, cacheName, limit) {
+        const cache = await caches.open(cacheName);
+        const cached = await cache.match(event.request);
+        if (cached) return cached;
+        const response = await fetch(event.request);
+        if (response.ok) {
+            event.waitUntil(cache.put(event.request, response.clone()).then(async () => {
+                const keys = await cache.keys();
+                await Promise.all(keys.slice(0, Math.max(0, keys.length - limit)).map(key => cache.delete(key)));
+            }));
+        }
+        return response;
+    }
+
+    self.addEventListener('install', event => {
+        event.waitUntil((async () => {
+            const cache = await caches.open(STATIC_CACHE);
+            await cache.addAll(CONFIG.precache.map(url => new Request(url, { credentials: 'omit', cache: 'reload' })));
+            await checkSnapshot(true).catch(() => {});
+            await self.skipWaiting();
+        })());
+    });
+
+    self.addEventListener('activate', event => {
+        event.waitUntil(clearCaches(CACHE_NAMES).then(() => self.clients.claim()));
+    });
+
+    self.addEventListener('fetch', event => {
+        const request = event.request;
+        const url = new URL(request.url);
+        if (url.origin !== self.location.origin) return;
+
+        if (request.mode === 'navigate') {
+            // Вход, выход, отправка форм: сохранённые страницы могут стать чужими
+            if (request.method !== 'GET' || CONFIG.resetUrls.includes(url.pathname)) {
+                event.waitUntil(caches.delete(PAGES_CACHE));
+                return;
+            }
+            if (PAGE_PATTERNS.some(pattern => pattern.test(url.pathname))) {
+                event.respondWith(cachedPage(event));
+            } else {
+                event.respondWith(fetch(request).catch(offlinePage));
+            }
+            return;
+        }
+
+        if (request.method !== 'GET') return;
+        if (url.pathname.startsWith(CONFIG.staticUrl)) {
+            event.respondWith(staleWhileRevalidate(event, STATIC_CACHE));
+        } else if (url.pathname.startsWith(CONFIG.mediaUrl) && !url.pathname.startsWith(CONFIG.snapshotsUrl)) {
+            // Файлы фото не перезаписываются: новое фото - новое имя
+            event.respondWith(cacheFirst(event, MEDIA_CACHE, MEDIA_LIMIT));
+        }
+    });
+}
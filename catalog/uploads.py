@@ -0,0 +1,52 @@
+# catalog/uploads.py
+"""
+Проверка загружаемых изображений до декодирования.
+
+Размер файла проверяется по UploadedFile.size, размеры в пикселях - по
+заголовку (Image.open читает только заголовок, пиксели не декодируются),
+поэтому «бомба» из маленького файла с огромным разрешением отсекается
+до того, как Pillow выделит под неё память.
+"""
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from PIL import Image, UnidentifiedImageError
+
+MAX_UPLOAD_BYTES = getattr(settings, 'CATALOG_MAX_UPLOAD_BYTES', 10 * 1024 * 1024)
+MAX_IMAGE_PIXELS = getattr(settings, 'CATALOG_MAX_IMAGE_PIXELS', 40_000_000)
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+
+
+def validate_image_upload(upload):
+    """ValidationError, если файл слишком большой, не изображение или больше MAX_IMAGE_PIXELS"""
+    if upload.size is not None and upload.size > MAX_UPLOAD_BYTES:
+        raise ValidationError(
+            f'Файл больше {MAX_UPLOAD_BYTES // (1024 * 1024)} МБ', code='file_too_large'
+        )
+
+    position = upload.tell() if hasattr(upload, 'tell') else 0
+    try:
+        with Image.open(upload) as image:
+            width, height = image.size
+            image_format = image.format
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValidationError('Файл не является изображением', code='invalid_image')
+    finally:
+        upload.seek(position)
+
+    if image_format not in ALLOWED_FORMATS:
+        raise ValidationError('Поддерживаются JPEG, PNG, WebP и GIF', code='invalid_format')
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ValidationError(
+            f'Изображение {width}×{height} больше допустимых {MAX_IMAGE_PIXELS // 1_000_000} Мпикс',
+            code='too_many_pixels'
+        )
+
+
+class LimitedImageField(forms.ImageField):
+    """ImageField, который проверяет размер и разрешение до полной проверки Pillow"""
+
+    def to_python(self, data):
+        if data not in self.empty_values:
+            validate_image_upload(data)
+        return super().to_python(data)
@@ -10,6 +10,9 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('product/<str:article>/', views.product_detail, name='product_detail'),
     path('factory/<int:factory_id>/', views.factory_detail, name='factory_detail'),
+    path('sitemap.xml', views.sitemap_index, name='sitemap_index'),
+    path('sw.js', views.service_worker, name='service_worker'),
+    path('offline/', views.offline, name='offline'),
     
     # Аутентификация
     path('register/', views.customer_register, name='customer_register'),
@@ -24,6 +27,20 @@ urlpatterns = [
     path('dashboard/', views.factory_dashboard, name='factory_dashboard'),
     path('dashboard/profile/', views.factory_profile_edit, name='factory_profile_edit'),
     path('dashboard/product/add/', views.product_add, name='product_add'),
+    path('dashboard/products/bulk/', views.product_bulk_edit, name='product_bulk_edit'),
+    path('dashboard/uploads/', views.upload_start, name='upload_start'),
+    path('dashboard/uploads/<uuid:upload_id>/', views.upload_detail, name='upload_detail'),
+    path('dashboard/uploads/<uuid:upload_id>/finalize/', views.upload_finalize, name='upload_finalize'),
+    path('dashboard/archive/', views.product_archive, name='product_archive'),
+    path('dashboard/archive/<str:article>/restore/', views.product_restore, name='product_restore'),
     path('dashboard/product/<str:article>/edit/', views.product_edit, name='product_edit'),
     path('dashboard/product/<str:article>/delete/', views.product_delete, name='product_delete'),
+    path('dashboard/product/<str:article>/price-history/', views.product_price_history, name='product_price_history'),
+    
+    # API
+    path('api/products/', views.product_list_api, name='product_list_api'),
+    path('api/products/<str:article>/similar-photos/', views.product_similar_photos, name='product_similar_photos'),
+    path('api/autocomplete/', views.autocomplete, name='autocomplete'),
+    path('api/catalog/snapshot/', views.catalog_snapshot, name='catalog_snapshot'),
+    path('api/factory/inventory/', views.inventory_feed, name='inventory_feed'),
 ]
\ No newline at end of file
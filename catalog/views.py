@@ -1,19 +1,56 @@
 # catalog/views.py
+import json
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Q
-from .models import Product, Category, Material, Factory, ProductImage, Favorite
+from .models import Product, ProductCard, Factory, ProductImage, Favorite, ArchivedProduct
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login
 from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlencode
 from django.contrib import messages
-from .forms import FactoryRegistrationForm, FactoryProfileForm, ProductForm, ProductImageForm, CustomerRegistrationForm
-from django.forms import modelformset_factory
+from django.core.exceptions import ValidationError
+from .lookups import get_categories, get_materials
+from .popularity import record_event
+from .ratelimit import check_rate_limit, limit_request_size, rate_limit
+from .routers import unpinned
+from .sharding import activate, across_shards, shard_for_article, shard_for_factory
+from .sizes import ring_size_choices
+from .streaming import stream_list
+from .uploads import validate_image_upload
+from .forms import (
+    FactoryRegistrationForm, FactoryProfileForm, ProductForm, ProductImageFormSet,
+    ProductBulkFormSet, CustomerRegistrationForm,
+)
+from django.core.paginator import Paginator
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_http_methods, require_POST
+from .archive import restore_articles
+from .autocomplete import KIND_FACTORY, KIND_PRODUCT, suggest
+from .cards import DIMENSION_PARAMS, filter_cards
+from .chunked_uploads import (
+    CHUNK_BYTES, ChunkedUploadError, attach_upload, discard_upload, get_upload, start_upload, verify_upload,
+    write_chunk,
+)
+from .currency import BASE_CURRENCY, convert, get_rates, get_request_currency
+from .feeds import FEEDS_ROOT, SITEMAP_INDEX
+from .favorites import favorites_count, favorites_page
+from .history import price_history
+from .image_hashes import find_duplicates, find_similar_cards
+from .inventory import apply_inventory_feed, get_token_factory, iter_csv, iter_jsonl
+from .snapshots import OFFLINE_HEADER, OFFLINE_STATIC, SERVICE_WORKER, SNAPSHOTS_URL, offline_page, read_manifest
 from django.contrib.auth import logout
 
+@offline_page
 def home(request):
     """Главная страница с каталогом товаров"""
-    from django.core.paginator import Paginator
-    
     # Получаем параметры фильтрации из URL
     category_slug = request.GET.get('category')
     material_id = request.GET.get('material')
@@ -22,71 +59,56 @@ def home(request):
     min_price = request.GET.get('min_price')
     max_price = request.GET.get('max_price')
     
-    # Базовый запрос - только активные товары
-    products = Product.objects.filter(is_active=True).select_related(
-        'factory', 'category', 'material'
-    ).prefetch_related('images')
-    
-    # Фильтр по категории
-    if category_slug:
-        products = products.filter(category__slug=category_slug)
-    
-    # Фильтр по материалу
-    if material_id:
-        products = products.filter(material_id=material_id)
-    
-    # Фильтр по цене
-    if min_price:
-        products = products.filter(price__gte=min_price)
-    if max_price:
-        products = products.filter(price__lte=max_price)
-    
-    # Поиск
+    # Поиск по подстроке - дорогой запрос, ограничиваем частоту
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(article__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        limited = check_rate_limit(request, 'search')
+        if limited is not None:
+            return limited
+    
+    currency_code, currency_symbol, _ = get_request_currency(request)
+    products, _ = filter_cards(request.GET, currency_code)
     
-    # Сортировка
-    if sort_by == 'price_asc':
-        products = products.order_by('price')
-    elif sort_by == 'price_desc':
-        products = products.order_by('-price')
-    elif sort_by == 'popular':
-        products = products.order_by('-views_count')
-    elif sort_by == 'name':
-        products = products.order_by('name')
-    else:  # -created_at (по умолчанию - новые)
-        products = products.order_by('-created_at')
-    
-    # Пагинация (по 12 товаров на странице)
-    paginator = Paginator(products, 12)
+    # Пагинация (по 12 товаров на странице); с шардами - слияние по всем шардам
+    paginator = Paginator(across_shards(products), 12)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
     # Данные для фильтров
-    categories = Category.objects.all()
-    materials = Material.objects.all()
+    categories = get_categories()
+    materials = get_materials()
+    
+    # Фильтры по размерам (сохраняются в ссылках пагинации)
+    dimensions = {name: request.GET.get(name, '') for name in DIMENSION_PARAMS}
+    dimension_query = urlencode({name: value for name, value in dimensions.items() if value})
     
     context = {
         'page_obj': page_obj,
         'categories': categories,
         'materials': materials,
+        'item_types': [choice for choice in Product.REFERENCE_TYPES if choice[0] != 'none'],
+        'ring_sizes': ring_size_choices(),
+        'dimensions': dimensions,
+        'dimension_query': f'&{dimension_query}' if dimension_query else '',
         'current_category': category_slug,
         'current_material': material_id,
         'search_query': search_query,
         'sort_by': sort_by,
         'min_price': min_price,
         'max_price': max_price,
+        'currencies': get_rates(),
+        'base_currency': BASE_CURRENCY,
+        'currency_code': currency_code,
+        'currency_symbol': currency_symbol,
     }
     
     return render(request, 'catalog/home.html', context)
 
 
+@offline_page
 def product_detail(request, article):
     """Страница товара"""
+    # Товар, похожие, просмотры - в шарде завода
+    activate(shard_for_article(article))
     product = get_object_or_404(
         Product.objects.select_related('factory', 'category', 'material')
                       .prefetch_related('images'),
@@ -94,36 +116,64 @@ def product_detail(request, article):
         is_active=True
     )
     
-    # Увеличиваем счетчик просмотров
-    product.views_count += 1
-    product.save(update_fields=['views_count'])
+    # Увеличиваем счетчик просмотров (не закрепляет основную БД за пользователем)
+    with unpinned():
+        product.views_count += 1
+        product.save(update_fields=['views_count'])
+        record_event(product.id, views=1)
     
-    # Похожие товары (из той же категории)
-    similar_products = Product.objects.filter(
-        category=product.category,
+    # Похожие товары - предрассчитанные соседи (rebuild_similar_products)
+    similar_products = list(Product.objects.filter(
+        similar_for__product=product,
         is_active=True
-    ).exclude(id=product.id)[:4]
+    ).for_listing().order_by('similar_for__rank')[:4])
+
+    # Новый товар ещё не попал в пересчёт - берём из той же категории
+    if not similar_products:
+        similar_products = Product.objects.filter(
+            category=product.category,
+            is_active=True
+        ).exclude(id=product.id).for_listing()[:4]
+    
+    currency_code, currency_symbol, rate = get_request_currency(request)
     
     context = {
         'product': product,
         'similar_products': similar_products,
+        'display_price': convert(product.price, rate) if rate else product.price,
+        'currency_symbol': currency_symbol,
     }
     
     return render(request, 'catalog/product_detail.html', context)
 
 
+@offline_page
 def factory_detail(request, factory_id):
-    """Страница завода со всеми его товарами"""
+    """
+    Страница завода с его товарами: по 48 на страницу, ?all=1 - все товары
+    потоком (шапка уходит сразу, карточки - пачками из .iterator())
+    """
     factory = get_object_or_404(Factory, id=factory_id)
+    activate(shard_for_factory(factory))
     
-    products = Product.objects.filter(
-        factory=factory,
-        is_active=True
-    ).select_related('category', 'material').prefetch_related('images')
+    products = ProductCard.objects.filter(factory=factory)
+    
+    if request.GET.get('all'):
+        context = {
+            'factory': factory,
+            'products_count': products.count(),
+        }
+        return stream_list(
+            request, 'catalog/factory_detail.html', context,
+            products, 'catalog/factory_products.html',
+        )
+    
+    page_obj = Paginator(products, 48).get_page(request.GET.get('page'))
     
     context = {
         'factory': factory,
-        'products': products,
+        'page_obj': page_obj,
+        'products_count': page_obj.paginator.count,
     }
     
     return render(request, 'catalog/factory_detail.html', context)
@@ -146,42 +196,41 @@ def factory_register(request):
 @login_required
 def factory_dashboard(request):
     """Главная страница личного кабинета завода"""
-    try:
-        factory = request.user.factory
-    except Factory.DoesNotExist:
+    factory = request.role.factory
+    if factory is None:
         messages.error(request, 'У вас нет профиля завода')
         return redirect('catalog:home')
     
-    products = Product.objects.filter(factory=factory).select_related(
-        'category', 'material'
-    ).prefetch_related('images')
+    products = Product.objects.filter(factory=factory).for_listing().select_related('category')
     
-    # Статистика
-    total_products = products.count()
-    active_products = products.filter(is_active=True).count()
-    total_views = sum(p.views_count for p in products)
-    in_stock = products.filter(stock_quantity__gt=0).count()
+    # Статистика - одним агрегатом, без загрузки товаров
+    stats = products.aggregate(
+        total_products=Count('id'),
+        active_products=Count('id', filter=Q(is_active=True)),
+        total_views=Coalesce(Sum('views_count'), 0),
+        in_stock=Count('id', filter=Q(stock_quantity__gt=0)),
+    )
     
     context = {
         'factory': factory,
-        'products': products,
-        'stats': {
-            'total_products': total_products,
-            'active_products': active_products,
-            'total_views': total_views,
-            'in_stock': in_stock,
-        }
+        'stats': stats,
+        'archived_count': ArchivedProduct.objects.filter(factory=factory).count(),
     }
     
-    return render(request, 'catalog/factory_dashboard.html', context)
+    # Таблица товаров отдаётся потоком: у крупных заводов тысячи строк
+    return stream_list(
+        request, 'catalog/factory_dashboard.html', context,
+        products, 'catalog/factory_dashboard_rows.html',
+    )
 
 
 @login_required
+@rate_limit('product_write', methods=('POST',))
+@limit_request_size
 def factory_profile_edit(request):
     """Редактирование профиля завода"""
-    try:
-        factory = request.user.factory
-    except Factory.DoesNotExist:
+    factory = request.role.factory
+    if factory is None:
         messages.error(request, 'У вас нет профиля завода')
         return redirect('catalog:home')
     
@@ -197,29 +246,70 @@ def factory_profile_edit(request):
     return render(request, 'catalog/factory_profile_edit.html', {'form': form, 'factory': factory})
 
 
+def _warn_duplicate_photo(request, image, factory):
+    """Предупреждение, если такое фото уже есть у другого товара (catalog.image_hashes)"""
+    duplicates = find_duplicates(image.phash, exclude_product=image.product_id, limit=3)
+    if not duplicates:
+        return
+    described = ', '.join(
+        f'{product.article} «{product.name}»' + (
+            ' (ваш товар)' if product.factory_id == factory.pk else f' (завод {product.factory.name})'
+        )
+        for product, _ in duplicates
+    )
+    messages.warning(request, f'Похожее фото уже загружено: {described}')
+
+
 @login_required
+@rate_limit('product_write', methods=('POST',))
+@limit_request_size
 def product_add(request):
     """Добавление нового товара"""
-    try:
-        factory = request.user.factory
-    except Factory.DoesNotExist:
+    factory = request.role.factory
+    if factory is None:
         messages.error(request, 'У вас нет профиля завода')
         return redirect('catalog:home')
     
     if request.method == 'POST':
         form = ProductForm(request.POST)
         
+        # Фото из canvas проверяется по размеру и заголовку до сохранения товара;
+        # загруженное частями (upload_id) - ещё и по контрольной сумме
+        canvas_image = request.FILES.get('canvas_image')
+        upload = None
+        if form.is_valid() and request.POST.get('upload_id'):
+            try:
+                upload = get_upload(factory, request.POST['upload_id'])
+                verify_upload(upload)
+            except ChunkedUploadError as exc:
+                form.add_error(None, str(exc))
+            except ValidationError as exc:
+                form.add_error(None, exc)
+        elif form.is_valid() and canvas_image:
+            try:
+                validate_image_upload(canvas_image)
+            except ValidationError as exc:
+                form.add_error(None, exc)
+        
         if form.is_valid():
             product = form.save(commit=False)
             product.factory = factory
             product.save()
             
+            image = None
+            photo_error = None
+            if upload is not None:
+                try:
+                    # Файл проверен до сохранения товара - второй раз не хэшируем
+                    image = attach_upload(upload, product, is_main=True, verified=True)
+                except ChunkedUploadError as exc:
+                    photo_error = str(exc)
+                except ValidationError as exc:
+                    photo_error = ' '.join(exc.messages)
             # Обрабатываем изображение из canvas (если есть)
-            canvas_image = request.FILES.get('canvas_image')
-            
-            if canvas_image:
+            elif canvas_image:
                 try:
-                    ProductImage.objects.create(
+                    image = ProductImage.objects.create(
                         product=product,
                         image=canvas_image,
                         is_main=True,
@@ -229,15 +319,23 @@ def product_add(request):
                 except Exception as e:
                     print(f"❌ Ошибка при сохранении изображения: {e}")
             
-            messages.success(request, f'Товар "{product.name}" успешно добавлен!')
+            if photo_error:
+                # Товар сохранён, фото - нет: сообщаем, а не показываем успех
+                message = f'Товар "{product.name}" добавлен, но фото не сохранено: {photo_error}'
+                messages.error(request, message)
+            else:
+                message = f'Товар "{product.name}" успешно добавлен!'
+                messages.success(request, message)
+            if image is not None:
+                _warn_duplicate_photo(request, image, factory)
             
             # 🔧 ФИКС: Проверяем тип запроса
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 # Для AJAX запросов возвращаем JSON
-                from django.http import JsonResponse
                 return JsonResponse({
                     'success': True,
-                    'message': f'Товар "{product.name}" успешно добавлен!',
+                    'message': message,
+                    'photo_error': photo_error,
                     'redirect_url': '/dashboard/'
                 })
             else:
@@ -246,7 +344,6 @@ def product_add(request):
         else:
             # 🔧 ФИКС: Для AJAX возвращаем ошибки
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                from django.http import JsonResponse
                 return JsonResponse({
                     'success': False,
                     'errors': form.errors
@@ -263,39 +360,30 @@ def product_add(request):
 
 
 @login_required
+@rate_limit('product_write', methods=('POST',))
+@limit_request_size
 def product_edit(request, article):
     """Редактирование товара"""
-    try:
-        factory = request.user.factory
-    except Factory.DoesNotExist:
+    factory = request.role.factory
+    if factory is None:
         messages.error(request, 'У вас нет профиля завода')
         return redirect('catalog:home')
     
     product = get_object_or_404(Product, article=article, factory=factory)
-    ImageFormSet = modelformset_factory(ProductImage, form=ProductImageForm, extra=2, can_delete=True)
     
     if request.method == 'POST':
         form = ProductForm(request.POST, instance=product)
-        formset = ImageFormSet(request.POST, request.FILES, queryset=product.images.all())
+        formset = ProductImageFormSet(request.POST, request.FILES, queryset=product.images.all())
         
         if form.is_valid() and formset.is_valid():
-            form.save()
-            
-            # Сохраняем изображения
-            for image_form in formset:
-                if image_form.cleaned_data.get('DELETE'):
-                    if image_form.instance.pk:
-                        image_form.instance.delete()
-                elif image_form.cleaned_data.get('image'):
-                    image = image_form.save(commit=False)
-                    image.product = product
-                    image.save()
+            # Товар и фото сохраняются одной транзакцией, фото - пакетно
+            formset.save_batched(product, product_form=form)
             
             messages.success(request, f'Товар "{product.name}" успешно обновлён!')
             return redirect('catalog:factory_dashboard')
     else:
         form = ProductForm(instance=product)
-        formset = ImageFormSet(queryset=product.images.all())
+        formset = ProductImageFormSet(queryset=product.images.all())
     
     return render(request, 'catalog/product_edit.html', {
         'form': form,
@@ -305,12 +393,216 @@ def product_edit(request, article):
     })
 
 
+def _upload_error(exc, upload=None):
+    data = {'error': str(exc)}
+    if upload is not None and exc.status == 409:
+        # Позиция, с которой клиенту продолжать
+        data['offset'] = upload.received
+    return JsonResponse(data, status=exc.status)
+
+
+@login_required
+@require_POST
+@rate_limit('product_write')
+def upload_start(request):
+    """Начало загрузки фото частями (catalog.chunked_uploads): filename, size, checksum"""
+    factory = request.role.factory
+    if factory is None:
+        return JsonResponse({'error': 'У вас нет профиля завода'}, status=403)
+    
+    try:
+        upload = start_upload(
+            factory, request.POST.get('filename'), request.POST.get('size'), request.POST.get('checksum')
+        )
+    except ChunkedUploadError as exc:
+        return _upload_error(exc)
+    return JsonResponse({
+        'id': str(upload.pk),
+        'url': reverse('catalog:upload_detail', args=[upload.pk]),
+        'chunk_size': CHUNK_BYTES,
+        'offset': 0,
+    }, status=201)
+
+
+@login_required
+@require_http_methods(['GET', 'PUT', 'DELETE'])
+@rate_limit('upload_chunk')
+def upload_detail(request, upload_id):
+    """
+    GET - сколько байт получено, DELETE - отмена загрузки.
+    PUT - очередная часть: тело читается потоком прямо в файл,
+    заголовки Upload-Offset и Upload-Checksum (SHA-256 части).
+    """
+    factory = request.role.factory
+    if factory is None:
+        return JsonResponse({'error': 'У вас нет профиля завода'}, status=403)
+    
+    upload = None
+    try:
+        upload = get_upload(factory, upload_id)
+        if request.method == 'PUT':
+            write_chunk(
+                upload, request.headers.get('Upload-Offset'), request,
+                request.META.get('CONTENT_LENGTH'), request.headers.get('Upload-Checksum'),
+            )
+        elif request.method == 'DELETE':
+            discard_upload(upload)
+            return JsonResponse({'deleted': True})
+    except ChunkedUploadError as exc:
+        return _upload_error(exc, upload)
+    return JsonResponse({'offset': upload.received, 'size': upload.size})
+
+
+@login_required
+@require_POST
+@rate_limit('product_write')
+def upload_finalize(request, upload_id):
+    """Завершение загрузки частями: проверка файла и фото товара article"""
+    factory = request.role.factory
+    if factory is None:
+        return JsonResponse({'error': 'У вас нет профиля завода'}, status=403)
+    
+    product = Product.objects.filter(article=request.POST.get('article', ''), factory=factory).first()
+    if product is None:
+        return JsonResponse({'error': 'Товар не найден'}, status=404)
+    try:
+        order = int(request.POST.get('order') or 0)
+    except ValueError:
+        order = 0
+    
+    upload = None
+    try:
+        upload = get_upload(factory, upload_id)
+        image = attach_upload(
+            upload, product, order=order,
+            is_main=request.POST.get('is_main') in ('1', 'true', 'on'),
+            is_reference=request.POST.get('is_reference') in ('1', 'true', 'on'),
+        )
+    except ChunkedUploadError as exc:
+        return _upload_error(exc, upload)
+    except ValidationError as exc:
+        return JsonResponse({'error': ' '.join(exc.messages)}, status=400)
+    return JsonResponse({'id': image.pk, 'url': image.image.url}, status=201)
+
+
+@login_required
+@rate_limit('product_write', methods=('POST',))
+@limit_request_size
+def product_bulk_edit(request):
+    """Массовое изменение цены, остатка и статуса товаров"""
+    factory = request.role.factory
+    if factory is None:
+        messages.error(request, 'У вас нет профиля завода')
+        return redirect('catalog:home')
+    
+    products = Product.objects.filter(factory=factory).only(
+        'id', 'article', 'name', 'price', 'stock_quantity', 'is_active', 'updated_at'
+    ).order_by('article')
+    # 200 строк × 4 поля укладываются в DATA_UPLOAD_MAX_NUMBER_FIELDS по умолчанию
+    paginator = Paginator(products, 200)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    queryset = page_obj.object_list
+    
+    if request.method == 'POST':
+        formset = ProductBulkFormSet(request.POST, queryset=queryset)
+        if formset.is_valid():
+            changed = formset.save_batched()
+            messages.success(request, f'Обновлено товаров: {len(changed)}')
+            return redirect(f"{request.path}?page={page_obj.number}")
+        messages.error(request, 'Пожалуйста, исправьте ошибки в форме.')
+    else:
+        formset = ProductBulkFormSet(queryset=queryset)
+    
+    return render(request, 'catalog/product_bulk_edit.html', {
+        'formset': formset,
+        'page_obj': page_obj,
+        'factory': factory,
+    })
+
+
+@login_required
+def product_archive(request):
+    """Архивные товары завода (catalog.archive), по 50 на страницу"""
+    factory = request.role.factory
+    if factory is None:
+        messages.error(request, 'У вас нет профиля завода')
+        return redirect('catalog:home')
+    
+    archived = ArchivedProduct.objects.filter(factory=factory).only('article', 'name', 'archived_at')
+    page_obj = Paginator(archived, 50).get_page(request.GET.get('page'))
+    
+    return render(request, 'catalog/product_archive.html', {
+        'page_obj': page_obj,
+        'factory': factory,
+    })
+
+
+@login_required
+@require_POST
+@rate_limit('product_write')
+def product_restore(request, article):
+    """Возвращает товар из архива в продажу с прежним артикулом и фото"""
+    factory = request.role.factory
+    if factory is None:
+        messages.error(request, 'У вас нет профиля завода')
+        return redirect('catalog:home')
+    
+    if not restore_articles(factory, [article], activate=True):
+        raise Http404('Товар не найден в архиве')
+    messages.success(request, f'Товар {article} возвращён в продажу')
+    return redirect('catalog:product_edit', article=article)
+
+
+def product_similar_photos(request, article):
+    """Активные товары с визуально похожим главным фото (JSON), ближайшие первыми"""
+    activate(shard_for_article(article))
+    product = Product.objects.filter(article=article, is_active=True).only('id', 'main_image').first()
+    if product is None:
+        raise Http404('Товар не найден')
+    
+    phash = None
+    if product.main_image_id:
+        phash = ProductImage.objects.filter(pk=product.main_image_id).values_list('phash', flat=True).first()
+    cards = find_similar_cards(phash, exclude_product=product.pk)
+    return JsonResponse({'products': [
+        {
+            'article': card.article,
+            'name': card.name,
+            'price': str(card.price),
+            'image': card.main_image_url,
+            'url': reverse('catalog:product_detail', args=[card.article]),
+        }
+        for card in cards
+    ]})
+
+
+@login_required
+def product_price_history(request, article):
+    """История цены товара завода (JSON), последние ?limit= изменений"""
+    factory = request.role.factory
+    if factory is None:
+        return JsonResponse({'error': 'У вас нет профиля завода'}, status=403)
+    
+    if not Product.objects.filter(article=article, factory=factory).exists():
+        raise Http404('Товар не найден')
+    try:
+        limit = min(int(request.GET.get('limit', 100)), 1000)
+    except ValueError:
+        limit = 100
+    
+    history = [
+        {'changed_at': changed_at.isoformat(), 'old': old, 'new': new}
+        for changed_at, old, new in price_history(article, limit=limit)
+    ]
+    return JsonResponse({'article': article, 'history': history})
+
+
 @login_required
+@rate_limit('product_write', methods=('POST',))
 def product_delete(request, article):
     """Удаление товара"""
-    try:
-        factory = request.user.factory
-    except Factory.DoesNotExist:
+    factory = request.role.factory
+    if factory is None:
         messages.error(request, 'У вас нет профиля завода')
         return redirect('catalog:home')
     
@@ -343,8 +635,10 @@ def customer_register(request):
 
 
 @login_required
+@rate_limit('favorite')
 def toggle_favorite(request, article):
     """Добавить/удалить товар из избранного (AJAX)"""
+    activate(shard_for_article(article))
     product = get_object_or_404(Product, article=article, is_active=True)
     
     favorite, created = Favorite.objects.get_or_create(
@@ -358,13 +652,12 @@ def toggle_favorite(request, article):
         is_favorite = False
         message = 'Удалено из избранного'
     else:
+        record_event(product.id, favorites=1)
         is_favorite = True
         message = 'Добавлено в избранное'
     
     # Для AJAX запросов
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        import json
-        from django.http import JsonResponse
         return JsonResponse({
             'is_favorite': is_favorite,
             'message': message
@@ -377,13 +670,15 @@ def toggle_favorite(request, article):
 
 @login_required
 def favorites_list(request):
-    """Список избранных товаров"""
-    favorites = Favorite.objects.filter(user=request.user).select_related(
-        'product__factory', 'product__category', 'product__material'
-    ).prefetch_related('product__images').order_by('-added_at')
+    """Список избранных товаров: по 24, листается по ключу ?after=<курсор>"""
+    cursor = request.GET.get('after')
+    favorites, next_cursor = favorites_page(request.user, cursor)
     
     context = {
         'favorites': favorites,
+        'favorites_total': favorites_count(request.user.pk),
+        'next_cursor': next_cursor,
+        'is_first_page': not cursor,
     }
     
     return render(request, 'catalog/favorites_list.html', context)
@@ -392,4 +687,155 @@ def logout_view(request):
     """Выход из системы"""
     logout(request)
     messages.success(request, 'Вы успешно вышли из системы')
-    return redirect('catalog:home')
\ No newline at end of file
+    return redirect('catalog:home')
+
+
+@csrf_exempt
+@require_POST
+@rate_limit('inventory_feed')
+def inventory_feed(request):
+    """
+    Загрузка остатков и цен из ERP завода (авторизация: «Authorization: Token <ключ>»).
+    Тело - JSONL (application/x-ndjson) или CSV (text/csv) со строками
+    article, price, stock_quantity, is_active. Читается потоком.
+    """
+    factory = get_token_factory(request)
+    if factory is None:
+        return JsonResponse({'error': 'Неверный или отсутствующий API-ключ'}, status=401)
+    activate(shard_for_factory(factory))
+
+    feed_format = request.GET.get('format') or (
+        'csv' if request.content_type in ('text/csv', 'application/csv') else 'jsonl'
+    )
+    if feed_format == 'csv':
+        records = iter_csv(request)
+    elif feed_format == 'jsonl':
+        records = iter_jsonl(request)
+    else:
+        return JsonResponse({'error': 'Поддерживаются форматы jsonl и csv'}, status=400)
+
+    result = apply_inventory_feed(factory, records)
+    return JsonResponse(result.as_dict())
+
+
+def product_list_api(request):
+    """
+    Каталог в JSON: те же фильтры, что на главной, плюс ?currency=.
+    Читается из карточек ProductCard, по 48 товаров на страницу.
+    """
+    if request.GET.get('search'):
+        limited = check_rate_limit(request, 'search')
+        if limited is not None:
+            return limited
+    
+    currency_code, currency_symbol, _ = get_request_currency(request)
+    cards, _ = filter_cards(request.GET, currency_code)
+    page_obj = Paginator(across_shards(cards), 48).get_page(request.GET.get('page'))
+    
+    products = [
+        {
+            'article': card.article,
+            'name': card.name,
+            'url': reverse('catalog:product_detail', args=[card.article]),
+            'price': str(card.display_price) if card.display_price is not None else None,
+            'image': card.main_image_url,
+            'factory': card.factory_name,
+            'category': card.category_slug,
+            'material': card.material_label,
+            'weight': str(card.weight),
+            'in_stock': card.in_stock,
+            'type': card.reference_photo_type,
+            'width_mm': str(card.width_mm) if card.width_mm is not None else None,
+            'height_mm': str(card.height_mm) if card.height_mm is not None else None,
+            'diameter_mm': str(card.diameter_mm) if card.diameter_mm is not None else None,
+            'ring_size': str(card.ring_size) if card.ring_size is not None else None,
+        }
+        for card in page_obj
+    ]
+    return JsonResponse({
+        'count': page_obj.paginator.count,
+        'page': page_obj.number,
+        'num_pages': page_obj.paginator.num_pages,
+        'currency': currency_code,
+        'products': products,
+    })
+
+
+def autocomplete(request):
+    """
+    Подсказки для строки поиска (?q=): категории, заводы, товары.
+    Отвечает из индекса в памяти воркера (catalog.autocomplete), без БД.
+    """
+    query = request.GET.get('q', '')
+    home_url = reverse('catalog:home')
+    
+    results = []
+    for kind, label, value in suggest(query):
+        if kind == KIND_PRODUCT:
+            url = reverse('catalog:product_detail', args=[value])
+        elif kind == KIND_FACTORY:
+            url = reverse('catalog:factory_detail', args=[value])
+        else:
+            url = f'{home_url}?{urlencode({"category": value})}'
+        results.append({'type': kind, 'label': label, 'value': value, 'url': url})
+    
+    response = JsonResponse({'query': query, 'results': results})
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
+def sitemap_index(request):
+    """Готовый индекс sitemap (собирается командой build_feeds)"""
+    path = FEEDS_ROOT / SITEMAP_INDEX
+    if not path.exists():
+        raise Http404('Sitemap ещё не собран')
+    return FileResponse(path.open('rb'), content_type='application/xml')
+
+
+def _snapshot_version(request):
+    manifest = read_manifest()
+    return manifest and manifest['version']
+
+
+@condition(etag_func=_snapshot_version)
+def catalog_snapshot(request):
+    """
+    Манифест офлайн-снимка каталога (catalog.snapshots). ETag - версия
+    снимка: service worker проверяет её запросом с If-None-Match (304)
+    """
+    manifest = read_manifest()
+    if manifest is None:
+        raise Http404('Снимок каталога ещё не собран')
+    response = JsonResponse({name: manifest[name] for name in ('version', 'url', 'count', 'generated_at')})
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def service_worker(request):
+    """
+    Service worker офлайн-каталога. Отдаётся с корня сайта, чтобы
+    управлять всеми страницами; выключенный - удаляет себя и свои кэши
+    """
+    offline_url = reverse('catalog:offline')
+    config = {
+        'enabled': SERVICE_WORKER,
+        'precache': [static(name) for name in OFFLINE_STATIC] + [offline_url],
+        'offlineUrl': offline_url,
+        'manifestUrl': reverse('catalog:catalog_snapshot'),
+        'staticUrl': settings.STATIC_URL,
+        'mediaUrl': settings.MEDIA_URL,
+        'snapshotsUrl': SNAPSHOTS_URL,
+        'resetUrls': [reverse(name) for name in ('catalog:login', 'catalog:logout')],
+        'header': OFFLINE_HEADER,
+    }
+    response = HttpResponse(
+        render_to_string('catalog/sw.js', {'config': json.dumps(config)}),
+        content_type='application/javascript; charset=utf-8',
+    )
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def offline(request):
+    """Страница без сети: service worker отдаёт её вместо недоступной, содержимое строит js/offline.js из снимка"""
+    return render(request, 'catalog/offline.html', {'manifest_url': reverse('catalog:catalog_snapshot')})
@@ -0,0 +1,108 @@
+# catalog/warmup.py
+"""
+Прогрев процесса перед первым запросом.
+
+Django строит шаблоны, URL-резолвер и кэши лениво - на первом запросе
+каждого воркера. warm_up() делает это заранее: компилирует шаблоны каталога
+(кэширующий загрузчик держит их в памяти процесса), заполняет резолвер,
+кладёт в кэш справочники и курсы валют и строит индекс подсказок поиска.
+Вызывается из auroom/wsgi.py при старте воркера (settings.CATALOG_WARMUP)
+и командой warmup.
+"""
+import logging
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver, reverse
+
+from .autocomplete import get_index
+from .currency import get_rates
+from .lookups import get_categories, get_materials
+
+logger = logging.getLogger('catalog.startup')
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / 'templates'
+
+# URL без аргументов: reverse заполняет резолвер и пространства имён
+WARM_URLS = [
+    'catalog:home', 'catalog:sitemap_index', 'catalog:product_list_api', 'catalog:autocomplete', 'admin:index',
+]
+
+# Замеры последнего старта процесса (заполняет startup())
+STARTUP = {}
+
+
+def warm_templates():
+    names = sorted(
+        path.relative_to(TEMPLATES_DIR).as_posix() for path in TEMPLATES_DIR.rglob('*.html')
+    )
+    for name in names:
+        get_template(name)
+    return len(names)
+
+
+def warm_urls():
+    # Обращение к reverse_dict заполняет резолвер
+    get_resolver().reverse_dict
+    for name in WARM_URLS:
+        reverse(name)
+    return len(WARM_URLS)
+
+
+def warm_lookups():
+    return len(get_categories()) + len(get_materials()) + len(get_rates())
+
+
+def warm_autocomplete():
+    return len(get_index())
+
+
+WARMUP_STEPS = [
+    ('templates', warm_templates),
+    ('urls', warm_urls),
+    ('lookups', warm_lookups),
+    ('autocomplete', warm_autocomplete),
+]
+
+
+def warm_up():
+    """
+    Выполняет шаги прогрева, возвращает {шаг: секунды}.
+    Ошибка шага (недоступна БД, кэш) не мешает старту - только пишется в лог.
+    Соединения с БД после прогрева закрываются: при --preload процесс
+    форкается, и воркеры не должны делить одно соединение.
+    """
+    timings = {}
+    try:
+        for name, step in WARMUP_STEPS:
+            started = time.perf_counter()
+            try:
+                step()
+            except Exception:
+                logger.warning('Прогрев: шаг %s пропущен', name, exc_info=True)
+            timings[name] = round(time.perf_counter() - started, 4)
+    finally:
+        connections.close_all()
+    return timings
+
+
+def startup(import_started):
+    """
+    Вызывается в конце auroom/wsgi.py: замеряет импорт приложения и прогрев,
+    пишет их в лог catalog.startup и в STARTUP.
+    """
+    import_seconds = time.perf_counter() - import_started
+    warmup = warm_up() if getattr(settings, 'CATALOG_WARMUP', True) else {}
+    STARTUP.update({
+        'import': round(import_seconds, 4),
+        'warmup': warmup,
+        'total': round(time.perf_counter() - import_started, 4),
+    })
+    logger.info(
+        'Старт воркера: импорт %.3f с, прогрев %.3f с %s',
+        STARTUP['import'], STARTUP['total'] - STARTUP['import'], warmup,
+    )
+    return STARTUP
@@ -0,0 +1,122 @@
+// Загрузка фото частями с докачкой (серверная часть - catalog/chunked_uploads.py)
+//
+// ChunkedUpload.upload(file) объявляет загрузку, отправляет части PUT-запросами
+// и при обрыве продолжает с позиции, которую вернул сервер. Возвращает id загрузки:
+// его передают в форму товара (upload_id) или в ChunkedUpload.finalize().
+
+const ChunkedUpload = (function() {
+    const START_URL = '/dashboard/uploads/';
+    const MAX_RETRIES = 5;
+
+    function csrfToken() {
+        const input = document.querySelector('[name=csrfmiddlewaretoken]');
+        return input ? input.value : '';
+    }
+
+    function isSupported() {
+        return !!(window.crypto && window.crypto.subtle && window.fetch);
+    }
+
+    async function sha256(blob) {
+        const digest = await window.crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+        return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    function sleep(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+
+    async function request(url, options) {
+        options.headers = Object.assign({
+            'X-CSRFToken': csrfToken(),
+            'X-Requested-With': 'XMLHttpRequest'
+        }, options.headers || {});
+        const response = await fetch(url, options);
+        const data = await response.json().catch(() => ({}));
+        return { status: response.status, data: data };
+    }
+
+    async function start(file, filename) {
+        const body = new FormData();
+        body.append('filename', filename || file.name || 'photo.png');
+        body.append('size', file.size);
+        body.append('checksum', await sha256(file));
+        const result = await request(START_URL, { method: 'POST', body: body });
+        if (result.status !== 201) {
+            throw new Error(result.data.error || 'Не удалось начать загрузку');
+        }
+        return result.data;
+    }
+
+    async function currentOffset(url) {
+        const result = await request(url, { method: 'GET' });
+        if (result.status !== 200) {
+            throw new Error(result.data.error || 'Загрузка не найдена');
+        }
+        return result.data.offset;
+    }
+
+    async function upload(file, filename, onProgress) {
+        const session = await start(file, filename);
+        let offset = 0;
+        let retries = 0;
+
+        while (offset < file.size) {
+            const chunk = file.slice(offset, offset + session.chunk_size);
+            let result;
+            try {
+                result = await request(session.url, {
+                    method: 'PUT',
+                    body: chunk,
+                    headers: {
+                        'Content-Type': 'application/octet-stream',
+                        'Upload-Offset': String(offset),
+                        'Upload-Checksum': await sha256(chunk)
+                    }
+                });
+            } catch (error) {
+                // Обрыв соединения: ждём и спрашиваем, что дошло
+                result = null;
+            }
+
+            if (result && result.status === 200) {
+                offset = result.data.offset;
+                retries = 0;
+                if (onProgress) onProgress(offset, file.size);
+                continue;
+            }
+            if (result && result.status === 409 && typeof result.data.offset === 'number') {
+                offset = result.data.offset;
+                continue;
+            }
+            if (result && result.status !== 429 && result.status < 500) {
+                throw new Error(result.data.error || 'Ошибка загрузки');
+            }
+            if (++retries > MAX_RETRIES) {
+                throw new Error('Не удалось загрузить файл, проверьте соединение');
+            }
+            console.log(`⏳ Повтор загрузки части (${retries}/${MAX_RETRIES})`);
+            await sleep(1000 * Math.pow(2, retries));
+            try {
+                offset = await currentOffset(session.url);
+            } catch (error) {
+                // Соединения всё ещё нет - повторим с той же позиции
+            }
+        }
+        return session.id;
+    }
+
+    async function finalize(uploadId, fields) {
+        const body = new FormData();
+        Object.keys(fields).forEach(name => body.append(name, fields[name]));
+        const result = await request(`${START_URL}${uploadId}/finalize/`, { method: 'POST', body: body });
+        if (result.status !== 201) {
+            throw new Error(result.data.error || 'Не удалось сохранить фото');
+        }
+        return result.data;
+    }
+
+    return { isSupported: isSupported, upload: upload, finalize: finalize };
+})();
+
+window.ChunkedUpload = ChunkedUpload;
@@ -1144,7 +1144,6 @@ document.addEventListener('DOMContentLoaded', function() {
             
             const blob = window.jewelryEditor.dataURLtoBlob(imageDataURL);
             const formData = new FormData(productForm);
-            formData.append('canvas_image', blob, 'product_fitted.png');
             
             // Показываем загрузку
             const submitBtn = productForm.querySelector('button[type="submit"]');
@@ -1152,15 +1151,29 @@ document.addEventListener('DOMContentLoaded', function() {
             submitBtn.disabled = true;
             submitBtn.textContent = '⏳ Сохранение...';
             
-            console.log('📤 Отправляем форму через AJAX...');
+            // Фото уходит частями с докачкой (chunked-upload.js), форма - только с его id
+            let photoReady;
+            if (window.ChunkedUpload && ChunkedUpload.isSupported()) {
+                photoReady = ChunkedUpload.upload(blob, 'product_fitted.png', (sent, total) => {
+                    submitBtn.textContent = `⏳ Загрузка фото ${Math.round(sent * 100 / total)}%`;
+                }).then(uploadId => formData.append('upload_id', uploadId));
+            } else {
+                formData.append('canvas_image', blob, 'product_fitted.png');
+                photoReady = Promise.resolve();
+            }
             
-            fetch(productForm.action || window.location.href, {
-                method: 'POST',
-                body: formData,
-                headers: {
-                    'X-Requested-With': 'XMLHttpRequest',
-                    'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
-                }
+            photoReady
+            .then(() => {
+                console.log('📤 Отправляем форму через AJAX...');
+                submitBtn.textContent = '⏳ Сохранение...';
+                return fetch(productForm.action || window.location.href, {
+                    method: 'POST',
+                    body: formData,
+                    headers: {
+                        'X-Requested-With': 'XMLHttpRequest',
+                        'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+                    }
+                });
             })
             .then(response => {
                 console.log('📥 Response:', response.status);
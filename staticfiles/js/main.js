@@ -132,4 +132,13 @@ function filterTable(inputId, tableId) {
     }
 }
 
-console.log('Ювелирный Каталог загружен! 💎');
\ No newline at end of file
+console.log('Ювелирный Каталог загружен! 💎');
+// Офлайн-каталог (catalog/snapshots.py): service worker регистрируется, если включён
+// настройкой CATALOG_SERVICE_WORKER; выключенный сам удаляет свою регистрацию
+if ('serviceWorker' in navigator && document.body.dataset.serviceWorker) {
+    window.addEventListener('load', function() {
+        navigator.serviceWorker.register(document.body.dataset.serviceWorker).catch(error => {
+            console.log('⚠️ Service worker не зарегистрирован', error);
+        });
+    });
+}
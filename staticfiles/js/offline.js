@@ -0,0 +1,182 @@
+// Страница без сети (catalog/offline.html): каталог из JSON-снимка в кэше service worker
+//
+// Service worker отдаёт эту страницу вместо недоступной, поэтому адрес в браузере -
+// исходный: по нему выбирается, что показать (главная с фильтрами, товар, завод).
+// Снимок - таблица: snapshot.fields - имена полей, snapshot.products - строки массивами.
+
+(function() {
+    const PAGE_SIZE = 48;
+
+    function element(tag, className, text) {
+        const node = document.createElement(tag);
+        if (className) node.className = className;
+        // Только textContent: названия товаров - пользовательские данные
+        if (text !== undefined) node.textContent = text;
+        return node;
+    }
+
+    async function loadSnapshot(manifestUrl) {
+        const manifestResponse = await caches.match(manifestUrl);
+        if (!manifestResponse) return null;
+        const manifest = await manifestResponse.json();
+        const snapshotResponse = await caches.match(manifest.url);
+        if (!snapshotResponse) return null;
+        const snapshot = await snapshotResponse.json();
+        snapshot.products = snapshot.products.map(row => {
+            const product = {};
+            snapshot.fields.forEach((field, i) => { product[field] = row[i]; });
+            return product;
+        });
+        return snapshot;
+    }
+
+    function productUrl(product) {
+        return `/product/${encodeURIComponent(product.article)}/`;
+    }
+
+    function renderCard(snapshot, product) {
+        const card = element('a', 'product-card');
+        card.href = productUrl(product);
+        if (product.image) {
+            const image = element('img', 'product-image');
+            image.src = product.image;
+            image.alt = product.name;
+            card.appendChild(image);
+        } else {
+            card.appendChild(element('div', 'product-image'));
+        }
+
+        const info = element('div', 'product-info');
+        info.appendChild(element('div', 'product-category', snapshot.categories[product.category] || ''));
+        info.appendChild(element('h3', 'product-name', product.name));
+        info.appendChild(element('div', 'product-article', `Арт: ${product.article}`));
+        info.appendChild(element('div', 'product-material',
+            `${snapshot.materials[product.material] || ''} • ${product.weight} г`));
+        info.appendChild(product.in_stock
+            ? element('span', 'stock-badge in-stock', '✓ В наличии')
+            : element('span', 'stock-badge out-stock', 'Нет в наличии'));
+
+        const footer = element('div', 'product-footer');
+        footer.appendChild(element('div', 'product-price', `${product.price} ${snapshot.currency_symbol}`));
+        footer.appendChild(element('div', 'product-factory', snapshot.factories[product.factory] || ''));
+        info.appendChild(footer);
+        card.appendChild(info);
+        return card;
+    }
+
+    function renderList(root, snapshot, title, products) {
+        root.appendChild(element('div', 'results-info', `${title}: сохранено товаров - ${products.length}`));
+        if (!products.length) {
+            const empty = element('div', 'empty-state');
+            empty.appendChild(element('h3', '', 'Без сети таких товаров нет'));
+            empty.appendChild(element('p', '', 'Сохраняются самые популярные товары каталога'));
+            root.appendChild(empty);
+            return;
+        }
+
+        const grid = element('div', 'products-grid');
+        root.appendChild(grid);
+        const more = element('div', 'offline-more');
+        const button = element('button', 'btn', 'Показать ещё');
+        more.appendChild(button);
+        root.appendChild(more);
+
+        let shown = 0;
+        function showMore() {
+            products.slice(shown, shown + PAGE_SIZE).forEach(product => grid.appendChild(renderCard(snapshot, product)));
+            shown += PAGE_SIZE;
+            more.style.display = shown < products.length ? '' : 'none';
+        }
+        button.addEventListener('click', showMore);
+        showMore();
+    }
+
+    function specRow(label, value) {
+        const row = element('div', 'spec-row');
+        row.appendChild(element('span', 'spec-label', label));
+        row.appendChild(element('span', 'spec-value', value));
+        return row;
+    }
+
+    function renderProduct(root, snapshot, product) {
+        const main = element('div', 'product-main');
+        const gallery = element('div', 'gallery');
+        if (product.image) {
+            const image = element('img', 'main-image');
+            image.src = product.image;
+            image.alt = product.name;
+            gallery.appendChild(image);
+        } else {
+            gallery.appendChild(element('div', 'main-image'));
+        }
+        main.appendChild(gallery);
+
+        const info = element('div', 'product-detail-info');
+        info.appendChild(element('h1', '', product.name));
+        const meta = element('div', 'product-meta');
+        meta.appendChild(element('span', 'category-badge', snapshot.categories[product.category] || ''));
+        meta.appendChild(element('span', 'meta-item', `Артикул: ${product.article}`));
+        info.appendChild(meta);
+        info.appendChild(element('div', 'price', `${product.price} ${snapshot.currency_symbol}`));
+        info.appendChild(product.in_stock
+            ? element('div', 'stock-status in-stock', '✓ В наличии')
+            : element('div', 'stock-status out-stock', '✗ Нет в наличии'));
+
+        const specs = element('div', 'specs');
+        specs.appendChild(element('h3', '', '📋 Характеристики'));
+        specs.appendChild(specRow('Материал', snapshot.materials[product.material] || ''));
+        specs.appendChild(specRow('Вес', `${product.weight} г`));
+        specs.appendChild(specRow('Производитель', snapshot.factories[product.factory] || ''));
+        info.appendChild(specs);
+        main.appendChild(info);
+        root.appendChild(main);
+    }
+
+    function filterHome(snapshot, params) {
+        const category = params.get('category');
+        const material = params.get('material');
+        const search = (params.get('search') || '').trim().toLowerCase();
+        return snapshot.products.filter(product =>
+            (!category || product.category === category)
+            && (!material || String(product.material) === material)
+            && (!search || product.name.toLowerCase().includes(search) || product.article.toLowerCase().includes(search))
+        );
+    }
+
+    async function render(root) {
+        const snapshot = await loadSnapshot(root.dataset.manifestUrl);
+        if (!snapshot) return;
+        root.replaceChildren();
+
+        const path = window.location.pathname;
+        const productMatch = path.match(/^\/product\/([^/]+)\/$/);
+        const factoryMatch = path.match(/^\/factory\/(\d+)\/$/);
+
+        if (productMatch) {
+            const article = decodeURIComponent(productMatch[1]);
+            const product = snapshot.products.find(item => item.article === article);
+            if (product) {
+                renderProduct(root, snapshot, product);
+            } else {
+                renderList(root, snapshot, 'Товар не сохранён, популярные товары', snapshot.products);
+            }
+        } else if (factoryMatch) {
+            const factoryId = Number(factoryMatch[1]);
+            renderList(root, snapshot, snapshot.factories[factoryId] || 'Завод',
+                snapshot.products.filter(product => product.factory === factoryId));
+        } else if (path === '/') {
+            renderList(root, snapshot, 'Каталог', filterHome(snapshot, new URLSearchParams(window.location.search)));
+        } else {
+            renderList(root, snapshot, 'Страница недоступна без сети, популярные товары', snapshot.products);
+        }
+    }
+
+    document.addEventListener('DOMContentLoaded', function() {
+        const root = document.getElementById('offlineCatalog');
+        if (root && window.caches) {
+            render(root).catch(error => console.log('⚠️ Снимок каталога недоступен', error));
+        }
+        // Соединение вернулось - открываем настоящую страницу
+        window.addEventListener('online', () => window.location.reload());
+    });
+})();